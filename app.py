@@ -1,17 +1,24 @@
 import dash
-from dash import dcc, html, Input, Output, State, callback
+from dash import dcc, html, Input, Output, State, callback, ctx
 import dash_bootstrap_components as dbc
 from dash.exceptions import PreventUpdate
 from flask import Flask, render_template, redirect, url_for
 import pandas as pd
-import numpy as np
-import json
 from datetime import datetime, timedelta
 import os
 from pathlib import Path
 
 from climate_data import api, processor
-from dashboard import layout, visualizations
+from climate_data.anomalies import seasonal_baseline
+from climate_data.cache import figure_cache, SingleFlight
+from climate_data.datastore import dataset_flights, datasets, make_key
+from climate_data.profiling import track_peak_memory
+from climate_data.rolling import DEFAULT_WINDOWS, rolling_windows
+from climate_data.rollups import choose_level, combine_stations, finer, RAW_LEVEL
+from climate_data.storage import get_store
+from climate_data.summary import DatasetSummary, summarize_dataset
+from dashboard import layout, table, visualizations
+from dashboard.downsample import relayout_range, target_points
 
 server = Flask(__name__)
 
@@ -26,6 +33,20 @@ app = dash.Dash(
 
 app.layout = layout.create_layout()
 
+# Renders of the same figure share one build, like dataset loads.
+figure_flights = SingleFlight()
+
+# History read in front of a zoomed range so the longest moving average is
+# complete at its left edge.
+ZOOM_HISTORY = max(pd.Timedelta(window) for window in DEFAULT_WINDOWS)
+
+EXTREME_DATE_FORMATS = {
+    'day': '%d.%m.%Y',
+    'week': 'неделя с %d.%m.%Y',
+    'month': '%m.%Y',
+    'year': '%Y'
+}
+
 
 @server.context_processor
 def inject_current_year():
@@ -47,15 +68,28 @@ def about():
     return render_template('base.html')
 
 
+@app.callback(
+    Output('station-dropdown', 'options'),
+    Output('station-dropdown', 'value'),
+    Input('data-type-dropdown', 'value')
+)
+def update_station_options(data_type):
+    stations = get_store().stations("GHCND", data_type) if data_type else []
+    return [{"label": station.split(":", 1)[-1], "value": station} for station in stations], None
+
+
 @app.callback(
     Output('data-store', 'data'),
     Input('update-button', 'n_clicks'),
     State('data-type-dropdown', 'value'),
+    State('station-dropdown', 'value'),
     State('date-range', 'start_date'),
     State('date-range', 'end_date'),
+    State('chart-width', 'data'),
     prevent_initial_call=True
 )
-def load_data(n_clicks, data_type, start_date, end_date):
+@track_peak_memory
+def load_data(n_clicks, data_type, station, start_date, end_date, chart_width):
     if n_clicks is None:
         raise PreventUpdate
     
@@ -63,13 +97,46 @@ def load_data(n_clicks, data_type, start_date, end_date):
         start_date = (datetime.now() - timedelta(days=365*5)).strftime('%Y-%m-%d')
         end_date = datetime.now().strftime('%Y-%m-%d')
     
-    data = api.get_sample_data()
+    # Long ranges are read from the weekly/monthly/yearly aggregates: the
+    # coarsest level that still gives the chart as many points as it can show.
+    level = choose_level(start_date, end_date, target_points(chart_width))
+    key = make_key('load', data_type, station, start_date, end_date, level)
+    # Everyone pressing "Обновить" for the same query at once waits for one load.
+    return dataset_flights.do(key, _load_dataset, key, data_type, station, start_date, end_date, level)
+
+
+def _load_dataset(key, data_type, station, start_date, end_date, level):
+    data = _query(data_type, station, start_date, end_date, level)
     
-    if data_type:
-        data = data[data['type'] == data_type]
+    if data.empty:
+        data = api.get_sample_data()
+        mask = (data['date'] >= pd.Timestamp(start_date)) & (data['date'] < pd.Timestamp(end_date) + pd.Timedelta(days=1))
+        if data_type:
+            mask &= data['type'] == data_type
+        data = data[mask]
+        # The sample data is never aggregated.
+        level = RAW_LEVEL
     
-    data_json = data.to_json(orient='split', date_format='iso')
-    return data_json
+    handle = datasets.put(data, key=key)
+    # KPI statistics are computed once per load and ride along in the handle.
+    summary = summarize_dataset(data, level=level, start=start_date, end=end_date)
+    handle['summary'] = summary._asdict() if summary else None
+    # Zooming into an aggregated load re-runs the query at a finer level.
+    handle['query'] = {'type': data_type, 'station': station, 'start': start_date, 'end': end_date, 'level': level}
+    return handle
+
+
+def _query(data_type, station, start_date, end_date, level):
+    data = get_store().query(
+        types=[data_type] if data_type else None,
+        stations=[station] if station else None,
+        start=start_date,
+        end=end_date,
+        level=level
+    )
+    # Without a chosen station the stations are averaged per date instead of
+    # being drawn and summarised as one interleaved series.
+    return combine_stations(data)
 
 
 @app.callback(
@@ -78,20 +145,54 @@ def load_data(n_clicks, data_type, start_date, end_date):
     Input('analysis-type-dropdown', 'value'),
     prevent_initial_call=True
 )
-def process_data(data_json, analysis_type):
-    if data_json is None:
+@track_peak_memory
+def process_data(data_handle, analysis_type):
+    data = datasets.get(data_handle)
+    if data is None:
         raise PreventUpdate
     
-    data = pd.read_json(data_json, orient='split')
-    
+    return _processed_handle(data_handle, data, analysis_type)
+
+
+def _processed_handle(data_handle, data, analysis_type):
     if analysis_type == 'moving_avg':
-        processed_data = processor.calculate_moving_average(data)
+        # Windows follow the sample spacing, so monthly data or weekly
+        # aggregates do not get single-point 7-day averages.
+        windows = rolling_windows(data['date'].values)
+        processed_data = processor.calculate_rolling(data, windows=windows, statistics=('mean', 'std'))
     elif analysis_type == 'anomalies':
-        processed_data = processor.detect_anomalies(data)
+        # Scored against the same calendar buckets as the sync job, as fine
+        # as the sample spacing and span allow.
+        processed_data = processor.detect_anomalies(data, seasonal=seasonal_baseline(data['date'].values))
     else:
         processed_data = data
     
-    return processed_data.to_json(orient='split', date_format='iso')
+    return datasets.put(
+        processed_data,
+        key=make_key('processed', data_handle['key'], data_handle['version'], analysis_type)
+    )
+
+
+app.clientside_callback(
+    """
+    function(relayoutData, currentWidth) {
+        var graph = document.getElementById('main-chart');
+        var width = graph ? graph.offsetWidth : window.innerWidth;
+        return width === currentWidth ? window.dash_clientside.no_update : width;
+    }
+    """,
+    Output('chart-width', 'data'),
+    Input('main-chart', 'relayoutData'),
+    State('chart-width', 'data')
+)
+
+
+@app.callback(
+    Output('seasonality-options', 'style'),
+    Input('visualization-tabs', 'value')
+)
+def toggle_seasonality_options(tab_value):
+    return {} if tab_value == 'seasonality' else {"display": "none"}
 
 
 @app.callback(
@@ -100,17 +201,102 @@ def process_data(data_json, analysis_type):
     Input('visualization-tabs', 'value'),
     Input('analysis-type-dropdown', 'value'),
     Input('data-type-dropdown', 'value'),
+    Input('main-chart', 'relayoutData'),
+    Input('chart-width', 'data'),
+    Input('seasonality-mode', 'value'),
+    State('data-store', 'data'),
     prevent_initial_call=True
 )
-def update_visualization(data_json, tab_value, analysis_type, data_type):
-    if data_json is None:
+@track_peak_memory
+def update_visualization(data_handle, tab_value, analysis_type, data_type, relayout_data, chart_width, seasonality_mode,
+                         loaded_handle):
+    if ctx.triggered_id == 'seasonality-mode' and tab_value != 'seasonality':
+        raise PreventUpdate
+    
+    # A stale zoom must not leak into a figure rebuilt for new data or a new
+    # analysis, so the range is only honoured for zoom and resize events.
+    x_range = relayout_range(relayout_data) if ctx.triggered_id in ('main-chart', 'chart-width') else None
+    if ctx.triggered_id == 'main-chart':
+        # Only zoom and reset re-query the data; autosize and other layout
+        # events would just redraw the same figure.
+        if tab_value not in ('time-series', 'anomalies'):
+            raise PreventUpdate
+        if x_range is None and not (relayout_data or {}).get('xaxis.autorange'):
+            raise PreventUpdate
+    
+    if not data_handle:
         return visualizations.empty_plot()
     
-    data = pd.read_json(data_json, orient='split')
+    # Arguments a tab does not use are dropped, so e.g. resizing the window
+    # on the distribution tab is answered from the figure cache.
+    if tab_value not in ('time-series', 'anomalies'):
+        x_range = chart_width = None
+    if tab_value != 'seasonality':
+        seasonality_mode = None
     
-    if data.empty:
+    if x_range is not None:
+        data_handle = _zoom_handle(loaded_handle, analysis_type, x_range, chart_width) or data_handle
+    
+    # Keyed on the handle rather than the frame: a cached figure is served
+    # without loading or hashing the dataset.
+    view = (tab_value, analysis_type, data_type, x_range, chart_width, seasonality_mode)
+    figure_key = make_key('figure', data_handle['key'], data_handle['version'], view)
+    figure = figure_cache.get(figure_key)
+    if figure is not None:
+        return figure
+    return figure_flights.do(figure_key, _render_figure, figure_key, data_handle, view)
+
+
+def _zoom_handle(loaded_handle, analysis_type, x_range, chart_width):
+    # A zoom into an aggregated load is answered from the store at the level
+    # the zoomed range calls for, down to the daily rows.
+    query = (loaded_handle or {}).get('query')
+    if not query or query['level'] == RAW_LEVEL:
+        return None
+    
+    start = max(pd.Timestamp(x_range[0]).normalize(), pd.Timestamp(query['start']))
+    end = min(pd.Timestamp(x_range[1]).normalize(), pd.Timestamp(query['end']))
+    if start > end:
+        return None
+    level = choose_level(start, end, target_points(chart_width))
+    if not finer(level, query['level']):
+        return None
+    
+    # Moving averages need a window of history before the view and anomaly
+    # baselines all of the loaded history.
+    if analysis_type == 'anomalies':
+        start = pd.Timestamp(query['start'])
+    elif analysis_type == 'moving_avg':
+        start = max(start - ZOOM_HISTORY, pd.Timestamp(query['start']))
+    
+    key = make_key('zoom', loaded_handle['key'], start, end, level)
+    zoom_handle = dataset_flights.do(key, _load_zoom, key, query, start, end, level)
+    data = datasets.get(zoom_handle)
+    if data is None or data.empty:
+        return None
+    return _processed_handle(zoom_handle, data, analysis_type)
+
+
+def _load_zoom(key, query, start, end, level):
+    return datasets.put(_query(query['type'], query.get('station'), start, end, level), key=key)
+
+
+def _render_figure(figure_key, data_handle, view):
+    figure = figure_cache.get(figure_key)
+    if figure is not None:
+        return figure
+    
+    data = datasets.get(data_handle)
+    if data is None or data.empty:
+        # Not cached: the dataset may just have been evicted.
         return visualizations.empty_plot()
     
+    figure = build_figure(data, data_handle['key'], *view)
+    figure_cache.set(figure_key, figure)
+    return figure
+
+
+def build_figure(data, data_key, tab_value, analysis_type, data_type, x_range, chart_width, seasonality_mode):
     titles = {
         'TAVG': 'Температура',
         'PRCP': 'Осадки',
@@ -127,12 +313,16 @@ def update_visualization(data_json, tab_value, analysis_type, data_type):
     y_title = y_titles.get(data_type, "Значение")
     
     if tab_value == 'time-series':
-        return visualizations.create_time_series_plot(
+        figure = visualizations.create_time_series_plot(
             data, 
             analysis_type=analysis_type,
             title=f"{title} - Временной ряд",
-            y_title=y_title
+            y_title=y_title,
+            x_range=x_range,
+            width=chart_width
         )
+        # Keeps the user's zoom while the figure is rebuilt for the new range.
+        return figure.update_layout(uirevision=f"{data_key}:{analysis_type}")
     elif tab_value == 'distribution':
         return visualizations.create_distribution_plot(
             data,
@@ -141,13 +331,17 @@ def update_visualization(data_json, tab_value, analysis_type, data_type):
     elif tab_value == 'seasonality':
         return visualizations.create_seasonality_plot(
             data,
-            title=f"{title} - Сезонность"
+            title=f"{title} - Сезонность",
+            mode=seasonality_mode
         )
     elif tab_value == 'anomalies':
-        return visualizations.create_anomalies_plot(
+        figure = visualizations.create_anomalies_plot(
             data,
-            title=f"{title} - Аномалии"
+            title=f"{title} - Аномалии",
+            x_range=x_range,
+            width=chart_width
         )
+        return figure.update_layout(uirevision=f"{data_key}:anomalies")
     else:
         return visualizations.empty_plot()
 
@@ -162,67 +356,73 @@ def update_visualization(data_json, tab_value, analysis_type, data_type):
         Output('min-date', 'children'),
         Output('max-date', 'children'),
         Output('trend-period', 'children'),
-        Output('avg-change', 'className'),
-        Output('data-table', 'data'),
-        Output('data-table', 'columns')
+        Output('avg-change', 'className')
     ],
-    Input('processed-data-store', 'data'),
+    Input('data-store', 'data'),
     prevent_initial_call=True
 )
-def update_insights(data_json):
-    if data_json is None:
-        empty_insight = "—"
-        return empty_insight, empty_insight, empty_insight, empty_insight, "", "", "", "", "indicator", [], []
-    
-    data = pd.read_json(data_json, orient='split')
+def update_insights(data_handle):
+    # Driven by the raw dataset handle only: switching the analysis type
+    # leaves these cards untouched and nothing is recomputed here.
+    summary = (data_handle or {}).get('summary')
     
-    if data.empty or 'value' not in data.columns:
+    if not summary:
         empty_insight = "—"
-        return empty_insight, empty_insight, empty_insight, empty_insight, "", "", "", "", "indicator", [], []
-    
-    avg_value = f"{data['value'].mean():.2f}"
-    
-    min_value = f"{data['value'].min():.2f}"
-    min_date = ""
-    if 'date' in data.columns:
-        min_idx = data['value'].idxmin()
-        min_date = f"({data.loc[min_idx, 'date'].strftime('%d.%m.%Y')})"
+        return empty_insight, empty_insight, empty_insight, empty_insight, "", "", "", "", "indicator"
     
-    max_value = f"{data['value'].max():.2f}"
-    max_date = ""
-    if 'date' in data.columns:
-        max_idx = data['value'].idxmax()
-        max_date = f"({data.loc[max_idx, 'date'].strftime('%d.%m.%Y')})"
+    summary = DatasetSummary(**summary)
     
-    trends = None
-    if 'date' in data.columns and len(data) > 1:
-        trends = processor.compute_trends(data)
+    avg_value = f"{summary.mean:.2f}"
+    min_value = f"{summary.min:.2f}"
+    max_value = f"{summary.max:.2f}"
+    # On aggregated data only the period of an extreme is known, not its day.
+    date_format = EXTREME_DATE_FORMATS[summary.level]
+    min_date = f"({pd.Timestamp(summary.min_date).strftime(date_format)})" if summary.min_date else ""
+    max_date = f"({pd.Timestamp(summary.max_date).strftime(date_format)})" if summary.max_date else ""
     
     trend_value = "—"
     trend_period = ""
     avg_change = ""
     change_class = "indicator"
     
-    if trends and 'yearly' in trends:
-        yearly_change = trends['yearly']['change_percent']
-        if yearly_change is not None and not np.isnan(yearly_change):
-            sign = "+" if yearly_change > 0 else ""
-            trend_value = f"{sign}{yearly_change:.2f}%"
-            trend_period = "в год"
-            
-            sign_text = "+" if yearly_change > 0 else ""
-            avg_change = f"{sign_text}{yearly_change:.2f}% (годовой)"
-            change_class = "indicator positive-change" if yearly_change > 0 else "indicator negative-change"
-    
-    table_data = []
-    if not data.empty and 'date' in data.columns:
-        table_df = data.copy()
-        table_df['date'] = table_df['date'].dt.strftime('%d.%m.%Y')
-        table_data = table_df.to_dict('records')
-    
-    columns = [{"name": col.capitalize(), "id": col} for col in data.columns if col not in ['z_score', 'is_anomaly']]
-    
-    return avg_value, min_value, max_value, trend_value, avg_change, min_date, max_date, trend_period, change_class, table_data, columns
+    yearly_change = summary.yearly_change
+    if yearly_change is not None:
+        sign = "+" if yearly_change > 0 else ""
+        trend_value = f"{sign}{yearly_change:.2f}%"
+        trend_period = "в год"
+        
+        sign_text = "+" if yearly_change > 0 else ""
+        avg_change = f"{sign_text}{yearly_change:.2f}% (годовой)"
+        change_class = "indicator positive-change" if yearly_change > 0 else "indicator negative-change"
+    
+    return avg_value, min_value, max_value, trend_value, avg_change, min_date, max_date, trend_period, change_class
+
+
+@app.callback(
+    Output('data-table', 'data'),
+    Output('data-table', 'columns'),
+    Output('data-table', 'page_count'),
+    Output('data-table', 'page_current'),
+    Input('processed-data-store', 'data'),
+    Input('data-table', 'page_current'),
+    Input('data-table', 'page_size'),
+    Input('data-table', 'sort_by'),
+    Input('data-table', 'filter_query'),
+    prevent_initial_call=True
+)
+@track_peak_memory
+def update_table(data_handle, page_current, page_size, sort_by, filter_query):
+    data = datasets.get(data_handle)
+    
+    if data is None or data.empty:
+        return [], [], 1, 0
+    
+    # A new dataset, filter or sort order starts again from the first page.
+    if 'data-table.page_current' not in ctx.triggered_prop_ids:
+        page_current = 0
+    
+    view = table.table_view(data, filter_query or '', tuple(sort_by or ()))
+    return table.page_records(view, page_current or 0, page_size), table.table_columns(data), table.page_count(view, page_size), page_current
 
 
 if __name__ == '__main__':
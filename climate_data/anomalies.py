@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+
+SEASONAL_BASELINES = (None, 'month', 'dayofyear')
+SEASONAL_BUCKETS = 367
+MIN_BUCKET_POINTS = 10
+
+
+def seasonal_keys(dates, seasonal=None):
+    days = np.asarray(dates, dtype='datetime64[D]')
+    if seasonal is None:
+        return np.zeros(len(days), dtype=np.int64)
+    if seasonal == 'month':
+        return days.astype('datetime64[M]').astype(np.int64) % 12 + 1
+    if seasonal == 'dayofyear':
+        return (days - days.astype('datetime64[Y]').astype('datetime64[D]')).astype(np.int64) + 1
+    raise ValueError(f"Неизвестный сезонный базис: {seasonal}")
+
+
+def seasonal_baseline(dates, min_points=MIN_BUCKET_POINTS):
+    # The finest calendar bucket whose buckets typically collect min_points
+    # samples: day of year for decades of daily data, months for a year of
+    # daily or weekly data or a decade of monthly rollups, none for yearly
+    # rollups, which leave most buckets empty.
+    days = np.unique(np.asarray(dates, dtype='datetime64[D]'))
+    for seasonal, buckets in (('dayofyear', 366), ('month', 12)):
+        counts = np.bincount(seasonal_keys(days, seasonal), minlength=buckets + 1)[1:]
+        if np.median(counts) >= min_points:
+            return seasonal
+    return None
+
+
+def expanding_scores(values, keys, prior_count=0, prior_mean=0.0, prior_m2=0.0):
+    # Scores date-ordered, NaN-free values against the running statistics of
+    # their bucket, each value included; the priors are each row's bucket
+    # statistics from earlier chunks. Returns the z-scores and the running
+    # count, mean and M2 after every row.
+    grouped = pd.Series(values).groupby(keys)
+    
+    # Within-chunk prefix statistics per bucket, relative to a reference
+    # value so the cumulative sums stay small.
+    first = grouped.transform('first').values
+    reference = np.where(prior_count > 0, prior_mean, first)
+    shifted = pd.Series(values - reference)
+    chunk_count = grouped.cumcount().values + 1
+    shifted_sum = shifted.groupby(keys).cumsum().values
+    shifted_sq = (shifted * shifted).groupby(keys).cumsum().values
+    chunk_mean = reference + shifted_sum / chunk_count
+    chunk_m2 = np.maximum(shifted_sq - shifted_sum ** 2 / chunk_count, 0)
+    
+    count = prior_count + chunk_count
+    delta = chunk_mean - prior_mean
+    mean = np.where(prior_count > 0, prior_mean + delta * chunk_count / count, chunk_mean)
+    m2 = prior_m2 + chunk_m2 + np.where(prior_count > 0, delta ** 2 * prior_count * chunk_count / count, 0)
+    
+    with np.errstate(invalid='ignore', divide='ignore'):
+        std = np.sqrt(m2 / (count - 1))
+        z_score = np.where(std > 0, (values - mean) / std, 0.0)
+    z_score[count < 2] = np.nan
+    return z_score, count, mean, m2
+
+
+class OnlineAnomalyDetector:
+    # Keeps Welford/Chan running statistics (count, mean, M2) per seasonal
+    # bucket. Each point is scored against the statistics of every point seen
+    # so far in its bucket, itself included, so feeding a series in chunks
+    # gives the same z-scores (up to rounding) as scoring it in one batch.
+    # Chunks must arrive in date order: a point older than one already seen
+    # would be scored against statistics from its future.
+    def __init__(self, column='value', threshold=2, seasonal=None):
+        if seasonal not in SEASONAL_BASELINES:
+            raise ValueError(f"Неизвестный сезонный базис: {seasonal}")
+        self.column = column
+        self.threshold = threshold
+        self.seasonal = seasonal
+        self.count = np.zeros(SEASONAL_BUCKETS, dtype=np.int64)
+        self.mean = np.zeros(SEASONAL_BUCKETS, dtype=np.float64)
+        self.m2 = np.zeros(SEASONAL_BUCKETS, dtype=np.float64)
+        self.last_date = None
+    
+    def update(self, df):
+        result = pd.DataFrame({'z_score': np.nan, 'is_anomaly': False}, index=df.index)
+        if df.empty:
+            return result
+        
+        dates = df['date'].values
+        order = np.argsort(dates, kind='stable')
+        if self.last_date is not None and dates[order[0]] < self.last_date:
+            raise ValueError(
+                f"Данные должны поступать по порядку дат: {pd.Timestamp(dates[order[0]]):%Y-%m-%d} "
+                f"раньше уже обработанной {pd.Timestamp(self.last_date):%Y-%m-%d}"
+            )
+        self.last_date = dates[order[-1]]
+        values = df[self.column].to_numpy(dtype=np.float64, na_value=np.nan)[order]
+        keys = seasonal_keys(dates[order], self.seasonal)
+        
+        valid = ~np.isnan(values)
+        positions, values, keys = order[valid], values[valid], keys[valid]
+        if len(values) == 0:
+            return result
+        
+        z_score, count, mean, m2 = expanding_scores(values, keys, self.count[keys], self.mean[keys], self.m2[keys])
+        
+        last = self._last_per_key(keys)
+        self.count[keys[last]] = count[last]
+        self.mean[keys[last]] = mean[last]
+        self.m2[keys[last]] = m2[last]
+        
+        z_column = np.full(len(df), np.nan)
+        z_column[positions] = z_score
+        result['z_score'] = z_column
+        result['is_anomaly'] = np.abs(z_column) > self.threshold
+        return result
+    
+    def score(self, df):
+        return OnlineAnomalyDetector(self.column, self.threshold, self.seasonal).update(df)
+    
+    def state_dict(self):
+        used = np.flatnonzero(self.count)
+        return {
+            'column': self.column,
+            'threshold': self.threshold,
+            'seasonal': self.seasonal,
+            'last_date': pd.Timestamp(self.last_date).isoformat() if self.last_date is not None else None,
+            'buckets': {int(key): [int(self.count[key]), float(self.mean[key]), float(self.m2[key])] for key in used}
+        }
+    
+    @classmethod
+    def from_state(cls, state):
+        detector = cls(state['column'], state['threshold'], state['seasonal'])
+        if state.get('last_date'):
+            detector.last_date = pd.Timestamp(state['last_date']).to_datetime64()
+        for key, (count, mean, m2) in state['buckets'].items():
+            detector.count[int(key)] = count
+            detector.mean[int(key)] = mean
+            detector.m2[int(key)] = m2
+        return detector
+    
+    @staticmethod
+    def _last_per_key(keys):
+        last = np.zeros(len(keys), dtype=bool)
+        last[len(keys) - 1 - np.unique(keys[::-1], return_index=True)[1]] = True
+        return last
@@ -1,62 +1,135 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import requests
 import pandas as pd
 from datetime import datetime, timedelta
+from requests.adapters import HTTPAdapter
+
+from .compact import compact_frame
+from .ratelimit import QuotaExceededError, RateLimiter
+from .storage import get_store, split_by_year
 
 API_KEY = "demo"
 BASE_URL = "https://www.ncdc.noaa.gov/cdo-web/api/v2/"
 
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+MAX_PAGE_SIZE = 1000
+MAX_CONCURRENT_REQUESTS = 5
+LONG_RANGE_DATASETS = ("GSOM", "GSOY")
+DEDUP_COLUMNS = ["date", "datatype", "station"]
+
+
+class ApiError(Exception):
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class NoaaClient:
+    def __init__(self, token=API_KEY, base_url=BASE_URL, timeout=(5, 30), pool_size=10,
+                 max_retries=4, backoff_factor=0.5, max_backoff=30, rate_limiter=None):
+        self.base_url = base_url if base_url.endswith("/") else base_url + "/"
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter()
+        
+        self.session = requests.Session()
+        self.session.headers.update({"token": token})
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get(self, endpoint, params=None):
+        url = f"{self.base_url}{endpoint}"
+        
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                if attempt == self.max_retries:
+                    raise ApiError(f"Ошибка сети: {exc}") from exc
+                time.sleep(self._backoff(attempt))
+                continue
+            
+            if response.status_code == 200:
+                return response.json()
+            
+            if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                raise ApiError(f"Ошибка API: {response.status_code}", response.status_code)
+            
+            time.sleep(self._backoff(attempt, response.headers.get("Retry-After")))
+
+    def close(self):
+        self.session.close()
+
+    def _backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), self.max_backoff)
+            except ValueError:
+                pass
+        return min(self.backoff_factor * (2 ** attempt), self.max_backoff)
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_client():
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = NoaaClient()
+        return _default_client
+
 
-def fetch_stations(limit=1000, offset=1):
-    url = f"{BASE_URL}stations"
-    headers = {"token": API_KEY}
+def set_client(client):
+    global _default_client
+    with _default_client_lock:
+        _default_client = client
+
+
+def _get_json(endpoint, params, client=None):
+    client = client if client is not None else get_client()
+    try:
+        return client.get(endpoint, params=params)
+    except (ApiError, QuotaExceededError) as exc:
+        return {"error": str(exc)}
+
+
+def fetch_stations(limit=1000, offset=1, client=None):
     params = {
         "limit": limit,
         "offset": offset
     }
     
-    response = requests.get(url, headers=headers, params=params)
-    
-    if response.status_code == 200:
-        return response.json()
-    else:
-        return {"error": f"Ошибка API: {response.status_code}"}
+    return _get_json("stations", params, client)
 
 
-def fetch_data_types(limit=1000, offset=1):
-    url = f"{BASE_URL}datatypes"
-    headers = {"token": API_KEY}
+def fetch_data_types(limit=1000, offset=1, client=None):
     params = {
         "limit": limit,
         "offset": offset
     }
     
-    response = requests.get(url, headers=headers, params=params)
-    
-    if response.status_code == 200:
-        return response.json()
-    else:
-        return {"error": f"Ошибка API: {response.status_code}"}
+    return _get_json("datatypes", params, client)
 
 
-def fetch_location_categories(limit=1000, offset=1):
-    url = f"{BASE_URL}locationcategories"
-    headers = {"token": API_KEY}
+def fetch_location_categories(limit=1000, offset=1, client=None):
     params = {
         "limit": limit,
         "offset": offset
     }
     
-    response = requests.get(url, headers=headers, params=params)
-    
-    if response.status_code == 200:
-        return response.json()
-    else:
-        return {"error": f"Ошибка API: {response.status_code}"}
+    return _get_json("locationcategories", params, client)
 
 
-def fetch_locations(location_category=None, limit=1000, offset=1):
-    url = f"{BASE_URL}locations"
-    headers = {"token": API_KEY}
+def fetch_locations(location_category=None, limit=1000, offset=1, client=None):
     params = {
         "limit": limit,
         "offset": offset
@@ -65,29 +138,29 @@ def fetch_locations(location_category=None, limit=1000, offset=1):
     if location_category:
         params["locationcategoryid"] = location_category
     
-    response = requests.get(url, headers=headers, params=params)
-    
-    if response.status_code == 200:
-        return response.json()
-    else:
-        return {"error": f"Ошибка API: {response.status_code}"}
+    return _get_json("locations", params, client)
 
 
-def fetch_data(datasetid, startdate, enddate, locationid=None, stationid=None, datatypeid=None, limit=1000):
-    url = f"{BASE_URL}data"
-    headers = {"token": API_KEY}
-    
-    if isinstance(startdate, datetime):
-        startdate = startdate.strftime("%Y-%m-%d")
+def date_windows(datasetid, startdate, enddate):
+    # CDO caps a single data request at one year (ten years for GSOM/GSOY);
+    # windows are aligned to calendar years so they never straddle that limit.
+    span_years = 10 if datasetid in LONG_RANGE_DATASETS else 1
+    start = pd.Timestamp(startdate).normalize()
+    end = pd.Timestamp(enddate).normalize()
     
-    if isinstance(enddate, datetime):
-        enddate = enddate.strftime("%Y-%m-%d")
+    windows = []
+    while start <= end:
+        boundary = pd.Timestamp(year=(start.year // span_years + 1) * span_years, month=1, day=1)
+        window_end = min(boundary - pd.Timedelta(days=1), end)
+        windows.append((start.strftime("%Y-%m-%d"), window_end.strftime("%Y-%m-%d")))
+        start = window_end + pd.Timedelta(days=1)
     
+    return windows
+
+
+def data_params(datasetid, locationid=None, stationid=None, datatypeid=None):
     params = {
-        "datasetid": datasetid,
-        "startdate": startdate,
-        "enddate": enddate,
-        "limit": limit
+        "datasetid": datasetid
     }
     
     if locationid:
@@ -99,19 +172,115 @@ def fetch_data(datasetid, startdate, enddate, locationid=None, stationid=None, d
     if datatypeid:
         params["datatypeid"] = datatypeid
     
-    response = requests.get(url, headers=headers, params=params)
+    return params
+
+
+def page_params(base_params, window, offset, limit):
+    params = dict(base_params)
+    params.update({
+        "startdate": window[0],
+        "enddate": window[1],
+        "offset": offset,
+        "limit": limit
+    })
+    return params
+
+
+# Paging plan shared by the threaded fetcher below and the asyncio one in
+# bulk: the first page of every window is requested, then the remaining
+# offsets follow from the count each first page reports.
+def first_page_params(base_params, windows, limit):
+    return [page_params(base_params, window, 1, limit) for window in windows]
+
+
+def next_page_params(base_params, windows, first_pages, limit):
+    requests = []
+    for window, page in zip(windows, first_pages):
+        count = page.get("metadata", {}).get("resultset", {}).get("count", 0)
+        requests.extend(page_params(base_params, window, offset, limit) for offset in range(1 + limit, count + 1, limit))
+    return requests
+
+
+def _fetch_pages(client, base_params, windows, limit, max_workers):
+    def fetch_page(params):
+        return client.get("data", params=params)
+    
+    # A window's remaining offsets are queued as soon as its own first page
+    # reports the count, and share the pool with every other window.
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        firsts = {
+            executor.submit(fetch_page, params): i
+            for i, params in enumerate(first_page_params(base_params, windows, limit))
+        }
+        first_pages = [None] * len(windows)
+        others = [[] for _ in windows]
+        for future in as_completed(firsts):
+            i = firsts[future]
+            first_pages[i] = future.result()
+            others[i] = [executor.submit(fetch_page, params) for params in next_page_params(base_params, windows[i:i + 1], first_pages[i:i + 1], limit)]
+        return first_pages + [future.result() for futures in others for future in futures]
+
+
+def results_frame(pages):
+    df = pd.DataFrame([row for page in pages for row in page.get("results", [])])
+    if df.empty:
+        return df
+    
+    if "date" in df.columns:
+        df["date"] = pd.to_datetime(df["date"])
     
-    if response.status_code == 200:
-        data = response.json()
-        if "results" in data:
-            df = pd.DataFrame(data["results"])
-            if not df.empty and "date" in df.columns:
-                df["date"] = pd.to_datetime(df["date"])
-            return df
+    key_columns = [col for col in DEDUP_COLUMNS if col in df.columns]
+    df = df.drop_duplicates(subset=key_columns or None)
+    if "date" in df.columns:
+        df = df.sort_values(key_columns)
+    
+    return compact_frame(df.reset_index(drop=True))
+
+
+def _fetch_cached(cache, client, params, scope, startdate, enddate, limit, max_workers):
+    datasetid, datatypeid = params["datasetid"], params["datatypeid"]
+    start = pd.Timestamp(startdate).normalize()
+    end = pd.Timestamp(enddate).normalize()
+    today = pd.Timestamp.now().normalize()
+    
+    missing = [year for year in cache.missing_years(datasetid, datatypeid, scope, start, end) if year <= today.year]
+    if missing:
+        windows = [(f"{year}-01-01", min(pd.Timestamp(year=year, month=12, day=31), today).strftime("%Y-%m-%d")) for year in missing]
+        fetched = results_frame(_fetch_pages(client, params, windows, limit, max_workers))
+        for year, part in split_by_year(fetched, missing).items():
+            cache.write_partition(datasetid, datatypeid, scope, year, part)
+    
+    df = cache.read_years(datasetid, datatypeid, scope, range(start.year, end.year + 1))
+    if df.empty:
         return pd.DataFrame()
-    else:
-        print(f"Ошибка API: {response.status_code}")
+    
+    return df[(df["date"] >= start) & (df["date"] <= end)].reset_index(drop=True)
+
+
+def fetch_data(datasetid, startdate, enddate, locationid=None, stationid=None, datatypeid=None, limit=1000,
+               client=None, max_workers=MAX_CONCURRENT_REQUESTS, cache=None):
+    client = client if client is not None else get_client()
+    params = data_params(datasetid, locationid, stationid, datatypeid)
+    limit = min(limit, MAX_PAGE_SIZE)
+    
+    if cache is not None and datatypeid and (stationid or locationid):
+        try:
+            return _fetch_cached(cache, client, params, stationid or locationid, startdate, enddate, limit, max_workers)
+        except (ApiError, QuotaExceededError) as exc:
+            print(exc)
+            return pd.DataFrame()
+    
+    windows = date_windows(datasetid, startdate, enddate)
+    if not windows:
         return pd.DataFrame()
+    
+    try:
+        pages = _fetch_pages(client, params, windows, limit, max_workers)
+    except (ApiError, QuotaExceededError) as exc:
+        print(exc)
+        return pd.DataFrame()
+    
+    return results_frame(pages)
 
 
 def get_demo_temperature_data():
@@ -124,7 +293,8 @@ def get_demo_temperature_data():
         enddate=end_date,
         datatypeid="TAVG",
         locationid="CITY:US000001",
-        limit=1000
+        limit=1000,
+        cache=get_store()
     )
 
 
@@ -143,10 +313,11 @@ def get_sample_data():
         'type': 'PRCP'
     })
     
+    extreme_dates = pd.date_range(start=datetime.now() - timedelta(days=365*5), end=datetime.now(), freq='120D')
     extreme_events = pd.DataFrame({
-        'date': pd.date_range(start=datetime.now() - timedelta(days=365*5), end=datetime.now(), freq='120D'),
-        'value': [90 + i * 2 for i in range(15)],
+        'date': extreme_dates,
+        'value': [90 + i * 2 for i in range(len(extreme_dates))],
         'type': 'EXTREME'
     })
     
-    return pd.concat([temperature_data, precipitation_data, extreme_events]) 
\ No newline at end of file
+    return compact_frame(pd.concat([temperature_data, precipitation_data, extreme_events])) 
\ No newline at end of file
@@ -0,0 +1,80 @@
+import asyncio
+import functools
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from . import api
+
+FetchJob = namedtuple('FetchJob', ['station', 'datatype', 'startdate', 'enddate', 'datasetid'], defaults=['GHCND'])
+JobResult = namedtuple('JobResult', ['job', 'data', 'error'])
+
+
+class AsyncNoaaClient:
+    # Requests are executed on the pooled NoaaClient session; the executor size is
+    # the connection limit shared by every job, and the client's rate limiter is
+    # shared by all worker threads.
+    def __init__(self, client=None, max_connections=api.MAX_CONCURRENT_REQUESTS):
+        self.client = client if client is not None else api.get_client()
+        self._executor = ThreadPoolExecutor(max_workers=max_connections, thread_name_prefix='noaa')
+    
+    async def get(self, endpoint, params=None):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(self.client.get, endpoint, params))
+    
+    async def fetch_data(self, datasetid, startdate, enddate, locationid=None, stationid=None, datatypeid=None, limit=1000):
+        params = api.data_params(datasetid, locationid, stationid, datatypeid)
+        limit = min(limit, api.MAX_PAGE_SIZE)
+        windows = api.date_windows(datasetid, startdate, enddate)
+        
+        async def fetch_window(window, first):
+            # The rest of the window starts as soon as its first page is back.
+            first_page = await self.get("data", first)
+            other_pages = await asyncio.gather(*(
+                self.get("data", page) for page in api.next_page_params(params, [window], [first_page], limit)
+            ))
+            return [first_page, *other_pages]
+        
+        pages = await asyncio.gather(*(
+            fetch_window(window, first) for window, first in zip(windows, api.first_page_params(params, windows, limit))
+        ))
+        return api.results_frame([page for window_pages in pages for page in window_pages])
+    
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def _run_job(async_client, job):
+    try:
+        data = await async_client.fetch_data(
+            datasetid=job.datasetid,
+            startdate=job.startdate,
+            enddate=job.enddate,
+            stationid=job.station,
+            datatypeid=job.datatype
+        )
+        return JobResult(job, data, None)
+    except Exception as exc:
+        return JobResult(job, pd.DataFrame(), str(exc))
+
+
+async def fetch_many(jobs, client=None, max_connections=api.MAX_CONCURRENT_REQUESTS):
+    jobs = [job if isinstance(job, FetchJob) else FetchJob(*job) for job in jobs]
+    async_client = AsyncNoaaClient(client, max_connections)
+    tasks = [asyncio.ensure_future(_run_job(async_client, job)) for job in jobs]
+    
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            yield await next_result
+    finally:
+        for task in tasks:
+            task.cancel()
+        async_client.close()
+
+
+def fetch_many_sync(jobs, client=None, max_connections=api.MAX_CONCURRENT_REQUESTS):
+    async def collect():
+        return [result async for result in fetch_many(jobs, client, max_connections)]
+    
+    return asyncio.run(collect())
@@ -0,0 +1,328 @@
+import functools
+import hashlib
+import inspect
+import os
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from .filecache import FileCache, private_directory
+
+ANALYSIS_CACHE_MAX_ITEMS = 256
+ANALYSIS_CACHE_MAX_BYTES = 256 * 1024 * 1024
+FIGURE_CACHE_MAX_ITEMS = 128
+FIGURE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# Per process and namespace: the recently used entries of a shared cache
+# directory kept as live objects in front of it.
+LOCAL_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# With a cache directory set, datasets, analyses and figures live in files
+# shared by every gunicorn worker on the host instead of in each process.
+CACHE_DIR = os.environ.get("CLIMATEVIZ_CACHE_DIR")
+
+_MISSING = object()
+
+_known_fingerprints = {}
+_fingerprints_lock = threading.Lock()
+
+
+def estimate_size(value):
+    if hasattr(value, 'to_plotly_json'):
+        # Figures are sized by their trace arrays and layout, not the wrapper.
+        return estimate_size(value.to_plotly_json())
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, dict):
+        return sum(estimate_size(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_size(item) for item in value)
+    if isinstance(value, np.ndarray) and value.dtype == object and value.size:
+        # Object arrays (the dates of a figure) hold pointers to boxed items.
+        return int(value.nbytes + value.size * sys.getsizeof(value.flat[0]))
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    if isinstance(value, (str, bytes)):
+        return sys.getsizeof(value)
+    return 0
+
+
+def make_key(*parts):
+    return hashlib.blake2b(repr(parts).encode(), digest_size=8).hexdigest()
+
+
+def frame_fingerprint(df):
+    with _fingerprints_lock:
+        known = _known_fingerprints.get(id(df))
+    if known is not None and known[0]() is df:
+        return known[1]
+    
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(repr((df.shape, list(df.columns), [str(t) for t in df.dtypes])).encode())
+    if not df.empty:
+        digest.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    return digest.hexdigest()
+
+
+def register_fingerprint(df, fingerprint):
+    # Frames registered here are treated as immutable: later fingerprint lookups
+    # for the same object skip hashing its content.
+    key = id(df)
+    
+    def forget(_, key=key):
+        with _fingerprints_lock:
+            _known_fingerprints.pop(key, None)
+    
+    with _fingerprints_lock:
+        _known_fingerprints[key] = (weakref.ref(df, forget), fingerprint)
+
+
+class LRUCache:
+    def __init__(self, max_items=None, max_bytes=None):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+
+    def set(self, key, value, size=None):
+        if size is None:
+            size = estimate_size(value)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            self._evict()
+
+    def delete(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'items': len(self._entries),
+                'bytes': self._bytes
+            }
+
+    def _evict(self):
+        # The most recent entry is always kept, even if it alone exceeds max_bytes.
+        while len(self._entries) > 1 and (
+            (self.max_items is not None and len(self._entries) > self.max_items)
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            _, (_, size) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+
+
+class TieredCache:
+    # An in-process LRUCache in front of a shared FileCache: repeated reads
+    # within a worker (table page turns, figure re-renders) skip reading and
+    # converting the file. Keys carry content versions, so a local copy can
+    # never be stale, only evicted.
+    def __init__(self, local, shared):
+        self.local = local
+        self.shared = shared
+    
+    def get(self, key, default=None):
+        value = self.local.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        value = self.shared.get(key, _MISSING)
+        if value is _MISSING:
+            return default
+        self.local.set(key, value)
+        return value
+    
+    def set(self, key, value, size=None):
+        self.local.set(key, value, size)
+        self.shared.set(key, value, size)
+    
+    def delete(self, key):
+        self.local.delete(key)
+        self.shared.delete(key)
+    
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+    
+    def __contains__(self, key):
+        return key in self.local or key in self.shared
+    
+    def __len__(self):
+        return len(self.shared)
+    
+    def stats(self):
+        return {**self.shared.stats(), 'local': self.local.stats()}
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    # Concurrent calls with the same key share one computation: the first
+    # caller runs it, the others wait and get its result (or its exception).
+    # Nothing is kept once the call returns; caching is the caller's job.
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.shared = 0
+    
+    def do(self, key, func, *args, **kwargs):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.executed += 1
+            else:
+                self.shared += 1
+        
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        
+        try:
+            flight.result = func(*args, **kwargs)
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result
+    
+    def stats(self):
+        with self._lock:
+            return {'executed': self.executed, 'shared': self.shared, 'in_flight': len(self._flights)}
+
+
+def cache_backend(namespace, max_items=None, max_bytes=None):
+    if CACHE_DIR:
+        private_directory(CACHE_DIR)
+        shared = FileCache(os.path.join(CACHE_DIR, namespace), max_items=max_items, max_bytes=max_bytes)
+        local_bytes = min(max_bytes, LOCAL_CACHE_MAX_BYTES) if max_bytes is not None else LOCAL_CACHE_MAX_BYTES
+        return TieredCache(LRUCache(max_items=max_items, max_bytes=local_bytes), shared)
+    return LRUCache(max_items=max_items, max_bytes=max_bytes)
+
+
+analysis_cache = cache_backend('analysis', max_items=ANALYSIS_CACHE_MAX_ITEMS, max_bytes=ANALYSIS_CACHE_MAX_BYTES)
+figure_cache = cache_backend('figures', max_items=FIGURE_CACHE_MAX_ITEMS, max_bytes=FIGURE_CACHE_MAX_BYTES)
+analysis_flights = SingleFlight()
+
+
+def _key_part(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        frame = value.to_frame() if isinstance(value, pd.Series) else value
+        return ('frame', frame_fingerprint(frame))
+    return value
+
+
+def memoize(cache=None):
+    def decorator(func):
+        signature = inspect.signature(func)
+        name = f"{func.__module__}.{func.__qualname__}"
+        counters = {'hits': 0, 'misses': 0, 'shared': 0}
+        counters_lock = threading.Lock()
+        
+        def count(name):
+            with counters_lock:
+                counters[name] += 1
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            store = cache if cache is not None else analysis_cache
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = make_key(name, tuple((arg, _key_part(value)) for arg, value in bound.arguments.items()))
+            
+            def remember(result):
+                if isinstance(result, pd.DataFrame) and not any(result is value for value in bound.arguments.values()):
+                    register_fingerprint(result, key)
+            
+            result = store.get(key, _MISSING)
+            if result is not _MISSING:
+                count('hits')
+                # A shared backend hands back a new object on every hit.
+                remember(result)
+                return result
+            
+            computed = []
+            
+            def compute():
+                # A flight that finished between the lookup above and this one
+                # has already filled the cache.
+                if key in store:
+                    result = store.get(key, _MISSING)
+                    if result is not _MISSING:
+                        remember(result)
+                        return result
+                computed.append(True)
+                result = func(*args, **kwargs)
+                remember(result)
+                store.set(key, result)
+                return result
+            
+            # Identical concurrent misses wait for one computation instead of
+            # each running their own.
+            result = analysis_flights.do(key, compute)
+            count('misses' if computed else 'shared')
+            return result
+        
+        def cache_info():
+            with counters_lock:
+                return dict(counters)
+        
+        def cache_clear():
+            with counters_lock:
+                counters['hits'] = counters['misses'] = counters['shared'] = 0
+        
+        wrapper.cache_info = cache_info
+        wrapper.cache_clear = cache_clear
+        return wrapper
+    
+    return decorator
@@ -0,0 +1,85 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+CATEGORY_COLUMNS = ("type", "datatype", "station", "attributes")
+VALUE_COLUMNS = ("value",)
+VALUE_TOLERANCE = 1e-3
+
+# GHCN-Daily quality flags; 0 means "passed all checks" (blank flag).
+QFLAGS = ("", "D", "G", "I", "K", "L", "M", "N", "O", "R", "S", "T", "W", "X", "Z")
+QFLAG_CODES = {flag: code for code, flag in enumerate(QFLAGS)}
+UNKNOWN_QFLAG = -1
+
+
+def memory_usage(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def encode_qflags(flags):
+    return np.asarray(pd.Series(flags).map(QFLAG_CODES).fillna(UNKNOWN_QFLAG), dtype=np.int8)
+
+
+def attribute_qflags(attributes):
+    # CDO GHCND attributes are "mflag,qflag,sflag,time"; the flag is decoded
+    # once per distinct string, and rows without attributes get UNKNOWN_QFLAG.
+    attributes = attributes.astype("category")
+    flags = attributes.cat.categories.astype(str).str.split(",").str[1].fillna("")
+    codes = np.append(encode_qflags(flags), np.int8(UNKNOWN_QFLAG))
+    return codes[attributes.cat.codes.to_numpy()]
+
+
+def fits_float32(values, tolerance=VALUE_TOLERANCE):
+    values = np.asarray(values, dtype=np.float64)
+    narrowed = values.astype(np.float32).astype(np.float64)
+    return bool(np.all((np.abs(narrowed - values) <= tolerance) | np.isnan(values)))
+
+
+def compact_frame(df, tolerance=VALUE_TOLERANCE):
+    if df.empty:
+        return df
+    
+    # Deep memory usage scans every object string, so it is only measured
+    # when the report is actually logged.
+    report = logger.isEnabledFor(logging.DEBUG)
+    before = memory_usage(df) if report else None
+    converted = {}
+    
+    for column in CATEGORY_COLUMNS:
+        if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            converted[column] = df[column].astype("category")
+    
+    for column in VALUE_COLUMNS:
+        if column in df.columns and df[column].dtype == np.float64 and fits_float32(df[column].values, tolerance):
+            converted[column] = df[column].astype(np.float32)
+    
+    if "qflag" in df.columns and df["qflag"].dtype != np.int8:
+        converted["qflag"] = encode_qflags(df["qflag"].astype(object).fillna(""))
+    elif "qflag" not in df.columns and "attributes" in df.columns:
+        converted["qflag"] = attribute_qflags(converted.get("attributes", df["attributes"]))
+    
+    if not converted:
+        return df
+    
+    result = df.assign(**converted)
+    if report:
+        logger.debug("Компактное представление: %.1f МБ -> %.1f МБ", before / 2 ** 20, memory_usage(result) / 2 ** 20)
+    return result
+
+
+def concat_frames(frames):
+    # pd.concat falls back to object dtype when categoricals differ, so the
+    # categories are unified first.
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame()
+    
+    for column in frames[0].columns:
+        if all(column in frame.columns and isinstance(frame[column].dtype, pd.CategoricalDtype) for frame in frames):
+            categories = pd.api.types.union_categoricals([frame[column].values for frame in frames]).categories
+            frames = [frame.assign(**{column: frame[column].cat.set_categories(categories)}) for frame in frames]
+    
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,36 @@
+from .cache import cache_backend, estimate_size, frame_fingerprint, make_key, register_fingerprint, SingleFlight
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class DatasetStore:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self._cache = cache_backend('datasets', max_bytes=max_bytes)
+
+    def put(self, df, key=None):
+        version = frame_fingerprint(df)
+        register_fingerprint(df, version)
+        if key is None:
+            key = version
+        # Entries are keyed by version as well, so a handle never resolves to
+        # a different frame, and the stored value is the bare frame a shared
+        # backend can keep as an Arrow file.
+        self._cache.set((key, version), df, size=estimate_size(df))
+        return {'key': key, 'version': version}
+
+    def get(self, handle):
+        if not handle:
+            return None
+        df = self._cache.get((handle.get('key'), handle.get('version')))
+        if df is not None:
+            # Known content: analyses keyed on this frame skip hashing it.
+            register_fingerprint(df, handle['version'])
+        return df
+
+    def stats(self):
+        return self._cache.stats()
+
+
+datasets = DatasetStore()
+# Loads of the same query share one read of the storage.
+dataset_flights = SingleFlight()
@@ -0,0 +1,62 @@
+import numpy as np
+
+DEFAULT_BINS = 30
+KDE_GRID = 512
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+def silverman_bandwidth(values):
+    std = values.std(ddof=1)
+    q1, q3 = np.quantile(values, [0.25, 0.75])
+    spread = min(std, (q3 - q1) / 1.34) or std
+    return 0.9 * spread * len(values) ** -0.2
+
+
+def binned_kde(values, grid_size=KDE_GRID, bandwidth=None):
+    # Gaussian KDE on a regular grid: values are binned once and the bin
+    # counts convolved with a sampled kernel, so the cost depends on the grid
+    # rather than on len(values) x grid_size kernel evaluations.
+    if len(values) < 2 or values.min() == values.max():
+        return np.array([]), np.array([])
+    
+    bandwidth = bandwidth or silverman_bandwidth(values)
+    low, high = values.min() - 3 * bandwidth, values.max() + 3 * bandwidth
+    counts, edges = np.histogram(values, bins=grid_size, range=(low, high))
+    step = edges[1] - edges[0]
+    
+    half_width = max(int(np.ceil(4 * bandwidth / step)), 1)
+    offsets = np.arange(-half_width, half_width + 1) * step
+    kernel = np.exp(-0.5 * (offsets / bandwidth) ** 2)
+    kernel /= kernel.sum()
+    
+    smoothed = np.convolve(counts, kernel, mode='full')[half_width:half_width + grid_size]
+    return (edges[:-1] + edges[1:]) / 2, smoothed / (len(values) * step)
+
+
+def summarize(values, bins=DEFAULT_BINS, grid_size=KDE_GRID):
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return None
+    
+    counts, edges = np.histogram(values, bins=bins)
+    q = dict(zip(QUANTILES, np.quantile(values, QUANTILES)))
+    iqr = q[0.75] - q[0.25]
+    grid, density = binned_kde(values, grid_size)
+    
+    return {
+        'count': len(values),
+        'mean': float(values.mean()),
+        'std': float(values.std(ddof=1)) if len(values) > 1 else 0.0,
+        'min': float(values.min()),
+        'max': float(values.max()),
+        'quantiles': {level: float(value) for level, value in q.items()},
+        # Box whiskers follow Tukey's rule: the furthest values within
+        # 1.5 IQR of the quartiles.
+        'lowerfence': float(values[values >= q[0.25] - 1.5 * iqr].min()),
+        'upperfence': float(values[values <= q[0.75] + 1.5 * iqr].max()),
+        'counts': counts,
+        'edges': edges,
+        'grid': grid,
+        'density': density
+    }
@@ -0,0 +1,163 @@
+import hashlib
+import os
+import pickle
+import stat
+import threading
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+from .storage import atomic_write
+
+ARROW_MAGIC = b"ARROW1"
+
+
+def private_directory(path):
+    # Entries are unpickled, so whoever can write here can run code in the
+    # workers: the directory must be ours and closed to everyone else.
+    path = Path(path)
+    path.mkdir(mode=0o700, parents=True, exist_ok=True)
+    info = os.lstat(path)
+    owned = not hasattr(os, "getuid") or info.st_uid == os.getuid()
+    if not stat.S_ISDIR(info.st_mode) or not owned or info.st_mode & 0o077:
+        raise PermissionError(f"Каталог кэша {path} должен принадлежать текущему пользователю и иметь права 700")
+    return path
+
+
+def _write_value(path, value):
+    if isinstance(value, pd.DataFrame):
+        try:
+            table = pa.Table.from_pandas(value)
+        except (pa.ArrowException, TypeError, ValueError):
+            table = None
+        if table is not None:
+            with pa.OSFile(str(path), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            return
+    
+    with open(path, "wb") as sink:
+        pickle.dump(value, sink, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _read_value(path):
+    with open(path, "rb") as source:
+        head = source.read(len(ARROW_MAGIC))
+        if head != ARROW_MAGIC:
+            source.seek(0)
+            return pickle.load(source)
+    
+    # Mapping the file spares the intermediate read buffer; to_pandas still
+    # copies the columns into this process.
+    return pa.ipc.open_file(pa.memory_map(str(path))).read_all().to_pandas()
+
+
+class FileCache:
+    # LRUCache-compatible cache in a directory shared by all processes on the
+    # host. DataFrames are stored as Arrow IPC files and read through mmap,
+    # anything else is pickled. Writes are atomic renames, so readers never see
+    # a partial entry; the least recently used files are removed once the
+    # directory grows past max_bytes.
+    def __init__(self, root, max_items=None, max_bytes=None):
+        self.root = private_directory(root)
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def _path(self, key):
+        return self.root / hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest()
+    
+    def get(self, key, default=None):
+        path = self._path(key)
+        try:
+            value = _read_value(path)
+        except (OSError, EOFError, pickle.UnpicklingError, pa.ArrowException):
+            with self._lock:
+                self.misses += 1
+            return default
+        
+        try:
+            # mtime is the recency used by eviction.
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return value
+    
+    def set(self, key, value, size=None):
+        # size is accepted for LRUCache compatibility; the file size is what counts.
+        try:
+            atomic_write(self._path(key), lambda tmp_path: _write_value(tmp_path, value))
+        except (pickle.PicklingError, TypeError, AttributeError):
+            # Values that cannot be serialized are simply not shared.
+            return
+        self._evict()
+    
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+    
+    def clear(self):
+        for _, _, path in self._entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    
+    def __contains__(self, key):
+        return self._path(key).exists()
+    
+    def __len__(self):
+        return len(self._entries())
+    
+    def stats(self):
+        entries = self._entries()
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'items': len(entries),
+                'bytes': sum(size for _, size, _ in entries)
+            }
+    
+    def _entries(self):
+        # Temporary files of writes in progress start with a dot and are skipped.
+        entries = []
+        with os.scandir(self.root) as scan:
+            for entry in scan:
+                if entry.name.startswith("."):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+    
+    def _evict(self):
+        if self.max_items is None and self.max_bytes is None:
+            return
+        
+        # Any process may evict; a file another worker removed first is just
+        # skipped, and readers holding it open keep their copy.
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        while len(entries) > 1 and (
+            (self.max_items is not None and len(entries) > self.max_items)
+            or (self.max_bytes is not None and total > self.max_bytes)
+        ):
+            _, size, path = entries.pop(0)
+            total -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            with self._lock:
+                self.evictions += 1
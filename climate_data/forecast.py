@@ -0,0 +1,153 @@
+import math
+from collections import namedtuple
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from .groups import group_codes
+
+YEAR_DAYS = 365.25
+DAY_NS = 86400 * 10 ** 9
+DEFAULT_HARMONICS = 1
+DEFAULT_LEVEL = 0.95
+
+SeriesFit = namedtuple('SeriesFit', [
+    'coefficients', 'inverse', 'sigma', 'dof', 'centre', 'seasonal', 'last', 'count', 'group_index'
+])
+
+
+def _features(days, centre, harmonics, seasonal):
+    # Trend on centred time in years keeps the normal equations well
+    # conditioned; harmonics use absolute time so the phase is calendar-bound.
+    columns = [np.ones(len(days)), (days - centre) / YEAR_DAYS]
+    for k in range(1, harmonics + 1):
+        angle = 2 * np.pi * k * days / YEAR_DAYS
+        columns.append(np.where(seasonal, np.sin(angle), 0.0))
+        columns.append(np.where(seasonal, np.cos(angle), 0.0))
+    return columns
+
+
+def t_quantile(p, dof):
+    # Upper quantile of Student's t (Hill, algorithm 396): exact for 1 and 2
+    # degrees of freedom, within 1e-5 of the tables from 3 on.
+    tail = 2 * (1 - p)
+    if dof == 1:
+        return math.cos(tail * math.pi / 2) / math.sin(tail * math.pi / 2)
+    if dof == 2:
+        return math.sqrt(2 / (tail * (2 - tail)) - 2)
+    
+    a = 1 / (dof - 0.5)
+    b = 48 / (a * a)
+    c = ((20700 * a / b - 98) * a - 16) * a + 96.36
+    d = ((94.5 / (b + c) - 3) / b + 1) * math.sqrt(a * math.pi / 2) * dof
+    x = d * tail
+    y = x ** (2 / dof)
+    if y > 0.05 + a:
+        x = NormalDist().inv_cdf(tail / 2)
+        y = x * x
+        if dof < 5:
+            c += 0.3 * (dof - 4.5) * (x + 0.6)
+        c = (((0.05 * d * x - 5) * x - 7) * x - 2) * x + b + c
+        y = (((((0.4 * y + 6.3) * y + 36) * y + 94.5) / c - y - 3) / b + 1) * x
+        y = math.expm1(a * y * y)
+    else:
+        y = ((1 / (((dof + 6) / (dof * y) - 0.089 * d - 0.822) * (dof + 2) * 3) + 0.5 / (dof + 4)) * y - 1) * (dof + 1) / (dof + 2) + 1 / y
+    return math.sqrt(dof * y)
+
+
+def _t_quantiles(p, dof):
+    # One quantile per distinct dof; NaN where nothing is left for the residuals.
+    result = np.full(len(dof), np.nan)
+    for value in np.unique(dof[dof > 0]):
+        result[dof == value] = t_quantile(p, int(value))
+    return result
+
+
+def fit_series(df, column='value', harmonics=DEFAULT_HARMONICS, by=None):
+    # Fits value ~ trend + annual harmonics per series with one batched solve
+    # of the normal equations; None when there is nothing to fit.
+    if df.empty or column not in df.columns or 'date' not in df.columns:
+        return None
+    
+    values = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+    valid = ~np.isnan(values)
+    codes, group_index = group_codes(df, by) if by is not None else (np.zeros(len(df), dtype=np.int64), None)
+    codes, values = codes[valid], values[valid]
+    timestamps = df['date'].values[valid].astype('datetime64[ns]').view(np.int64)
+    days = timestamps / DAY_NS
+    groups = int(codes.max()) + 1 if len(codes) else 0
+    if groups == 0:
+        return None
+    
+    count = np.bincount(codes, minlength=groups).astype(np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        centre = np.bincount(codes, days, minlength=groups) / count
+    by_series = pd.Series(timestamps).groupby(codes)
+    first = by_series.min().reindex(range(groups), fill_value=0).to_numpy()
+    last = by_series.max().reindex(range(groups), fill_value=0).to_numpy()
+    
+    # Harmonics are only fitted for series spanning a full year and long
+    # enough to leave residual degrees of freedom; for the others their
+    # features are zeroed and pinned to 0 by a unit diagonal.
+    parameters = 2 + 2 * harmonics
+    seasonal = (last - first >= YEAR_DAYS * DAY_NS) & (count > parameters)
+    used = np.where(seasonal, parameters, 2)
+    
+    features = _features(days, centre[codes], harmonics, seasonal[codes])
+    normal = np.zeros((groups, parameters, parameters))
+    moments = np.zeros((groups, parameters))
+    for i in range(parameters):
+        moments[:, i] = np.bincount(codes, features[i] * values, minlength=groups)
+        for j in range(i, parameters):
+            normal[:, i, j] = normal[:, j, i] = np.bincount(codes, features[i] * features[j], minlength=groups)
+    diagonal = np.arange(2, parameters)
+    normal[:, diagonal, diagonal] += ~seasonal[:, None]
+    
+    inverse = np.linalg.pinv(normal)
+    coefficients = np.einsum('gij,gj->gi', inverse, moments)
+    
+    residuals = values - sum(feature * coefficients[codes, i] for i, feature in enumerate(features))
+    dof = count - used
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sigma = np.sqrt(np.where(dof > 0, np.bincount(codes, residuals * residuals, minlength=groups) / dof, np.nan))
+    return SeriesFit(coefficients, inverse, sigma, dof, centre, seasonal, last, count, group_index)
+
+
+def forecast(df, column='value', horizon=30, harmonics=DEFAULT_HARMONICS, level=DEFAULT_LEVEL, by=None):
+    # Point forecasts from fit_series with prediction intervals from the
+    # residual variance and a Student-t quantile on the residual dof.
+    fit = fit_series(df, column, harmonics, by) if horizon >= 1 else None
+    if fit is None:
+        return pd.DataFrame()
+    coefficients, inverse, sigma, dof, centre, seasonal, last, count, group_index = fit
+    
+    # Future dates for every series at once: last observation plus 1..horizon
+    # days, the batched equivalent of pd.date_range(last, periods=horizon).
+    series = np.flatnonzero(count >= 2)
+    steps = np.tile(np.arange(1, horizon + 1), len(series))
+    series = np.repeat(series, horizon)
+    future_timestamps = last[series] + steps * DAY_NS
+    future_days = future_timestamps / DAY_NS
+    
+    future = _features(future_days, centre[series], harmonics, seasonal[series])
+    predicted = sum(feature * coefficients[series, i] for i, feature in enumerate(future))
+    design = np.stack(future, axis=1)
+    leverage = np.einsum('ni,nij,nj->n', design, inverse[series], design)
+    quantile = _t_quantiles(0.5 + level / 2, dof)
+    margin = quantile[series] * sigma[series] * np.sqrt(1 + leverage)
+    
+    dtype = np.float32 if df[column].dtype == np.float32 else np.float64
+    result = pd.DataFrame({
+        'date': future_timestamps.view('datetime64[ns]'),
+        column: predicted.astype(dtype),
+        'lower': (predicted - margin).astype(dtype),
+        'upper': (predicted + margin).astype(dtype)
+    })
+    
+    if by is not None:
+        keys = group_index[series].to_frame(index=False)
+        result = pd.concat([keys, result], axis=1)
+    if 'type' not in result.columns:
+        result['type'] = f'{column}_forecast'
+    return result
@@ -0,0 +1,164 @@
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .compact import concat_frames, QFLAG_CODES
+from .storage import get_store, PartitionStore
+
+DLY_LINE_WIDTH = 269
+MISSING_VALUE = -9999
+DEFAULT_CHUNK_BYTES = 32 * 1024 * 1024
+
+# Elements reported in tenths of their unit (°C, mm, m/s).
+TENTHS_ELEMENTS = {"TMAX", "TMIN", "TAVG", "PRCP", "AWND", "EVAP", "MNPN", "MXPN", "WESD", "WESF"}
+
+_DAY_OFFSETS = 21 + 8 * np.arange(31)
+
+_QFLAG_TABLE = np.full(256, -1, dtype=np.int8)
+for _flag, _code in QFLAG_CODES.items():
+    _QFLAG_TABLE[ord(_flag or " ")] = _code
+# Short lines are null-padded; a padded flag is a blank flag.
+_QFLAG_TABLE[0] = QFLAG_CODES[""]
+
+STATION_COLSPECS = [(0, 11), (12, 20), (21, 30), (31, 37), (38, 40), (41, 71), (72, 75), (76, 79), (80, 85)]
+STATION_COLUMNS = ["id", "latitude", "longitude", "elevation", "state", "name", "gsn_flag", "hcn_flag", "wmo_id"]
+
+
+def _parse_ints(chars):
+    # chars: uint8 array whose last axis holds right-justified ASCII digits,
+    # optionally preceded by '-' and padded with spaces.
+    digits = chars.astype(np.int32) - ord("0")
+    is_digit = (digits >= 0) & (digits <= 9)
+    result = np.zeros(chars.shape[:-1], dtype=np.int32)
+    for position in range(chars.shape[-1]):
+        result = np.where(is_digit[..., position], result * 10 + digits[..., position], result)
+    negative = (chars == ord("-")).any(axis=-1)
+    return np.where(negative, -result, result)
+
+
+def _as_strings(chars):
+    return np.ascontiguousarray(chars).view(f"S{chars.shape[1]}").ravel()
+
+
+def _decode_categorical(raw):
+    codes, uniques = pd.factorize(raw)
+    return pd.Categorical.from_codes(codes, [value.decode("ascii").strip() for value in uniques])
+
+
+def parse_dly_block(block, elements=None):
+    lines = np.array(block.split(b"\n"), dtype=f"S{DLY_LINE_WIDTH}")
+    lines = lines[np.char.str_len(lines) >= 21]
+    if len(lines) == 0:
+        return pd.DataFrame(columns=["date", "value", "type", "station", "qflag"])
+    
+    chars = lines.view(np.uint8).reshape(len(lines), DLY_LINE_WIDTH)
+    
+    element_raw = _as_strings(chars[:, 17:21])
+    if elements is not None:
+        keep = np.isin(element_raw, [element.encode("ascii") for element in elements])
+        chars, element_raw = chars[keep], element_raw[keep]
+    
+    years = _parse_ints(chars[:, 11:15])
+    months = _parse_ints(chars[:, 15:17])
+    value_chars = chars[:, _DAY_OFFSETS[:, None] + np.arange(5)]
+    values = _parse_ints(value_chars)
+    # Short lines are null-padded; a value field without any digit is missing.
+    values[~((value_chars >= ord("0")) & (value_chars <= ord("9"))).any(axis=-1)] = MISSING_VALUE
+    qflags = chars[:, _DAY_OFFSETS + 6]
+    
+    month_start = ((years - 1970) * 12 + months - 1).astype("datetime64[M]")
+    month_length = ((month_start + 1).astype("datetime64[D]") - month_start.astype("datetime64[D]")).astype(np.int32)
+    dates = month_start.astype("datetime64[D]")[:, None] + np.arange(31)
+    
+    valid = (values != MISSING_VALUE) & (np.arange(31) < month_length[:, None])
+    row_index, day_index = np.nonzero(valid)
+    
+    element = _decode_categorical(element_raw)
+    scale = np.where(np.isin(np.asarray(element), list(TENTHS_ELEMENTS)), 0.1, 1.0)
+    
+    return pd.DataFrame({
+        "date": dates[row_index, day_index].astype("datetime64[ns]"),
+        "value": (values[row_index, day_index] * scale[row_index]).astype(np.float32),
+        "type": element[row_index],
+        "station": _decode_categorical(_as_strings(chars[:, 0:11]))[row_index],
+        "qflag": _QFLAG_TABLE[qflags[row_index, day_index]]
+    })
+
+
+def iter_dly(path, elements=None, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    with open(path, "rb") as source:
+        while True:
+            block = source.read(chunk_bytes)
+            if not block:
+                break
+            block += source.readline()
+            yield parse_dly_block(block, elements)
+
+
+def read_dly(path, elements=None):
+    frames = list(iter_dly(path, elements))
+    data = concat_frames(frames)
+    return data if not data.empty else parse_dly_block(b"")
+
+
+def read_stations(path):
+    stations = pd.read_fwf(path, colspecs=STATION_COLSPECS, names=STATION_COLUMNS, dtype={"wmo_id": str})
+    return stations.fillna({"state": "", "gsn_flag": "", "hcn_flag": "", "wmo_id": ""})
+
+
+def load_dly_files(paths, store=None, elements=None, dataset="GHCND", chunk_bytes=DEFAULT_CHUNK_BYTES):
+    store = store if store is not None else get_store()
+    started = time.perf_counter()
+    stats = {"files": 0, "rows": 0}
+    
+    for path in paths:
+        for chunk in iter_dly(path, elements, chunk_bytes):
+            if chunk.empty:
+                continue
+            chunk = chunk.rename(columns={"type": "datatype"})
+            chunk["station"] = chunk["station"].cat.rename_categories(lambda station: f"{dataset}:{station}")
+            for (datatype, station), rows in chunk.groupby(["datatype", "station"], observed=True):
+                store.merge(dataset, datatype, station, rows.astype({"datatype": str, "station": str}))
+            stats["rows"] += len(chunk)
+        stats["files"] += 1
+    
+    stats["seconds"] = time.perf_counter() - started
+    stats["rows_per_second"] = stats["rows"] / stats["seconds"] if stats["seconds"] > 0 else 0.0
+    return stats
+
+
+def _expand_paths(paths):
+    for path in map(Path, paths):
+        if path.is_dir():
+            yield from sorted(path.glob("*.dly"))
+        else:
+            yield path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Загрузка файлов GHCN-Daily (.dly) в локальное хранилище")
+    parser.add_argument("paths", nargs="+", help="файлы .dly или каталоги с ними")
+    parser.add_argument("--elements", nargs="+", default=None)
+    parser.add_argument("--stations", default=None, help="путь к ghcnd-stations.txt")
+    parser.add_argument("--data-dir", default=None)
+    args = parser.parse_args(argv)
+    
+    store = PartitionStore(args.data_dir) if args.data_dir else get_store()
+    
+    if args.stations:
+        stations = read_stations(args.stations)
+        target = store.root / "GHCND" / "stations.parquet"
+        target.parent.mkdir(parents=True, exist_ok=True)
+        stations.to_parquet(target, index=False)
+        print(f"Станций: {len(stations)}")
+    
+    stats = load_dly_files(_expand_paths(args.paths), store=store, elements=args.elements)
+    print(f"Файлов: {stats['files']}, строк: {stats['rows']}, "
+          f"{stats['seconds']:.1f} с ({stats['rows_per_second']:.0f} строк/с)")
+
+
+if __name__ == "__main__":
+    main()
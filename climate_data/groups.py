@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+
+def group_codes(df, by):
+    # Integer code per row for the (station, type, ...) series it belongs to,
+    # plus the key values of each code, in order of first appearance.
+    # Factorizing column by column is much cheaper than groupby().ngroup().
+    columns = [by] if isinstance(by, str) else list(by)
+    codes = np.zeros(len(df), dtype=np.int64)
+    for column in columns:
+        column_codes, uniques = pd.factorize(df[column], use_na_sentinel=False)
+        codes = codes * len(uniques) + column_codes
+    codes, uniques = pd.factorize(codes)
+    
+    first_rows = np.empty(len(uniques), dtype=np.int64)
+    first_rows[codes[::-1]] = np.arange(len(df) - 1, -1, -1)
+    keys = df[columns].iloc[first_rows]
+    group_index = pd.Index(keys[columns[0]]) if len(columns) == 1 else pd.MultiIndex.from_frame(keys)
+    return codes, group_index
+
+
+def group_order(df, codes):
+    # Rows ordered by series, then by date within each series: dates are
+    # ranked first so both keys fit one integer and a single sort.
+    date_rank, dates = pd.factorize(df['date'].values, sort=True)
+    return np.argsort(codes * len(dates) + date_rank, kind='stable')
+
+
+def positions_in_group(sorted_codes):
+    starts = np.r_[True, sorted_codes[1:] != sorted_codes[:-1]]
+    first = np.maximum.accumulate(np.where(starts, np.arange(len(sorted_codes)), 0))
+    return np.arange(len(sorted_codes)) - first
+
@@ -1,127 +1,238 @@
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
 
+from .anomalies import expanding_scores, SEASONAL_BUCKETS, seasonal_keys
+from .cache import memoize
+from .distribution import DEFAULT_BINS, summarize
+from .forecast import DEFAULT_HARMONICS, DEFAULT_LEVEL, forecast
+from .groups import group_codes, group_order, positions_in_group
+from .rolling import DEFAULT_WINDOWS, RollingEngine
+from .seasonality import seasonal_matrix
+from .trends import GRANULARITIES, TrendEngine, day_keys, month_keys, week_keys, year_keys
 
-def calculate_moving_average(df, window_size=12):
+
+def _like(values, source):
+    # Keeps float32 inputs float32 instead of letting pandas/NumPy upcast results.
+    if source.dtype == np.float32:
+        return values.astype(np.float32)
+    return values
+
+
+def _sorted_by_date(df, by=None):
+    if by is None:
+        if df['date'].is_monotonic_increasing:
+            return df
+        return df.sort_values('date')
+    
+    order = group_order(df, group_codes(df, by)[0])
+    if np.all(order[1:] > order[:-1]):
+        return df
+    return df.iloc[order]
+
+
+def _with_columns(df, columns, copy=False):
+    # Without copy the result shares the input's column data and only the new
+    # columns are allocated; callers must treat both frames as read-only.
+    # The columns come from memoized results, so a copy copies them too.
+    result = df.copy(deep=copy)
+    for name, values in columns.items():
+        result[name] = values.copy() if copy and hasattr(values, 'copy') else values
+    return result
+
+
+@memoize()
+def moving_average_columns(df, window_size=12, column='value', by=None):
+    if df.empty or 'date' not in df.columns or column not in df.columns:
+        return pd.DataFrame(index=df.index)
+    
+    if by is None:
+        order = np.argsort(df['date'].values, kind='stable')
+    else:
+        codes = group_codes(df, by)[0]
+        order = group_order(df, codes)
+    values = df[column].values[order]
+    averaged = pd.Series(values).rolling(window=window_size).mean().values
+    
+    if by is not None:
+        # One rolling pass over the series laid end to end; windows that reach
+        # back into the previous series are exactly the first window_size - 1
+        # rows of each series, which a per-series rolling leaves empty anyway.
+        averaged[positions_in_group(codes[order]) < window_size - 1] = np.nan
+    
+    moving_avg = np.empty(len(df), dtype=averaged.dtype)
+    moving_avg[order] = averaged
+    return pd.DataFrame({'moving_avg': _like(moving_avg, df[column])}, index=df.index)
+
+
+def calculate_moving_average(df, window_size=12, copy=False, by=None):
+    # Not memoized itself: every call gets its own frame, only the columns
+    # are shared through the cache. They are keyed on the caller's frame and
+    # sorted afterwards, so a frame already fingerprinted is not hashed again.
     if df.empty:
         return pd.DataFrame()
     
-    temp_df = df.copy()
-    if 'date' in temp_df.columns and 'value' in temp_df.columns:
-        temp_df = temp_df.sort_values('date')
-        temp_df['moving_avg'] = temp_df['value'].rolling(window=window_size).mean()
+    if 'date' not in df.columns or 'value' not in df.columns:
+        return df.copy(deep=copy)
     
-    return temp_df
+    return _sorted_by_date(_with_columns(df, moving_average_columns(df, window_size, by=by), copy), by)
 
 
-def normalize_data(df, column='value'):
+@memoize()
+def rolling_columns(df, windows=DEFAULT_WINDOWS, statistics=('mean',), quantiles=(), min_periods=1, column='value'):
+    if df.empty or 'date' not in df.columns or column not in df.columns:
+        return pd.DataFrame(index=df.index)
+    
+    return RollingEngine(windows, statistics, quantiles, min_periods, column).compute(df)
+
+
+def calculate_rolling(df, windows=DEFAULT_WINDOWS, statistics=('mean',), quantiles=(), min_periods=1, copy=False):
+    # Time-based windows ('30D') instead of row counts, so gaps in the
+    # series shrink a window rather than stretching it.
+    if df.empty:
+        return pd.DataFrame()
+    
+    if 'date' not in df.columns or 'value' not in df.columns:
+        return df.copy(deep=copy)
+    
+    columns = rolling_columns(df, tuple(windows), tuple(statistics), tuple(quantiles), min_periods)
+    return _sorted_by_date(_with_columns(df, columns, copy))
+
+
+def normalize_data(df, column='value', copy=False):
     if df.empty or column not in df.columns:
         return df
     
-    temp_df = df.copy()
-    min_val = temp_df[column].min()
-    max_val = temp_df[column].max()
+    min_val = df[column].min()
+    max_val = df[column].max()
     
     if max_val > min_val:
-        temp_df[f'{column}_normalized'] = (temp_df[column] - min_val) / (max_val - min_val)
+        normalized = _like((df[column] - min_val) / (max_val - min_val), df[column])
     else:
-        temp_df[f'{column}_normalized'] = 0
+        normalized = 0
     
-    return temp_df
+    return _with_columns(df, {f'{column}_normalized': normalized}, copy)
+
+
+@memoize()
+def anomaly_columns(df, column='value', threshold=2, seasonal=None, by=None):
+    # Same definition as OnlineAnomalyDetector, so the dashboard and the sync
+    # job flag the same points: each value is scored against the expanding
+    # statistics of its series and calendar bucket (month or day of year, so
+    # summer highs are not flagged just for being summer) up to itself.
+    if df.empty or 'date' not in df.columns or column not in df.columns:
+        return pd.DataFrame(index=df.index)
+    
+    if by is None:
+        codes = np.zeros(len(df), dtype=np.int64)
+        order = np.argsort(df['date'].values, kind='stable')
+    else:
+        codes = group_codes(df, by)[0]
+        order = group_order(df, codes)
+    values = df[column].to_numpy(dtype=np.float64, na_value=np.nan)[order]
+    keys = codes[order] * SEASONAL_BUCKETS + seasonal_keys(df['date'].values[order], seasonal)
+    valid = ~np.isnan(values)
+    
+    z_score = np.full(len(df), np.nan)
+    z_score[order[valid]] = expanding_scores(values[valid], keys[valid])[0]
+    z_score = _like(z_score, df[column])
+    return pd.DataFrame({'z_score': z_score, 'is_anomaly': np.abs(z_score) > threshold}, index=df.index)
 
 
-def detect_anomalies(df, column='value', threshold=2):
+def detect_anomalies(df, column='value', threshold=2, copy=False, seasonal=None, by=None):
     if df.empty or column not in df.columns:
         return df
     
-    temp_df = df.copy()
-    mean_val = temp_df[column].mean()
-    std_val = temp_df[column].std()
-    
-    if std_val > 0:
-        temp_df['z_score'] = (temp_df[column] - mean_val) / std_val
-        temp_df['is_anomaly'] = abs(temp_df['z_score']) > threshold
-    else:
-        temp_df['z_score'] = 0
-        temp_df['is_anomaly'] = False
-    
-    return temp_df
+    return _with_columns(df, anomaly_columns(df, column, threshold, seasonal, by), copy)
 
 
+@memoize()
 def compute_trends(df, column='value', periods=None):
     if df.empty or column not in df.columns or 'date' not in df.columns:
         return None
     
-    temp_df = df.copy().sort_values('date')
-    
     if periods is None:
-        periods = {
-            'yearly': 365,
-            'monthly': 30,
-            'weekly': 7
-        }
-    
-    result = {}
-    
-    for period_name, days in periods.items():
-        period_df = temp_df.copy()
-        period_df['period'] = period_df['date'].dt.to_period('Y' if period_name == 'yearly' else 'M' if period_name == 'monthly' else 'W')
-        period_stats = period_df.groupby('period')[column].agg(['mean', 'std', 'min', 'max'])
-        
-        period_change = None
-        if len(period_stats) > 1:
-            first_period = period_stats.iloc[0]['mean']
-            last_period = period_stats.iloc[-1]['mean']
-            period_change = ((last_period - first_period) / first_period) * 100 if first_period != 0 else np.nan
-        
-        result[period_name] = {
-            'stats': period_stats,
-            'change_percent': period_change
-        }
+        periods = GRANULARITIES
     
-    return result
+    # Granularities are computed lazily by the engine, so only the requested
+    # ones (and the finer levels they roll up from) cost anything.
+    return TrendEngine(df, column).trends(list(periods))
 
 
-def forecast_simple(df, column='value', forecast_days=30):
+@memoize()
+def group_trends(df, column='value', by='station', granularity='yearly'):
     if df.empty or column not in df.columns or 'date' not in df.columns:
         return pd.DataFrame()
     
-    temp_df = df.copy().sort_values('date')
+    codes, group_index = group_codes(df, by)
+    days = day_keys(df['date'].values)
+    if granularity == 'yearly':
+        periods = year_keys(month_keys(days))
+    elif granularity == 'monthly':
+        periods = month_keys(days)
+    elif granularity == 'weekly':
+        periods = week_keys(days)
+    else:
+        periods = days
+    
+    # Period means for every series at once, then first/last and the
+    # least-squares slope per series from grouped sums of centred values.
+    means = df[column].astype(np.float64).groupby([codes, periods]).mean().dropna()
+    series = means.index.get_level_values(0).to_numpy()
+    x = means.index.get_level_values(1).to_numpy().astype(np.float64)
+    y = means.to_numpy()
+    
+    by_series = pd.DataFrame({'x': x, 'y': y}).groupby(series)
+    x_centered = x - by_series['x'].transform('mean').to_numpy()
+    y_centered = y - by_series['y'].transform('mean').to_numpy()
+    sums = pd.DataFrame({'xy': x_centered * y_centered, 'xx': x_centered * x_centered}).groupby(series).sum()
+    
+    first = by_series['y'].first()
+    last = by_series['y'].last()
+    count = by_series['y'].size()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        change_percent = ((last - first) / first * 100).where((first != 0) & (count > 1))
+        slope = (sums['xy'] / sums['xx']).where(count > 1)
+    
+    result = pd.DataFrame({
+        'periods': count,
+        'mean': by_series['y'].mean(),
+        'first': first,
+        'last': last,
+        'change_percent': change_percent,
+        'slope': slope
+    })
+    result.index = group_index[result.index]
+    return result
+
+
+@memoize()
+def distribution_summary(df, column='value', bins=DEFAULT_BINS):
+    # Bin counts, KDE and box statistics for the distribution tab; memoized on
+    # the frame fingerprint, so each dataset version is summarized once.
+    if df.empty or column not in df.columns:
+        return None
     
-    if len(temp_df) < 2:
+    return summarize(df[column].to_numpy(dtype=np.float64, na_value=np.nan), bins)
+
+
+@memoize()
+def seasonality_matrix(df, column='value', resolution='month'):
+    if df.empty or column not in df.columns or 'date' not in df.columns:
         return pd.DataFrame()
     
-    last_date = temp_df['date'].max()
-    
-    x = np.arange(len(temp_df))
-    y = temp_df[column].values
-    
-    coeffs = np.polyfit(x, y, 1)
-    poly = np.poly1d(coeffs)
-    
-    future_dates = [last_date + timedelta(days=i+1) for i in range(forecast_days)]
-    future_x = np.arange(len(temp_df), len(temp_df) + forecast_days)
-    future_y = poly(future_x)
-    
-    forecast_df = pd.DataFrame({
-        'date': future_dates,
-        column: future_y,
-        'type': f'{column}_forecast'
-    })
+    return seasonal_matrix(df, column, resolution)
+
+
+@memoize()
+def forecast_simple(df, column='value', forecast_days=30, by=None, harmonics=DEFAULT_HARMONICS, level=DEFAULT_LEVEL):
+    if df.empty or column not in df.columns or 'date' not in df.columns:
+        return pd.DataFrame()
     
-    return forecast_df
+    return forecast(df, column, forecast_days, harmonics, level, by)
 
 
 def aggregate_by_type(df):
     if df.empty or 'type' not in df.columns:
         return {}
     
-    result = {}
-    types = df['type'].unique()
-    
-    for data_type in types:
-        type_df = df[df['type'] == data_type].copy()
-        result[data_type] = type_df
-    
-    return result 
\ No newline at end of file
+    return {data_type: type_df for data_type, type_df in df.groupby('type', observed=True, sort=False)} 
\ No newline at end of file
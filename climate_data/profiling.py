@@ -0,0 +1,38 @@
+import functools
+import logging
+import os
+import threading
+import tracemalloc
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MEMORY = os.environ.get("CLIMATEVIZ_PROFILE_MEMORY", "") == "1"
+
+peak_memory = {}
+_lock = threading.Lock()
+
+
+def track_peak_memory(func):
+    # tracemalloc is process-wide, so concurrent callbacks inflate each other's
+    # peaks; the numbers are meant for single-user profiling runs.
+    if not PROFILE_MEMORY:
+        return func
+    
+    name = func.__name__
+    
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with _lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        try:
+            return func(*args, **kwargs)
+        finally:
+            peak = tracemalloc.get_traced_memory()[1] - baseline
+            with _lock:
+                peak_memory[name] = peak
+            logger.info("%s: пиковое потребление памяти %.1f МБ", name, peak / 2 ** 20)
+    
+    return wrapper
@@ -0,0 +1,49 @@
+import threading
+import time
+from datetime import datetime, timezone
+
+
+class QuotaExceededError(Exception):
+    pass
+
+
+class RateLimiter:
+    def __init__(self, rate=5, per=1.0, daily_limit=10000):
+        self.rate = rate
+        self.per = per
+        self.daily_limit = daily_limit
+        self._tokens = float(rate)
+        self._updated = time.monotonic()
+        self._day = None
+        self._used_today = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                self._count_daily()
+                now = time.monotonic()
+                self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate / self.per)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    self._used_today += 1
+                    return
+                wait = (1 - self._tokens) * self.per / self.rate
+            time.sleep(wait)
+
+    def remaining_today(self):
+        with self._lock:
+            if self.daily_limit is None:
+                return None
+            if self._day != datetime.now(timezone.utc).date():
+                return self.daily_limit
+            return max(self.daily_limit - self._used_today, 0)
+
+    def _count_daily(self):
+        today = datetime.now(timezone.utc).date()
+        if self._day != today:
+            self._day = today
+            self._used_today = 0
+        if self.daily_limit is not None and self._used_today >= self.daily_limit:
+            raise QuotaExceededError(f"Исчерпан суточный лимит запросов ({self.daily_limit})")
@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+
+DEFAULT_WINDOWS = ('7D', '30D', '365D')
+STATISTICS = ('mean', 'std', 'count', 'min', 'max')
+MIN_WINDOW_POINTS = 3
+
+
+def column_name(statistic, window):
+    if isinstance(statistic, float):
+        statistic = f"q{statistic * 100:g}"
+    return f"{statistic}_{window}"
+
+
+def rolling_windows(dates, windows=DEFAULT_WINDOWS, min_points=MIN_WINDOW_POINTS):
+    # A window spanning fewer than a few sample spacings mostly holds one
+    # point (7D over monthly data or weekly rollups): its mean is the value
+    # itself and its std is NaN. Such windows are dropped, and if none is
+    # left a single window of min_points spacings is used.
+    days = np.unique(np.asarray(dates, dtype='datetime64[D]'))
+    if len(days) < 2:
+        return tuple(windows)
+    
+    spacing = float(np.median(np.diff(days).astype(np.int64)))
+    kept = tuple(window for window in windows if pd.Timedelta(window) >= pd.Timedelta(days=min_points * spacing))
+    return kept or (f"{int(np.ceil(min_points * spacing))}D",)
+
+
+def _output_dtype(series):
+    # Statistics are computed in float64 but handed back in the input's float
+    # precision, so float32 data stays float32; other inputs give float64.
+    dtype = series.dtype
+    return dtype if isinstance(dtype, np.dtype) and dtype.kind == 'f' else np.dtype(np.float64)
+
+
+def _window_starts(times, window):
+    # Time-based windows are (t - window, t], matching pandas' closed='right'.
+    return np.searchsorted(times, times - window, side='right')
+
+
+class RollingEngine:
+    # Sorts once, then serves mean/std/count for every window from shared
+    # prefix sums (O(n) per window) and min/max/quantiles from pandas'
+    # time-based rolling over the same sorted series.
+    def __init__(self, windows=DEFAULT_WINDOWS, statistics=('mean',), quantiles=(), min_periods=1, column='value'):
+        unknown = set(statistics) - set(STATISTICS)
+        if unknown:
+            raise ValueError(f"Неизвестные статистики: {', '.join(sorted(unknown))}")
+        self.windows = [pd.Timedelta(window) for window in windows]
+        self.labels = list(windows)
+        self.statistics = tuple(statistics)
+        self.quantiles = tuple(float(q) for q in quantiles)
+        self.min_periods = min_periods
+        self.column = column
+        self._tail_dates = np.array([], dtype='datetime64[ns]')
+        self._tail_values = np.array([], dtype=np.float64)
+    
+    @property
+    def columns(self):
+        return [column_name(statistic, label) for label in self.labels for statistic in self.statistics + self.quantiles]
+    
+    def compute(self, df):
+        if df.empty:
+            return pd.DataFrame(columns=self.columns, index=df.index)
+        
+        dates = df['date'].values.astype('datetime64[ns]')
+        values = df[self.column].to_numpy(dtype=np.float64, na_value=np.nan)
+        order = np.argsort(dates, kind='stable')
+        dtype = _output_dtype(df[self.column])
+        
+        columns = self._compute_sorted(dates[order], values[order])
+        result = {}
+        for name, sorted_values in columns.items():
+            unsorted = np.empty(len(df), dtype=dtype if sorted_values.dtype.kind == 'f' else sorted_values.dtype)
+            unsorted[order] = sorted_values
+            result[name] = unsorted
+        return pd.DataFrame(result, index=df.index)
+    
+    def append(self, df):
+        # Keeps the rows of the longest window preceding the newest date, so
+        # each call costs O(chunk + window) and gives the same values as
+        # compute() over everything appended so far.
+        if df.empty:
+            return pd.DataFrame(columns=self.columns, index=df.index)
+        
+        dates = df['date'].values.astype('datetime64[ns]')
+        if len(self._tail_dates) and dates.min() < self._tail_dates[-1]:
+            raise ValueError("Новые строки не должны быть старше уже добавленных")
+        
+        values = df[self.column].to_numpy(dtype=np.float64, na_value=np.nan)
+        order = np.argsort(dates, kind='stable')
+        dtype = _output_dtype(df[self.column])
+        dates = np.concatenate([self._tail_dates, dates[order]])
+        values = np.concatenate([self._tail_values, values[order]])
+        
+        offset = len(self._tail_dates)
+        columns = self._compute_sorted(dates, values)
+        result = {}
+        for name, sorted_values in columns.items():
+            unsorted = np.empty(len(df), dtype=dtype if sorted_values.dtype.kind == 'f' else sorted_values.dtype)
+            unsorted[order] = sorted_values[offset:]
+            result[name] = unsorted
+        
+        keep = dates > dates[-1] - max(self.windows)
+        self._tail_dates = dates[keep]
+        self._tail_values = values[keep]
+        return pd.DataFrame(result, index=df.index)
+    
+    def _compute_sorted(self, dates, values):
+        valid = ~np.isnan(values)
+        offset = values[valid].mean() if valid.any() else 0.0
+        shifted = np.where(valid, values - offset, 0.0)
+        
+        prefix_count = np.r_[0, np.cumsum(valid)]
+        prefix_sum = np.r_[0.0, np.cumsum(shifted)]
+        prefix_sq = np.r_[0.0, np.cumsum(shifted * shifted)]
+        
+        ends = np.arange(1, len(values) + 1)
+        times = dates.view(np.int64)
+        series = pd.Series(values, index=pd.DatetimeIndex(dates))
+        
+        result = {}
+        for window, label in zip(self.windows, self.labels):
+            starts = _window_starts(times, window.value)
+            count = prefix_count[ends] - prefix_count[starts]
+            total = prefix_sum[ends] - prefix_sum[starts]
+            enough = count >= max(self.min_periods, 1)
+            
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = total / count
+                variance = (prefix_sq[ends] - prefix_sq[starts] - total * mean) / (count - 1)
+            
+            for statistic in self.statistics:
+                if statistic == 'mean':
+                    column = np.where(enough, mean + offset, np.nan)
+                elif statistic == 'std':
+                    column = np.where(enough & (count > 1), np.sqrt(np.maximum(variance, 0)), np.nan)
+                elif statistic == 'count':
+                    column = count
+                else:
+                    rolling = series.rolling(window, min_periods=self.min_periods)
+                    column = getattr(rolling, statistic)().to_numpy()
+                result[column_name(statistic, label)] = column
+            
+            for quantile in self.quantiles:
+                rolling = series.rolling(window, min_periods=self.min_periods)
+                result[column_name(quantile, label)] = rolling.quantile(quantile).to_numpy()
+        
+        return result
@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+
+# Finest first; the second field is the approximate period length in days,
+# used to estimate how many points a level yields for a date range.
+# "day" is the raw partitions themselves.
+LEVELS = (("day", 1), ("week", 7), ("month", 30.44), ("year", 365.25))
+RAW_LEVEL = "day"
+ROLLUP_LEVELS = tuple(name for name, _ in LEVELS if name != RAW_LEVEL)
+ROLLUP_COLUMNS = ("date", "value", "min", "max", "count")
+DEFAULT_MIN_POINTS = 1000
+
+
+def period_start(dates, level):
+    days = np.asarray(dates, dtype="datetime64[D]")
+    if level == "week":
+        # 1970-01-01 was a Thursday; weeks start on Monday.
+        offset = (days.astype(np.int64) + 3) % 7
+        return days - offset.astype("timedelta64[D]")
+    if level == "month":
+        return days.astype("datetime64[M]").astype("datetime64[D]")
+    if level == "year":
+        return days.astype("datetime64[Y]").astype("datetime64[D]")
+    raise ValueError(f"Неизвестный уровень агрегации: {level}")
+
+
+def period_end(dates, level):
+    # Last day of the period each date falls into.
+    starts = period_start(dates, level)
+    if level == "week":
+        return starts + np.timedelta64(6, "D")
+    unit = "M" if level == "month" else "Y"
+    return (starts.astype(f"datetime64[{unit}]") + 1).astype("datetime64[D]") - np.timedelta64(1, "D")
+
+
+def finer(level, other):
+    # True when level has shorter periods than other: day < week < month < year.
+    names = [name for name, _ in LEVELS]
+    return names.index(level) < names.index(other)
+
+
+def combine_stations(df):
+    # One row per type and date across all stations: the mean weighted by
+    # the number of daily values behind each row, the lowest min, the
+    # highest max and the summed count. A single station is left as is.
+    if df.empty or "station" not in df.columns or df["station"].nunique() < 2:
+        return df
+    
+    keys = [column for column in ("type", "date") if column in df.columns]
+    values = df["value"].to_numpy(dtype=np.float64, na_value=np.nan)
+    counts = df["count"].to_numpy(dtype=np.int64) if "count" in df.columns else np.ones(len(df), dtype=np.int64)
+    valid = ~np.isnan(values) & (counts > 0)
+    
+    parts = df.loc[valid, keys].assign(weighted=values[valid] * counts[valid], count=counts[valid])
+    aggregations = {"weighted": "sum", "count": "sum"}
+    for column in ("min", "max"):
+        if column in df.columns:
+            parts[column] = df.loc[valid, column]
+            aggregations[column] = column
+    combined = parts.groupby(keys, observed=True, sort=True).agg(aggregations).reset_index()
+    combined["value"] = (combined["weighted"] / combined["count"]).astype(df["value"].dtype)
+    
+    columns = [column for column in df.columns if column != "station" and column in combined.columns]
+    return combined[columns]
+
+
+def empty_rollup():
+    return pd.DataFrame({
+        "date": pd.Series(dtype="datetime64[ns]"),
+        "value": pd.Series(dtype="float64"),
+        "min": pd.Series(dtype="float64"),
+        "max": pd.Series(dtype="float64"),
+        "count": pd.Series(dtype="int64")
+    })
+
+
+def rollup(df, level):
+    # Mean, min, max and count per period. Takes raw daily rows or a finer
+    # rollup alike: means are re-weighted by count, so months roll up into
+    # years exactly.
+    values = df["value"].to_numpy(dtype=np.float64, na_value=np.nan)
+    counts = df["count"].to_numpy(dtype=np.int64) if "count" in df.columns else np.ones(len(df), dtype=np.int64)
+    lows = df["min"].to_numpy(dtype=np.float64, na_value=np.nan) if "min" in df.columns else values
+    highs = df["max"].to_numpy(dtype=np.float64, na_value=np.nan) if "max" in df.columns else values
+    
+    valid = ~np.isnan(values) & (counts > 0)
+    if not valid.any():
+        return empty_rollup()
+    
+    periods, codes = np.unique(period_start(df["date"].values[valid], level), return_inverse=True)
+    weights = counts[valid]
+    count = np.bincount(codes, weights=weights)
+    total = np.bincount(codes, weights=values[valid] * weights)
+    low = np.full(len(periods), np.inf)
+    high = np.full(len(periods), -np.inf)
+    np.minimum.at(low, codes, lows[valid])
+    np.maximum.at(high, codes, highs[valid])
+    
+    return pd.DataFrame({
+        "date": periods.astype("datetime64[ns]"),
+        "value": total / count,
+        "min": low,
+        "max": high,
+        "count": count.astype(np.int64)
+    })
+
+
+def year_shares(df, level, start=None, end=None):
+    # Splits each period's count over the calendar years its days fall in,
+    # clipped to [start, end], assuming observations are spread evenly over
+    # the period: a week straddling New Year counts towards both years.
+    # Returns (row positions, years, weights); a row appears at most twice.
+    first = period_start(df["date"].values, level)
+    last = period_end(df["date"].values, level)
+    days = (last - first).astype(np.int64) + 1
+    if start is not None:
+        first = np.maximum(first, np.datetime64(pd.Timestamp(start).date(), "D"))
+    if end is not None:
+        last = np.minimum(last, np.datetime64(pd.Timestamp(end).date(), "D"))
+    
+    counts = df["count"].to_numpy(dtype=np.float64)
+    first_year = first.astype("datetime64[Y]")
+    new_year = (first_year + 1).astype("datetime64[D]")
+    straddles = last >= new_year
+    head = np.where(straddles, new_year - first, last - first + 1).astype(np.int64)
+    tail = np.where(straddles, last - new_year + 1, 0).astype(np.int64)
+    
+    positions = np.arange(len(df))
+    years = first_year.astype(np.int64) + 1970
+    weights = np.concatenate([counts * np.maximum(head, 0), counts * tail]) / np.concatenate([days, days])
+    positions = np.concatenate([positions, positions])
+    years = np.concatenate([years, years + 1])
+    keep = weights > 0
+    return positions[keep], years[keep], weights[keep]
+
+
+def choose_level(start, end, min_points=DEFAULT_MIN_POINTS):
+    # Coarsest level that still leaves at least min_points periods per series
+    # in the range; short ranges stay on daily rows.
+    days = (pd.Timestamp(end) - pd.Timestamp(start)).days + 1
+    chosen = RAW_LEVEL
+    for level, period_days in LEVELS:
+        if days / period_days >= min_points:
+            chosen = level
+    return chosen
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+RESOLUTIONS = {'month': 12, 'dayofyear': 366}
+DEFAULT_PERCENTILES = (10, 90)
+
+
+def _calendar_keys(dates, resolution):
+    days = np.asarray(dates, dtype='datetime64[D]')
+    years = days.astype('datetime64[Y]').astype(np.int64) + 1970
+    if resolution == 'month':
+        columns = days.astype('datetime64[M]').astype(np.int64) % 12
+    elif resolution == 'dayofyear':
+        columns = (days - days.astype('datetime64[Y]').astype('datetime64[D]')).astype(np.int64)
+    else:
+        raise ValueError(f"Неизвестное разрешение сезонности: {resolution}")
+    return years, columns
+
+
+def seasonal_matrix(df, column='value', resolution='month'):
+    # Year x month (or day-of-year) means in one pass: every row gets a flat
+    # cell index and bincount sums values and counts per cell.
+    width = RESOLUTIONS.get(resolution)
+    if width is None:
+        raise ValueError(f"Неизвестное разрешение сезонности: {resolution}")
+    
+    values = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+    years, columns = _calendar_keys(df['date'].values, resolution)
+    valid = ~np.isnan(values)
+    values, years, columns = values[valid], years[valid], columns[valid]
+    if len(values) == 0:
+        return pd.DataFrame(columns=pd.RangeIndex(1, width + 1))
+    
+    first_year = years.min()
+    rows = years.max() - first_year + 1
+    cells = (years - first_year) * width + columns
+    totals = np.bincount(cells, values, minlength=rows * width)
+    counts = np.bincount(cells, minlength=rows * width)
+    
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = (totals / counts).reshape(rows, width)
+    
+    matrix = pd.DataFrame(means, index=pd.RangeIndex(first_year, first_year + rows, name='year'),
+                          columns=pd.RangeIndex(1, width + 1, name=resolution))
+    return matrix.dropna(how='all')
+
+
+def climatology(matrix, percentiles=DEFAULT_PERCENTILES):
+    # Median and percentile envelope of each calendar column across years.
+    values = matrix.to_numpy(dtype=np.float64)
+    empty = np.isnan(values).all(axis=0)
+    values = values[:, ~empty]
+    levels = [50, *percentiles]
+    bands = np.nanpercentile(values, levels, axis=0) if values.size else np.empty((len(levels), 0))
+    
+    result = pd.DataFrame({'median': bands[0]}, index=matrix.columns[~empty])
+    for percentile, band in zip(percentiles, bands[1:]):
+        result[f'p{percentile:g}'] = band
+    return result
@@ -0,0 +1,260 @@
+import os
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from urllib.parse import quote, unquote
+
+import numpy as np
+import pandas as pd
+
+from .compact import compact_frame, concat_frames
+from .rollups import empty_rollup, period_end, period_start, RAW_LEVEL, rollup, ROLLUP_COLUMNS, ROLLUP_LEVELS
+
+DEFAULT_DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+RECENT_TTL = timedelta(hours=12)
+SETTLE_PERIOD = timedelta(days=60)
+
+RESULT_COLUMNS = {
+    "date": "datetime64[ns]",
+    "datatype": "object",
+    "station": "object",
+    "attributes": "object",
+    "value": "float64"
+}
+
+QUERY_COLUMNS = ("date", "value", "datatype", "station")
+QUERY_RENAMES = {"datatype": "type"}
+ROLLUP_DIR = "_rollups"
+
+
+def _part(name):
+    return quote(str(name), safe="")
+
+
+class PartitionStore:
+    # Layout: <root>/<dataset>/<datatype>/<station>/<year>.parquet, with the
+    # week/month/year aggregates of each station in <station>/_rollups/<level>.parquet
+    def __init__(self, root=DEFAULT_DATA_DIR, recent_ttl=RECENT_TTL, settle_period=SETTLE_PERIOD):
+        self.root = Path(root)
+        self.recent_ttl = recent_ttl
+        self.settle_period = settle_period
+    
+    def partition_path(self, dataset, datatype, station, year):
+        return self.root / _part(dataset) / _part(datatype) / _part(station) / f"{int(year)}.parquet"
+    
+    def is_fresh(self, dataset, datatype, station, year):
+        path = self.partition_path(dataset, datatype, station, year)
+        try:
+            written_at = datetime.fromtimestamp(path.stat().st_mtime)
+        except FileNotFoundError:
+            return False
+        
+        # A year written well after it ended will not change any more; anything
+        # more recent is revalidated once it is older than recent_ttl.
+        if written_at >= datetime(int(year) + 1, 1, 1) + self.settle_period:
+            return True
+        return datetime.now() - written_at < self.recent_ttl
+    
+    def missing_years(self, dataset, datatype, station, start, end):
+        years = range(pd.Timestamp(start).year, pd.Timestamp(end).year + 1)
+        return [year for year in years if not self.is_fresh(dataset, datatype, station, year)]
+    
+    def rollup_path(self, dataset, datatype, station, level):
+        return self.root / _part(dataset) / _part(datatype) / _part(station) / ROLLUP_DIR / f"{level}.parquet"
+    
+    def write_partition(self, dataset, datatype, station, year, df, rollups=True):
+        path = self.partition_path(dataset, datatype, station, year)
+        atomic_write(path, lambda tmp_path: df.reset_index(drop=True).to_parquet(tmp_path, index=False))
+        if rollups:
+            self.update_rollups(dataset, datatype, station, [year])
+        return path
+    
+    def merge(self, dataset, datatype, station, df, key_columns=("date", "datatype", "station")):
+        if df.empty:
+            return 0
+        
+        key_columns = [col for col in key_columns if col in df.columns]
+        rows_added = 0
+        
+        for year, new_rows in df.groupby(df["date"].dt.year):
+            existing = self.read_years(dataset, datatype, station, [year])
+            merged = pd.concat([existing, new_rows], ignore_index=True)
+            merged = merged.drop_duplicates(subset=key_columns, keep="last").sort_values(key_columns)
+            self.write_partition(dataset, datatype, station, year, merged, rollups=False)
+            rows_added += len(merged) - len(existing)
+        
+        self.update_rollups(dataset, datatype, station, df["date"].dt.year.unique())
+        return rows_added
+    
+    def update_rollups(self, dataset, datatype, station, years):
+        # Only the periods touching the rewritten years are recomputed. Weeks
+        # straddle New Year, so the edge days of neighbouring years are read too.
+        levels = {level: [] for level in ROLLUP_LEVELS}
+        for first, last in _year_runs(years):
+            start = pd.Timestamp(period_start([f"{first}-01-01"], "week")[0])
+            end = pd.Timestamp(period_end([f"{last}-12-31"], "week")[0])
+            raw = concat_frames(self._range_frames(dataset, datatype, station, start, end, ("date", "value")))
+            if raw.empty:
+                raw = empty_rollup()
+            
+            in_years = raw[raw["date"].dt.year.between(first, last)]
+            months = rollup(in_years, "month")
+            levels["week"].append((start, end, rollup(raw, "week")))
+            levels["month"].append((pd.Timestamp(year=first, month=1, day=1), pd.Timestamp(year=last, month=12, day=31), months))
+            levels["year"].append((pd.Timestamp(year=first, month=1, day=1), pd.Timestamp(year=last, month=12, day=31), rollup(months, "year")))
+        
+        for level, updates in levels.items():
+            if not updates:
+                continue
+            path = self.rollup_path(dataset, datatype, station, level)
+            current = pd.read_parquet(path) if path.exists() else empty_rollup()
+            keep = np.ones(len(current), dtype=bool)
+            for start, end, _ in updates:
+                keep &= ~current["date"].between(start, end).to_numpy()
+            merged = pd.concat([current[keep], *(frame for _, _, frame in updates)], ignore_index=True)
+            merged = merged.sort_values("date")
+            atomic_write(path, lambda tmp_path: merged.reset_index(drop=True).to_parquet(tmp_path, index=False))
+    
+    def read_years(self, dataset, datatype, station, years, columns=None):
+        paths = [self.partition_path(dataset, datatype, station, year) for year in years]
+        frames = [pd.read_parquet(path, columns=columns) for path in paths if path.exists()]
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)
+    
+    def stations(self, dataset, datatype):
+        base = self.root / _part(dataset) / _part(datatype)
+        if not base.is_dir():
+            return []
+        return sorted(unquote(path.name) for path in base.iterdir() if path.is_dir())
+    
+    def datatypes(self, dataset):
+        base = self.root / _part(dataset)
+        if not base.is_dir():
+            return []
+        return sorted(unquote(path.name) for path in base.iterdir() if path.is_dir() and not path.name.startswith("_"))
+    
+    def years(self, dataset, datatype, station):
+        base = self.root / _part(dataset) / _part(datatype) / _part(station)
+        if not base.is_dir():
+            return []
+        return sorted(int(path.stem) for path in base.glob("*.parquet") if path.stem.isdigit())
+    
+    def _range_frames(self, dataset, datatype, station, start, end, columns):
+        if start is not None and end is not None:
+            years = range(start.year, end.year + 1)
+        else:
+            years = [year for year in self.years(dataset, datatype, station)
+                     if (start is None or year >= start.year) and (end is None or year <= end.year)]
+        
+        frames = []
+        for year in years:
+            path = self.partition_path(dataset, datatype, station, year)
+            if not path.exists():
+                continue
+            # Only the boundary years need a row filter; inner years are read whole.
+            filters = []
+            if start is not None and year == start.year:
+                filters.append(("date", ">=", start))
+            if end is not None and year == end.year:
+                filters.append(("date", "<", end + pd.Timedelta(days=1)))
+            frames.append(pd.read_parquet(path, columns=list(columns), filters=filters or None))
+        return frames
+    
+    def _rollup_frame(self, dataset, datatype, station, level, start, end):
+        path = self.rollup_path(dataset, datatype, station, level)
+        if not path.exists():
+            years = self.years(dataset, datatype, station)
+            if not years:
+                return None
+            # Stations written before rollups existed get them on first use.
+            self.update_rollups(dataset, datatype, station, years)
+        
+        # Periods are keyed by their first day, so the one containing start
+        # is included as well.
+        filters = []
+        if start is not None:
+            filters.append(("date", ">=", pd.Timestamp(period_start([start], level)[0])))
+        if end is not None:
+            filters.append(("date", "<=", end))
+        frame = pd.read_parquet(path, filters=filters or None)
+        return frame.assign(datatype=datatype, station=station)
+    
+    def query(self, types=None, stations=None, start=None, end=None, dataset="GHCND", columns=QUERY_COLUMNS,
+              level=RAW_LEVEL):
+        # Any level other than "day" reads the precomputed aggregates: "value"
+        # is the period mean, with min, max and count alongside.
+        start = pd.Timestamp(start).normalize() if start is not None else None
+        end = pd.Timestamp(end).normalize() if end is not None else None
+        types = self.datatypes(dataset) if types is None else list(types)
+        if level != RAW_LEVEL:
+            if level not in ROLLUP_LEVELS:
+                raise ValueError(f"Неизвестный уровень агрегации: {level}")
+            columns = (*ROLLUP_COLUMNS, "datatype", "station")
+        
+        frames = []
+        for datatype in types:
+            for station in (self.stations(dataset, datatype) if stations is None else stations):
+                if level == RAW_LEVEL:
+                    frames.extend(self._range_frames(dataset, datatype, station, start, end, columns))
+                    continue
+                frame = self._rollup_frame(dataset, datatype, station, level, start, end)
+                if frame is not None and not frame.empty:
+                    frames.append(frame)
+        
+        data = concat_frames(frames)
+        if data.empty:
+            return pd.DataFrame(columns=[QUERY_RENAMES.get(column, column) for column in columns])
+        
+        return compact_frame(data.rename(columns=QUERY_RENAMES))
+
+
+def atomic_write(path, write):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-", suffix=path.suffix)
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _year_runs(years):
+    # [1990, 1991, 1992, 2005] -> [(1990, 1992), (2005, 2005)]
+    runs = []
+    for year in sorted({int(year) for year in years}):
+        if runs and year == runs[-1][1] + 1:
+            runs[-1] = (runs[-1][0], year)
+        else:
+            runs.append((year, year))
+    return runs
+
+
+def empty_results():
+    return pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in RESULT_COLUMNS.items()})
+
+
+def split_by_year(df, years):
+    if df.empty:
+        return {year: empty_results() for year in years}
+    
+    groups = dict(tuple(df.groupby(df["date"].dt.year)))
+    return {year: groups.get(year, empty_results()) for year in years}
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_store():
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = PartitionStore(os.environ.get("CLIMATEVIZ_DATA_DIR", DEFAULT_DATA_DIR))
+        return _default_store
@@ -0,0 +1,107 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from .rollups import period_end, RAW_LEVEL, year_shares
+from .trends import TrendEngine
+
+# JSON-friendly on purpose: the summary travels inside the dcc.Store handle,
+# so the KPI callback never has to touch the dataset itself.
+# level is the storage level the rows came from; for anything coarser than
+# "day" min_date/max_date are the first day of the period holding the extreme.
+DatasetSummary = namedtuple('DatasetSummary', [
+    'count', 'total', 'mean', 'min', 'max', 'min_date', 'max_date', 'first_date', 'last_date', 'yearly_change', 'level'
+], defaults=(RAW_LEVEL,))
+
+
+def _iso(value):
+    return pd.Timestamp(value).strftime('%Y-%m-%d')
+
+
+def _summarize_rollup(df, column, level, start, end):
+    # Rows from the storage aggregates: means are weighted by the number of
+    # daily values behind them, split over the years (and clipped to the
+    # range) the way the daily rows would be, and extremes come from the
+    # min/max columns.
+    positions, years, weights = year_shares(df, level, start, end)
+    if len(weights) == 0:
+        return None
+    
+    values = df[column].to_numpy(dtype=np.float64)
+    weighted = values[positions] * weights
+    total = float(weighted.sum())
+    count = float(weights.sum())
+    
+    rows = np.unique(positions)
+    lows = df['min'].to_numpy(dtype=np.float64)[rows]
+    highs = df['max'].to_numpy(dtype=np.float64)[rows]
+    min_row, max_row = rows[int(np.argmin(lows))], rows[int(np.argmax(highs))]
+    
+    _, year_codes = np.unique(years, return_inverse=True)
+    yearly = np.bincount(year_codes, weighted) / np.bincount(year_codes, weights)
+    yearly_change = None
+    if len(yearly) > 1 and yearly[0] != 0:
+        yearly_change = float((yearly[-1] - yearly[0]) / yearly[0] * 100)
+    
+    dates = df['date'].values[rows]
+    first_date = max(pd.Timestamp(dates.min()), pd.Timestamp(start)) if start is not None else dates.min()
+    last_date = period_end([dates.max()], level)[0]
+    if end is not None:
+        last_date = min(pd.Timestamp(last_date), pd.Timestamp(end))
+    
+    return DatasetSummary(
+        count=int(round(count)),
+        total=total,
+        mean=total / count,
+        min=float(lows.min()),
+        max=float(highs.max()),
+        min_date=_iso(df['date'].values[min_row]),
+        max_date=_iso(df['date'].values[max_row]),
+        first_date=_iso(first_date),
+        last_date=_iso(last_date),
+        yearly_change=yearly_change,
+        level=level
+    )
+
+
+def summarize_dataset(df, column='value', level=RAW_LEVEL, start=None, end=None):
+    if df.empty or column not in df.columns:
+        return None
+    
+    values = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+    valid = ~np.isnan(values)
+    count = int(valid.sum())
+    if count == 0:
+        return None
+    
+    if level != RAW_LEVEL:
+        return _summarize_rollup(df[valid], column, level, start, end)
+    
+    total = float(values[valid].sum())
+    min_position = int(np.nanargmin(values))
+    max_position = int(np.nanargmax(values))
+    
+    min_date = max_date = first_date = last_date = None
+    yearly_change = None
+    if 'date' in df.columns:
+        dates = df['date'].values
+        min_date, max_date = _iso(dates[min_position]), _iso(dates[max_position])
+        first_date, last_date = _iso(dates.min()), _iso(dates.max())
+        if len(df) > 1:
+            change = TrendEngine(df, column).trend('yearly')['change_percent']
+            if change is not None and not np.isnan(change):
+                yearly_change = float(change)
+    
+    return DatasetSummary(
+        count=count,
+        total=total,
+        mean=total / count,
+        min=float(values[min_position]),
+        max=float(values[max_position]),
+        min_date=min_date,
+        max_date=max_date,
+        first_date=first_date,
+        last_date=last_date,
+        yearly_change=yearly_change
+    )
@@ -0,0 +1,141 @@
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+GRANULARITIES = ('yearly', 'monthly', 'weekly')
+PERIOD_FREQ = {'daily': 'D', 'weekly': 'W', 'monthly': 'M', 'yearly': 'Y'}
+
+
+def day_keys(dates):
+    return np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+
+
+def week_keys(days):
+    # 1970-01-01 was a Thursday; shifting by 3 makes weeks start on Monday.
+    return (days + 3) // 7
+
+
+def month_keys(days):
+    return days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+
+
+def year_keys(months):
+    return months // 12
+
+
+def _period_index(keys, granularity):
+    if granularity == 'weekly':
+        starts = (keys * 7 - 3).astype('datetime64[D]')
+    elif granularity == 'monthly':
+        starts = keys.astype('datetime64[M]')
+    elif granularity == 'yearly':
+        starts = keys.astype('datetime64[Y]')
+    else:
+        starts = keys.astype('datetime64[D]')
+    return pd.DatetimeIndex(starts.astype('datetime64[ns]')).to_period(PERIOD_FREQ[granularity])
+
+
+class _Level:
+    # Sufficient statistics per bucket: values are shifted by a common offset
+    # before summing squares to keep the variance numerically stable.
+    def __init__(self, keys, count, total, total_sq, minimum, maximum):
+        self.keys = keys
+        self.count = count
+        self.total = total
+        self.total_sq = total_sq
+        self.minimum = minimum
+        self.maximum = maximum
+    
+    @classmethod
+    def from_sorted(cls, keys, count, total, total_sq, minimum, maximum):
+        if len(keys) == 0:
+            return cls(keys, count, total, total_sq, minimum, maximum)
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        return cls(
+            keys[starts],
+            np.add.reduceat(count, starts),
+            np.add.reduceat(total, starts),
+            np.add.reduceat(total_sq, starts),
+            np.minimum.reduceat(minimum, starts),
+            np.maximum.reduceat(maximum, starts)
+        )
+    
+    def rollup(self, parent_keys):
+        return _Level.from_sorted(parent_keys, self.count, self.total, self.total_sq, self.minimum, self.maximum)
+
+
+class TrendEngine:
+    def __init__(self, df, column='value'):
+        values = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+        days = day_keys(df['date'].values)
+        
+        valid = ~np.isnan(values)
+        values, days = values[valid], days[valid]
+        if len(days) and not np.all(days[1:] >= days[:-1]):
+            order = np.argsort(days, kind='stable')
+            values, days = values[order], days[order]
+        
+        self._offset = float(values.mean()) if len(values) else 0.0
+        self._days = days
+        self._values = values
+    
+    @cached_property
+    def daily(self):
+        shifted = self._values - self._offset
+        return _Level.from_sorted(
+            self._days, np.ones(len(shifted), dtype=np.int64), shifted, shifted * shifted, self._values, self._values
+        )
+    
+    @cached_property
+    def weekly(self):
+        return self.daily.rollup(week_keys(self.daily.keys))
+    
+    @cached_property
+    def monthly(self):
+        return self.daily.rollup(month_keys(self.daily.keys))
+    
+    @cached_property
+    def yearly(self):
+        return self.monthly.rollup(year_keys(self.monthly.keys))
+    
+    def stats(self, granularity):
+        level = getattr(self, granularity)
+        count = level.count.astype(np.float64)
+        mean = level.total / np.where(count > 0, count, np.nan)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            variance = (level.total_sq - level.total * mean) / (count - 1)
+        std = np.sqrt(np.where(count > 1, np.maximum(variance, 0), np.nan))
+        
+        return pd.DataFrame({
+            'mean': mean + self._offset,
+            'std': std,
+            'min': level.minimum,
+            'max': level.maximum,
+            'count': level.count
+        }, index=_period_index(level.keys, granularity))
+    
+    def trend(self, granularity):
+        level = getattr(self, granularity)
+        stats = self.stats(granularity)
+        
+        change_percent = None
+        slope = None
+        if len(stats) > 1:
+            first_period = stats['mean'].iloc[0]
+            last_period = stats['mean'].iloc[-1]
+            change_percent = ((last_period - first_period) / first_period) * 100 if first_period != 0 else np.nan
+            
+            # Least-squares slope of the period means, in value units per period.
+            x = level.keys.astype(np.float64)
+            x_centered = x - x.mean()
+            slope = float(np.dot(x_centered, stats['mean'].values - stats['mean'].values.mean()) / np.dot(x_centered, x_centered))
+        
+        return {
+            'stats': stats,
+            'change_percent': change_percent,
+            'slope': slope
+        }
+    
+    def trends(self, granularities=GRANULARITIES):
+        return {granularity: self.trend(granularity) for granularity in granularities}
@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+
+DEFAULT_WIDTH = 1200
+POINTS_PER_PIXEL = 2
+METHODS = ('lttb', 'minmax')
+
+
+def target_points(width=None):
+    return max(int(width or DEFAULT_WIDTH), 100) * POINTS_PER_PIXEL
+
+
+def _as_float(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype('datetime64[ns]').view(np.int64).astype(np.float64)
+    return x.astype(np.float64)
+
+
+def lttb_indices(x, y, n_out):
+    # Largest-Triangle-Three-Buckets: keeps the first and last points and,
+    # from each bucket in between, the point forming the largest triangle with
+    # the previously kept point and the average of the next bucket.
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+    
+    next_x = np.empty(len(starts))
+    next_y = np.empty(len(starts))
+    next_x[:-1] = np.add.reduceat(x[1:n - 1], starts[1:] - 1) / np.diff(ends)
+    next_y[:-1] = np.add.reduceat(y[1:n - 1], starts[1:] - 1) / np.diff(ends)
+    next_x[-1], next_y[-1] = x[-1], y[-1]
+    
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket, (start, end) in enumerate(zip(starts, ends)):
+        bucket_x, bucket_y = x[start:end], y[start:end]
+        area = np.abs(
+            (x[previous] - next_x[bucket]) * (bucket_y - y[previous])
+            - (x[previous] - bucket_x) * (next_y[bucket] - y[previous])
+        )
+        previous = start + int(np.argmax(area))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def minmax_indices(x, y, n_out):
+    # Splits the x-range into n_out / 2 equal-width buckets (one per pixel
+    # column) and keeps the minimum and maximum of each, so spikes survive.
+    n = len(x)
+    if n_out >= n or n_out < 2:
+        return np.arange(n)
+    
+    buckets = max(n_out // 2, 1)
+    span = x[-1] - x[0]
+    bucket = np.minimum(((x - x[0]) / span * buckets).astype(np.int64), buckets - 1) if span > 0 else np.zeros(n, dtype=np.int64)
+    
+    # x is sorted, so buckets are contiguous runs and reduceat finds their
+    # extremes in one pass; the first row equal to each extreme is kept.
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    sizes = np.diff(np.r_[starts, n])
+    selected = [np.array([0, n - 1])]
+    for reduce in (np.minimum, np.maximum):
+        extreme = np.repeat(reduce.reduceat(y, starts), sizes)
+        hits = np.flatnonzero(y == extreme)
+        selected.append(hits[np.r_[True, bucket[hits][1:] != bucket[hits][:-1]]])
+    return np.unique(np.concatenate(selected))
+
+
+def downsample(df, x='date', columns=('value',), n_out=None, method='lttb'):
+    # Keeps the union of the rows each y-column needs, so several traces
+    # drawn from one frame stay aligned. NaN rows are dropped per column.
+    if method not in METHODS:
+        raise ValueError(f"Неизвестный метод прореживания: {method}")
+    n_out = n_out or target_points()
+    if len(df) <= n_out:
+        return df
+    
+    if not df[x].is_monotonic_increasing:
+        df = df.sort_values(x)
+    
+    x_values = _as_float(df[x].values)
+    pick = lttb_indices if method == 'lttb' else minmax_indices
+    keep = np.zeros(len(df), dtype=bool)
+    for column in columns:
+        if column not in df.columns:
+            continue
+        y_values = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+        valid = np.flatnonzero(~np.isnan(y_values))
+        keep[valid[pick(x_values[valid], y_values[valid], n_out)]] = True
+    return df[keep]
+
+
+def visible_range(df, x_range, x='date'):
+    # Rows inside the zoomed x-range plus one neighbour on each side, so
+    # lines still reach the plot edges.
+    if not x_range or df.empty:
+        return df
+    
+    if not df[x].is_monotonic_increasing:
+        df = df.sort_values(x)
+    
+    values = df[x].values
+    start, end = pd.Timestamp(x_range[0]).to_datetime64(), pd.Timestamp(x_range[1]).to_datetime64()
+    first = max(np.searchsorted(values, start, side='left') - 1, 0)
+    last = min(np.searchsorted(values, end, side='right') + 1, len(df))
+    return df.iloc[first:last]
+
+
+def relayout_range(relayout_data, axis='xaxis'):
+    # Plotly reports zoom as 'xaxis.range[0]'/'xaxis.range[1]' (or a
+    # 'xaxis.range' list) and reset as 'xaxis.autorange'.
+    if not relayout_data or relayout_data.get(f'{axis}.autorange'):
+        return None
+    if f'{axis}.range' in relayout_data:
+        return list(relayout_data[f'{axis}.range'])
+    if f'{axis}.range[0]' in relayout_data and f'{axis}.range[1]' in relayout_data:
+        return [relayout_data[f'{axis}.range[0]'], relayout_data[f'{axis}.range[1]']]
+    return None
+
+
+def limit_trace_points(trace, budget):
+    # Last-resort guard for traces built without downsample(): thins x/y in
+    # place with LTTB over point order.
+    if trace.x is None or trace.y is None or len(trace.x) <= budget:
+        return trace
+    
+    y = np.asarray(trace.y)
+    shape = np.nan_to_num(pd.to_numeric(pd.Series(y), errors='coerce').to_numpy(dtype=np.float64))
+    keep = lttb_indices(np.arange(len(y), dtype=np.float64), shape, budget)
+    trace.x = np.asarray(trace.x)[keep]
+    trace.y = y[keep]
+    return trace
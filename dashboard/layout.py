@@ -84,6 +84,18 @@ def create_filters_section():
                                     )
                                 ]
                             ),
+                            html.Div(
+                                className="filter-item",
+                                children=[
+                                    html.Label("Станция", className="filter-label"),
+                                    dcc.Dropdown(
+                                        id="station-dropdown",
+                                        options=[],
+                                        placeholder="Все станции (среднее)",
+                                        className="dropdown"
+                                    )
+                                ]
+                            ),
                             html.Div(
                                 className="filter-item",
                                 children=[
@@ -234,6 +246,24 @@ def create_visualization_section():
                                     )
                                 ]
                             ),
+                            html.Div(
+                                id="seasonality-options",
+                                className="chart-options",
+                                style={"display": "none"},
+                                children=[
+                                    dcc.RadioItems(
+                                        id="seasonality-mode",
+                                        options=[
+                                            {"label": "Линии по годам", "value": "lines"},
+                                            {"label": "Тепловая карта", "value": "heatmap"},
+                                            {"label": "Климатология", "value": "climatology"}
+                                        ],
+                                        value="lines",
+                                        inline=True,
+                                        className="radio-items"
+                                    )
+                                ]
+                            ),
                             html.Div(
                                 id="visualization-content",
                                 className="chart-container",
@@ -280,7 +310,14 @@ def create_data_section():
                                 children=[
                                     dash.dash_table.DataTable(
                                         id="data-table",
+                                        page_current=0,
                                         page_size=10,
+                                        page_action="custom",
+                                        sort_action="custom",
+                                        sort_mode="multi",
+                                        sort_by=[],
+                                        filter_action="custom",
+                                        filter_query="",
                                         style_table={"overflowX": "auto"},
                                         style_cell={
                                             "textAlign": "left",
@@ -334,5 +371,6 @@ def create_layout():
         create_footer(),
         
         dcc.Store(id="data-store"),
-        dcc.Store(id="processed-data-store")
+        dcc.Store(id="processed-data-store"),
+        dcc.Store(id="chart-width")
     ]) 
\ No newline at end of file
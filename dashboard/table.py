@@ -0,0 +1,176 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from climate_data.cache import memoize
+
+HIDDEN_COLUMNS = ('z_score', 'is_anomaly')
+DATE_FORMAT = '%d.%m.%Y'
+
+# Dash DataTable filter syntax, longest operators first so '>=' wins over '>'.
+OPERATORS = [
+    ('ge', ('>=', 'ge ')),
+    ('le', ('<=', 'le ')),
+    ('ne', ('!=', 'ne ')),
+    ('gt', ('>', 'gt ')),
+    ('lt', ('<', 'lt ')),
+    ('eq', ('=', 'eq ')),
+    ('contains', ('contains ',)),
+    ('datestartswith', ('datestartswith ',))
+]
+
+# Dates typed into a filter: the displayed dd.mm.yyyy form and ISO, whole or
+# down to the month or year, each selecting the period it names.
+PERIOD_PATTERNS = (
+    (re.compile(r'(?P<day>\d{1,2})\.(?P<month>\d{1,2})\.(?P<year>\d{4})'), 'D'),
+    (re.compile(r'(?P<month>\d{1,2})\.(?P<year>\d{4})'), 'M'),
+    (re.compile(r'(?P<year>\d{4})-(?P<month>\d{1,2})-(?P<day>\d{1,2})'), 'D'),
+    (re.compile(r'(?P<year>\d{4})-(?P<month>\d{1,2})'), 'M'),
+    (re.compile(r'(?P<year>\d{4})'), 'Y')
+)
+
+
+def table_columns(df):
+    return [{"name": col.capitalize(), "id": col} for col in df.columns if col not in HIDDEN_COLUMNS]
+
+
+def parse_filter(filter_query):
+    # '{value} > 5 && {type} contains T' -> [('value', 'gt', '5'), ('type', 'contains', 'T')]
+    clauses = []
+    for part in (filter_query or '').split(' && '):
+        part = part.strip()
+        if not part.startswith('{') or '}' not in part:
+            continue
+        name, rest = part[1:].split('}', 1)
+        rest = rest.strip()
+        for operator, symbols in OPERATORS:
+            symbol = next((symbol for symbol in symbols if rest.startswith(symbol)), None)
+            if symbol is not None:
+                value = rest[len(symbol):].strip()
+                if len(value) >= 2 and value[0] == value[-1] and value[0] in '"\'`':
+                    value = value[1:-1]
+                clauses.append((name, operator, value))
+                break
+    return clauses
+
+
+def _period(value):
+    for pattern, freq in PERIOD_PATTERNS:
+        match = pattern.fullmatch(value.strip())
+        if match is None:
+            continue
+        parts = match.groupdict()
+        try:
+            # Timestamp rejects a 31.02 that Period would roll over into March.
+            moment = pd.Timestamp(year=int(parts['year']), month=int(parts.get('month') or 1), day=int(parts.get('day') or 1))
+        except ValueError:
+            return None
+        return moment.to_period(freq)
+    return None
+
+
+def _date_mask(column, operator, value):
+    period = _period(value)
+    if operator in ('datestartswith', 'contains'):
+        if period is not None:
+            # '15.03.2020', '03.2020' or '2020' selects the whole period
+            # without formatting every date as a string.
+            return (column >= period.start_time) & (column <= period.end_time)
+        # Anything else ('15.03', '.03.') is matched against the dates as
+        # displayed, formatting each distinct date once.
+        dates = pd.Series(column.dropna().unique())
+        shown = dates.dt.strftime(DATE_FORMAT)
+        matched = shown.str.startswith(value) if operator == 'datestartswith' else shown.str.contains(value, regex=False)
+        return column.isin(dates[matched])
+    
+    if period is None:
+        # A date that cannot be read matches nothing.
+        return pd.Series(False, index=column.index)
+    
+    # Comparisons take the whole period: '> 2020' is from 2021 on.
+    if operator == 'eq':
+        return (column >= period.start_time) & (column <= period.end_time)
+    if operator == 'ne':
+        return (column < period.start_time) | (column > period.end_time)
+    if operator in ('gt', 'le'):
+        return _compare(column, operator, period.end_time)
+    return _compare(column, operator, period.start_time)
+
+
+def _compare(column, operator, value):
+    if operator == 'eq':
+        return column == value
+    if operator == 'ne':
+        return column != value
+    if operator == 'gt':
+        return column > value
+    if operator == 'ge':
+        return column >= value
+    if operator == 'lt':
+        return column < value
+    return column <= value
+
+
+def _mask(column, operator, value):
+    if pd.api.types.is_datetime64_any_dtype(column):
+        return _date_mask(column, operator, value)
+    
+    if operator in ('contains', 'datestartswith'):
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            # Matching runs over the categories, not over every row.
+            categories = column.cat.categories
+            return column.isin(categories[categories.astype(str).str.contains(value, case=False, regex=False)])
+        return column.astype(str).str.contains(value, case=False, regex=False)
+    
+    if pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(column):
+        return _compare(column, operator, float(value))
+    
+    return _compare(column.astype(str), operator, value)
+
+
+@memoize()
+def table_view(df, filter_query='', sort_by=()):
+    # Filtered and sorted frame for the table, memoized per dataset version,
+    # filter and sort order, so turning pages only slices a cached frame.
+    mask = np.ones(len(df), dtype=bool)
+    for name, operator, value in parse_filter(filter_query):
+        if name not in df.columns:
+            continue
+        try:
+            mask &= _mask(df[name], operator, value).to_numpy(dtype=bool, na_value=False)
+        except (TypeError, ValueError):
+            mask[:] = False
+    view = df[mask] if not mask.all() else df
+    
+    sort_by = [item for item in sort_by if item['column_id'] in view.columns]
+    if sort_by:
+        view = view.sort_values(
+            [item['column_id'] for item in sort_by],
+            ascending=[item['direction'] == 'asc' for item in sort_by],
+            kind='stable'
+        )
+    return view
+
+
+def page_records(view, page_current, page_size):
+    # Only the requested page is formatted and serialized.
+    start = page_current * page_size
+    page = view.iloc[start:start + page_size]
+    page = page[[col for col in page.columns if col not in HIDDEN_COLUMNS]]
+    
+    formatted = {}
+    for col in page.columns:
+        column = page[col]
+        if pd.api.types.is_datetime64_any_dtype(column):
+            formatted[col] = column.dt.strftime(DATE_FORMAT)
+        elif pd.api.types.is_float_dtype(column):
+            formatted[col] = column.astype(np.float64).round(2)
+        elif isinstance(column.dtype, pd.CategoricalDtype):
+            formatted[col] = column.astype(object)
+    
+    return page.assign(**formatted).to_dict('records')
+
+
+def page_count(view, page_size):
+    return max(-(-len(view) // page_size), 1)
@@ -1,24 +1,72 @@
+import logging
+import os
+
 import plotly.graph_objects as go
 import plotly.express as px
 import pandas as pd
 import numpy as np
 from climate_data import processor
+from climate_data.anomalies import seasonal_baseline
+from climate_data.rolling import column_name, rolling_windows
+from climate_data.seasonality import DEFAULT_PERCENTILES, climatology
+from dashboard.downsample import downsample, limit_trace_points, target_points, visible_range
+
+logger = logging.getLogger(__name__)
+
+WINDOW_LABELS = {'7D': '7 дн.', '30D': '30 дн.', '365D': '365 дн.'}
+MONTHS = ['Янв', 'Фев', 'Мар', 'Апр', 'Май', 'Июн', 'Июл', 'Авг', 'Сен', 'Окт', 'Ноя', 'Дек']
+SEASONALITY_MODES = ('lines', 'heatmap', 'climatology')
+
+# Above this many scatter points a figure switches to WebGL traces; SVG is
+# kept below it, where it renders crisper and just as fast.
+WEBGL_THRESHOLD = int(os.environ.get("CLIMATEVIZ_WEBGL_THRESHOLD", "10000"))
+# Hard cap on scatter points per figure, whatever the callers passed in.
+MAX_FIGURE_POINTS = int(os.environ.get("CLIMATEVIZ_MAX_FIGURE_POINTS", "200000"))
+
+
+def _finalize(fig):
+    scatters = [trace for trace in fig.data if trace.type in ('scatter', 'scattergl')]
+    points = sum(len(trace.x) for trace in scatters if trace.x is not None)
+    
+    if points > MAX_FIGURE_POINTS:
+        logger.warning("Фигура содержит %d точек, прорежена до %d", points, MAX_FIGURE_POINTS)
+        budget = max(MAX_FIGURE_POINTS // len(scatters), 2)
+        for trace in scatters:
+            limit_trace_points(trace, budget)
+        points = sum(len(trace.x) for trace in scatters if trace.x is not None)
+    
+    if points <= WEBGL_THRESHOLD:
+        return fig
+    
+    # Traces are switched together: mixing SVG and WebGL in one plot breaks
+    # the drawing order. Styling, hover and legend settings carry over as is.
+    traces = [
+        go.Scattergl({key: value for key, value in trace.to_plotly_json().items() if key != 'type'}, skip_invalid=True)
+        if trace.type == 'scatter' else trace
+        for trace in fig.data
+    ]
+    return go.Figure(data=traces, layout=fig.layout)
+
+
+def _thin(df, columns, x_range=None, width=None):
+    # Only the visible x-range is drawn, reduced to about two points per pixel,
+    # so the figure size does not grow with the length of the series.
+    return downsample(visible_range(df, x_range), columns=columns, n_out=target_points(width))
 
 
-def create_time_series_plot(df, analysis_type='raw', title=None, y_title=None):
+def create_time_series_plot(df, analysis_type='raw', title=None, y_title=None, x_range=None, width=None):
     if df.empty:
         return empty_plot("Нет доступных данных")
     
-    temp_df = df.copy()
-    
     fig = go.Figure()
     
-    if 'date' not in temp_df.columns or 'value' not in temp_df.columns:
+    if 'date' not in df.columns or 'value' not in df.columns:
         return empty_plot("Неверный формат данных")
     
-    temp_df = temp_df.sort_values('date')
+    temp_df = df if df['date'].is_monotonic_increasing else df.sort_values('date')
     
     if analysis_type == 'raw':
+        temp_df = _thin(temp_df, ['value'], x_range, width)
         fig.add_trace(go.Scatter(
             x=temp_df['date'],
             y=temp_df['value'],
@@ -28,38 +76,77 @@ def create_time_series_plot(df, analysis_type='raw', title=None, y_title=None):
         ))
     
     elif analysis_type == 'moving_avg':
-        processed_df = processor.calculate_moving_average(temp_df)
+        windows = rolling_windows(temp_df['date'].values)
+        if any(column_name('mean', window) in temp_df.columns for window in windows):
+            processed_df = temp_df
+        else:
+            processed_df = processor.calculate_rolling(df, windows=windows, statistics=('mean', 'std'))
+        
+        # Each trace is thinned on its own column, so adding windows does not
+        # multiply the number of points sent for the others.
+        processed_df = visible_range(processed_df, x_range)
+        value_df = downsample(processed_df, columns=['value'], n_out=target_points(width))
         
         fig.add_trace(go.Scatter(
-            x=processed_df['date'],
-            y=processed_df['value'],
+            x=value_df['date'],
+            y=value_df['value'],
             mode='lines',
             name='Значение',
             line=dict(color='#3498db', width=1, dash='dot'),
             opacity=0.5
         ))
         
-        fig.add_trace(go.Scatter(
-            x=processed_df['date'],
-            y=processed_df['moving_avg'],
-            mode='lines',
-            name='Скользящее среднее',
-            line=dict(color='#e74c3c', width=2)
-        ))
+        band_window = windows[min(1, len(windows) - 1)]
+        mean_column, std_column = column_name('mean', band_window), column_name('std', band_window)
+        if mean_column in processed_df.columns and std_column in processed_df.columns:
+            band_df = downsample(processed_df, columns=[mean_column], n_out=target_points(width))
+            fig.add_trace(go.Scatter(
+                x=pd.concat([band_df['date'], band_df['date'][::-1]]),
+                y=pd.concat([
+                    band_df[mean_column] + band_df[std_column],
+                    (band_df[mean_column] - band_df[std_column])[::-1]
+                ]),
+                fill='toself',
+                fillcolor='rgba(231, 76, 60, 0.1)',
+                line=dict(width=0),
+                hoverinfo='skip',
+                name=f'±σ ({WINDOW_LABELS.get(band_window, band_window)})'
+            ))
+        
+        colors = ['#f39c12', '#e74c3c', '#8e44ad']
+        for window, color in zip(windows, colors):
+            if column_name('mean', window) not in processed_df.columns:
+                continue
+            mean_df = downsample(processed_df, columns=[column_name('mean', window)], n_out=target_points(width))
+            fig.add_trace(go.Scatter(
+                x=mean_df['date'],
+                y=mean_df[column_name('mean', window)],
+                mode='lines',
+                name=f'Скользящее среднее ({WINDOW_LABELS.get(window, window)})',
+                line=dict(color=color, width=2)
+            ))
     
     elif analysis_type == 'anomalies':
-        processed_df = processor.detect_anomalies(temp_df)
+        if 'is_anomaly' in temp_df.columns:
+            processed_df = temp_df
+        else:
+            processed_df = processor.detect_anomalies(df, seasonal=seasonal_baseline(df['date'].values))
+        
+        # Z-scores need the whole series; only the drawn line is thinned, the
+        # anomaly markers in view are all kept.
+        visible_df = visible_range(processed_df, x_range)
+        line_df = downsample(visible_df, columns=['value'], n_out=target_points(width))
         
         fig.add_trace(go.Scatter(
-            x=processed_df['date'],
-            y=processed_df['value'],
+            x=line_df['date'],
+            y=line_df['value'],
             mode='lines',
             name='Значение',
             line=dict(color='#3498db', width=2)
         ))
         
-        if 'is_anomaly' in processed_df.columns:
-            anomalies_df = processed_df[processed_df['is_anomaly']]
+        if 'is_anomaly' in visible_df.columns:
+            anomalies_df = visible_df[visible_df['is_anomaly']]
             
             if not anomalies_df.empty:
                 fig.add_trace(go.Scatter(
@@ -72,7 +159,8 @@ def create_time_series_plot(df, analysis_type='raw', title=None, y_title=None):
     
     elif analysis_type == 'forecast':
         forecast_days = 30
-        forecast_df = processor.forecast_simple(temp_df, forecast_days=forecast_days)
+        forecast_df = processor.forecast_simple(df, forecast_days=forecast_days)
+        temp_df = _thin(temp_df, ['value'], x_range, width)
         
         fig.add_trace(go.Scatter(
             x=temp_df['date'],
@@ -93,18 +181,18 @@ def create_time_series_plot(df, analysis_type='raw', title=None, y_title=None):
             
             fig.add_trace(go.Scatter(
                 x=forecast_df['date'],
-                y=[y * 1.1 for y in forecast_df['value']],
+                y=forecast_df['upper'],
                 mode='lines',
-                name='Верхняя граница',
+                name='Верхняя граница (95%)',
                 line=dict(color='#e74c3c', width=1, dash='dot'),
                 opacity=0.3
             ))
             
             fig.add_trace(go.Scatter(
                 x=forecast_df['date'],
-                y=[y * 0.9 for y in forecast_df['value']],
+                y=forecast_df['lower'],
                 mode='lines',
-                name='Нижняя граница',
+                name='Нижняя граница (95%)',
                 line=dict(color='#e74c3c', width=1, dash='dot'),
                 opacity=0.3,
                 fill='tonexty'
@@ -129,45 +217,62 @@ def create_time_series_plot(df, analysis_type='raw', title=None, y_title=None):
         margin=dict(l=20, r=20, t=60, b=20)
     )
     
-    return fig
+    return _finalize(fig)
 
 
 def create_distribution_plot(df, title=None):
     if df.empty:
         return empty_plot("Нет доступных данных")
     
-    temp_df = df.copy()
-    
-    if 'value' not in temp_df.columns:
+    if 'value' not in df.columns:
         return empty_plot("Неверный формат данных")
     
-    values = temp_df['value'].dropna()
+    # Binning and KDE run on the server; the figure only carries bin counts,
+    # the density curve and box statistics, whatever the number of rows.
+    summary = processor.distribution_summary(df)
     
-    if len(values) == 0:
+    if summary is None:
         return empty_plot("Нет доступных данных")
     
     fig = go.Figure()
     
-    fig.add_trace(go.Histogram(
-        x=values,
-        nbinsx=30,
+    edges = summary['edges']
+    fig.add_trace(go.Bar(
+        x=(edges[:-1] + edges[1:]) / 2,
+        y=summary['counts'],
+        width=np.diff(edges),
         marker_color='#3498db',
         opacity=0.7,
         name="Распределение"
     ))
     
-    fig.add_trace(go.Violin(
-        x=values,
-        box_visible=True,
-        line_color='#e74c3c',
-        meanline_visible=True,
-        fillcolor='#e74c3c',
-        opacity=0.5,
-        name="Плотность",
-        side='positive',
+    if len(summary['grid']):
+        # Density scaled to counts per histogram bin, so both share the y-axis.
+        fig.add_trace(go.Scatter(
+            x=summary['grid'],
+            y=summary['density'] * summary['count'] * np.diff(edges).mean(),
+            mode='lines',
+            line=dict(color='#e74c3c', width=2),
+            fill='tozeroy',
+            fillcolor='rgba(231, 76, 60, 0.15)',
+            name="Плотность"
+        ))
+    
+    quantiles = summary['quantiles']
+    fig.add_trace(go.Box(
+        y=["Значения"],
+        q1=[quantiles[0.25]],
+        median=[quantiles[0.5]],
+        q3=[quantiles[0.75]],
+        lowerfence=[summary['lowerfence']],
+        upperfence=[summary['upperfence']],
+        mean=[summary['mean']],
+        sd=[summary['std']],
         orientation='h',
-        xaxis='x2',
-        points=False
+        boxmean='sd',
+        marker_color='#e74c3c',
+        yaxis='y2',
+        name="Квартили"
     ))
     
     plot_title = title if title else "Распределение значений"
@@ -175,67 +280,127 @@ def create_distribution_plot(df, title=None):
     fig.update_layout(
         title=plot_title,
         xaxis_title="Значение",
-        yaxis_title="Частота",
-        template="plotly_white",
-        xaxis2=dict(
-            overlaying='x',
-            side='top',
+        yaxis=dict(title="Частота", domain=[0, 0.8]),
+        yaxis2=dict(
+            domain=[0.85, 1],
             showgrid=False,
             zeroline=False,
             showticklabels=False
         ),
+        template="plotly_white",
+        bargap=0,
         showlegend=False,
         margin=dict(l=20, r=20, t=60, b=20)
     )
     
-    return fig
+    return _finalize(fig)
 
 
-def create_seasonality_plot(df, title=None):
+def create_seasonality_plot(df, title=None, mode='lines'):
     if df.empty:
         return empty_plot("Нет доступных данных")
     
-    temp_df = df.copy()
-    
-    if 'date' not in temp_df.columns or 'value' not in temp_df.columns:
+    if 'date' not in df.columns or 'value' not in df.columns:
         return empty_plot("Неверный формат данных")
     
-    temp_df['month'] = temp_df['date'].dt.month
-    temp_df['year'] = temp_df['date'].dt.year
+    # Every mode draws from one year x month matrix and uses a fixed number of
+    # traces, however many years the data covers.
+    matrix = processor.seasonality_matrix(df)
     
-    monthly_data = temp_df.groupby(['year', 'month'])['value'].mean().reset_index()
-    
-    months = ['Янв', 'Фев', 'Мар', 'Апр', 'Май', 'Июн', 'Июл', 'Авг', 'Сен', 'Окт', 'Ноя', 'Дек']
-    monthly_data['month_name'] = monthly_data['month'].apply(lambda x: months[x-1])
-    
-    years = monthly_data['year'].unique()
+    if matrix.empty:
+        return empty_plot("Нет доступных данных")
     
     fig = go.Figure()
+    hovermode = "x unified"
+    last_year = matrix.index[-1]
+    
+    if mode == 'heatmap':
+        fig.add_trace(go.Heatmap(
+            z=matrix.to_numpy(),
+            x=MONTHS,
+            y=matrix.index,
+            colorscale='RdYlBu_r',
+            colorbar=dict(title="Значение"),
+            hovertemplate='%{y}, %{x}: %{z:.2f}<extra></extra>'
+        ))
+        hovermode = "closest"
     
-    for year in years:
-        year_data = monthly_data[monthly_data['year'] == year]
+    elif mode == 'climatology':
+        bands = climatology(matrix)
+        low, high = (f'p{percentile:g}' for percentile in DEFAULT_PERCENTILES)
         
         fig.add_trace(go.Scatter(
-            x=year_data['month'],
-            y=year_data['value'],
-            mode='lines+markers',
-            name=str(year),
+            x=bands.index,
+            y=bands[high],
+            mode='lines',
+            line=dict(width=0),
+            showlegend=False,
+            hoverinfo='skip'
+        ))
+        
+        fig.add_trace(go.Scatter(
+            x=bands.index,
+            y=bands[low],
+            mode='lines',
+            line=dict(width=0),
+            fill='tonexty',
+            fillcolor='rgba(52, 152, 219, 0.2)',
+            name=f'{low.upper()}–{high.upper()}',
+            hovertemplate='%{y:.2f}'
+        ))
+        
+        fig.add_trace(go.Scatter(
+            x=bands.index,
+            y=bands['median'],
+            mode='lines',
+            name='Медиана',
+            line=dict(color='#3498db', width=2),
             hovertemplate='%{y:.2f}'
         ))
     
-    fig.update_xaxes(
-        tickvals=list(range(1, 13)),
-        ticktext=months
-    )
+    else:
+        # All years share one trace, separated by NaN breaks; the year is
+        # carried in customdata for the hover label.
+        years = matrix.index.to_numpy()
+        width = len(matrix.columns)
+        x = np.tile(np.r_[matrix.columns.to_numpy(dtype=np.float64), np.nan], len(years))
+        y = np.hstack([matrix.to_numpy(), np.full((len(years), 1), np.nan)]).ravel()
+        
+        fig.add_trace(go.Scatter(
+            x=x,
+            y=y,
+            customdata=np.repeat(years, width + 1),
+            mode='lines',
+            name='Прошлые годы',
+            line=dict(color='#95a5a6', width=1),
+            opacity=0.5,
+            hovertemplate='%{customdata}: %{y:.2f}<extra></extra>'
+        ))
+        hovermode = "closest"
+    
+    if mode != 'heatmap':
+        fig.add_trace(go.Scatter(
+            x=matrix.columns,
+            y=matrix.loc[last_year],
+            mode='lines+markers',
+            name=str(last_year),
+            line=dict(color='#e74c3c', width=2),
+            hovertemplate='%{y:.2f}'
+        ))
+        
+        fig.update_xaxes(
+            tickvals=list(range(1, 13)),
+            ticktext=MONTHS
+        )
     
     plot_title = title if title else "Сезонность по годам"
     
     fig.update_layout(
         title=plot_title,
         xaxis_title="Месяц",
-        yaxis_title="Значение",
+        yaxis_title="Год" if mode == 'heatmap' else "Значение",
         template="plotly_white",
-        hovermode="x unified",
+        hovermode=hovermode,
         legend=dict(
             orientation="h",
             yanchor="bottom",
@@ -246,26 +411,30 @@ def create_seasonality_plot(df, title=None):
         margin=dict(l=20, r=20, t=60, b=20)
     )
     
-    return fig
+    return _finalize(fig)
 
 
-def create_anomalies_plot(df, title=None):
+def create_anomalies_plot(df, title=None, x_range=None, width=None):
     if df.empty:
         return empty_plot("Нет доступных данных")
     
-    temp_df = df.copy()
-    
-    if 'date' not in temp_df.columns or 'value' not in temp_df.columns:
+    if 'date' not in df.columns or 'value' not in df.columns:
         return empty_plot("Неверный формат данных")
     
-    processed_df = processor.detect_anomalies(temp_df)
+    if 'z_score' in df.columns:
+        processed_df = df
+    else:
+        processed_df = processor.detect_anomalies(df, seasonal=seasonal_baseline(df['date'].values))
     
     fig = go.Figure()
     
     if 'z_score' in processed_df.columns:
+        processed_df = visible_range(processed_df, x_range)
+        line_df = downsample(processed_df, columns=['z_score'], n_out=target_points(width))
+        
         fig.add_trace(go.Scatter(
-            x=processed_df['date'],
-            y=processed_df['z_score'],
+            x=line_df['date'],
+            y=line_df['z_score'],
             mode='lines',
             name='Z-показатель',
             line=dict(color='#3498db', width=2)
@@ -327,7 +496,7 @@ def create_anomalies_plot(df, title=None):
         margin=dict(l=20, r=20, t=60, b=20)
     )
     
-    return fig
+    return _finalize(fig)
 
 
 def empty_plot(message="Нет данных для отображения"):
@@ -0,0 +1,119 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from climate_data import processor
+from climate_data.anomalies import OnlineAnomalyDetector, seasonal_baseline
+
+
+def daily_series(start="2015-01-01", years=4, seed=0):
+    dates = pd.date_range(start, periods=int(365.25 * years), freq="D")
+    rng = np.random.default_rng(seed)
+    seasonal = 10 * np.sin(2 * np.pi * dates.dayofyear.to_numpy() / 365.25)
+    values = 15 + seasonal + rng.normal(0, 2, len(dates))
+    values[rng.random(len(dates)) < 0.05] = np.nan
+    # Spikes of six standard deviations every 600 days.
+    spikes = np.arange(100, len(dates), 600)
+    values[spikes] = 15 + seasonal[spikes] + 12
+    return pd.DataFrame({"date": dates, "value": values})
+
+
+def chunks(df, sizes):
+    start = 0
+    for size in sizes:
+        yield df.iloc[start:start + size]
+        start += size
+    if start < len(df):
+        yield df.iloc[start:]
+
+
+@pytest.mark.parametrize("seasonal", [None, "month", "dayofyear"])
+def test_chunked_updates_match_batch(seasonal):
+    df = daily_series()
+    batch = OnlineAnomalyDetector(seasonal=seasonal)
+    expected = batch.update(df)
+    
+    chunked = OnlineAnomalyDetector(seasonal=seasonal)
+    result = pd.concat([chunked.update(chunk) for chunk in chunks(df, [1, 2, 30, 365, 7, 400, 90])])
+    
+    np.testing.assert_allclose(result["z_score"], expected["z_score"], rtol=1e-9, atol=1e-9)
+    assert result["is_anomaly"].tolist() == expected["is_anomaly"].tolist()
+    np.testing.assert_array_equal(chunked.count, batch.count)
+    np.testing.assert_allclose(chunked.mean, batch.mean, rtol=1e-12)
+    np.testing.assert_allclose(chunked.m2, batch.m2, rtol=1e-9)
+
+
+def test_z_scores_use_expanding_statistics():
+    df = daily_series(years=1)
+    result = OnlineAnomalyDetector().update(df)
+    
+    values = df["value"].dropna()
+    expanding = values.expanding(min_periods=2)
+    expected = (values - expanding.mean()) / expanding.std()
+    np.testing.assert_allclose(result["z_score"].dropna(), expected.dropna(), rtol=1e-9)
+    assert result.loc[df["value"].isna(), "z_score"].isna().all()
+    assert result["is_anomaly"].iloc[100]
+
+
+def test_state_round_trip_continues_the_stream():
+    df = daily_series()
+    head, tail = df.iloc[:1000], df.iloc[1000:]
+    
+    detector = OnlineAnomalyDetector(seasonal="dayofyear", threshold=3)
+    detector.update(head)
+    restored = OnlineAnomalyDetector.from_state(json.loads(json.dumps(detector.state_dict())))
+    
+    pd.testing.assert_frame_equal(restored.update(tail), detector.update(tail))
+
+
+def test_rows_are_scored_in_date_order_and_keep_their_index():
+    df = daily_series(years=1)
+    shuffled = df.sample(frac=1, random_state=1)
+    
+    expected = OnlineAnomalyDetector(seasonal="month").update(df)
+    result = OnlineAnomalyDetector(seasonal="month").update(shuffled)
+    
+    assert result.index.equals(shuffled.index)
+    pd.testing.assert_frame_equal(result.sort_index(), expected)
+
+
+@pytest.mark.parametrize("seasonal", [None, "month", "dayofyear"])
+def test_batch_columns_match_the_detector(seasonal):
+    df = daily_series().sample(frac=1, random_state=2)
+    
+    expected = OnlineAnomalyDetector(seasonal=seasonal, threshold=2.5).update(df)
+    result = processor.anomaly_columns(df, threshold=2.5, seasonal=seasonal)
+    
+    np.testing.assert_allclose(result["z_score"], expected["z_score"], rtol=1e-9, atol=1e-12)
+    assert result["is_anomaly"].tolist() == expected["is_anomaly"].tolist()
+
+
+def test_out_of_order_chunks_are_rejected():
+    df = daily_series(years=1)
+    detector = OnlineAnomalyDetector()
+    detector.update(df.iloc[100:200])
+    state = detector.state_dict()
+    
+    with pytest.raises(ValueError):
+        detector.update(df.iloc[50:150])
+    # A rejected chunk leaves the statistics alone.
+    assert detector.state_dict() == state
+    # A chunk may start on the last date already seen.
+    detector.update(df.iloc[199:250])
+    
+    restored = OnlineAnomalyDetector.from_state(json.loads(json.dumps(detector.state_dict())))
+    assert restored.last_date == df["date"].iloc[249]
+    with pytest.raises(ValueError):
+        restored.update(df.iloc[:10])
+
+
+def test_seasonal_baseline_follows_spacing_and_span():
+    assert seasonal_baseline(pd.date_range("1990-01-01", "2020-12-31", freq="D")) == "dayofyear"
+    assert seasonal_baseline(pd.date_range("2020-01-01", "2020-12-31", freq="D")) == "month"
+    assert seasonal_baseline(pd.date_range("2000-01-03", "2020-12-31", freq="W-MON")) == "month"
+    assert seasonal_baseline(pd.date_range("1990-01-01", "2020-12-31", freq="MS")) == "month"
+    assert seasonal_baseline(pd.date_range("2019-01-01", "2020-12-31", freq="MS")) is None
+    assert seasonal_baseline(pd.date_range("1900-01-01", "2020-12-31", freq="YS")) is None
+    assert seasonal_baseline([]) is None
@@ -0,0 +1,210 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import pandas as pd
+import pytest
+
+from climate_data import api
+from climate_data.api import ApiError, NoaaClient, fetch_data
+from climate_data.ratelimit import QuotaExceededError, RateLimiter
+
+
+class StubApi:
+    # Serves CDO-shaped /data pages from self.rows; scripted responses queued
+    # in self.responses are returned first, one per request.
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+        self.responses = []
+        self.requests = []
+        self._lock = threading.Lock()
+    
+    def respond(self, path, params):
+        with self._lock:
+            self.requests.append((path, params))
+            if self.responses:
+                return self.responses.pop(0)
+        
+        start, end = params["startdate"], params["enddate"]
+        rows = [row for row in self.rows if start <= row["date"][:10] <= end]
+        offset, limit = int(params["offset"]), int(params["limit"])
+        body = {
+            "metadata": {"resultset": {"offset": offset, "count": len(rows), "limit": limit}},
+            "results": rows[offset - 1:offset - 1 + limit]
+        }
+        return 200, {}, body
+
+
+@pytest.fixture
+def stub():
+    stub_api = StubApi()
+    
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlsplit(self.path)
+            status, headers, body = stub_api.respond(url.path.rsplit("/", 1)[-1], dict(parse_qsl(url.query)))
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        
+        def log_message(self, *args):
+            pass
+    
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    stub_api.url = f"http://127.0.0.1:{server.server_port}/"
+    yield stub_api
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    # Backoff pauses are recorded instead of slept.
+    recorded = []
+    monkeypatch.setattr(api.time, "sleep", recorded.append)
+    return recorded
+
+
+def make_client(stub, **kwargs):
+    kwargs.setdefault("rate_limiter", RateLimiter(rate=1000, daily_limit=None))
+    return NoaaClient(base_url=stub.url, **kwargs)
+
+
+def daily_rows(start, end):
+    dates = pd.date_range(start, end, freq="D")
+    return [
+        {"date": date.strftime("%Y-%m-%dT00:00:00"), "datatype": "TMAX", "station": "GHCND:TEST", "attributes": ",,7,", "value": float(i)}
+        for i, date in enumerate(dates)
+    ]
+
+
+def test_fetch_data_reads_every_page_of_every_window(stub):
+    stub.rows = daily_rows("2019-12-01", "2020-03-01")
+    client = make_client(stub)
+    
+    df = fetch_data("GHCND", "2019-12-01", "2020-03-01", stationid="GHCND:TEST", datatypeid="TMAX", limit=25, client=client)
+    
+    assert len(df) == len(stub.rows)
+    assert df["date"].is_monotonic_increasing
+    assert df["value"].tolist() == [row["value"] for row in stub.rows]
+    
+    # 31 rows in the 2019 window, 61 in the 2020 one.
+    offsets = {}
+    for path, params in stub.requests:
+        assert path == "data"
+        offsets.setdefault(params["startdate"], []).append(int(params["offset"]))
+    assert {window: sorted(pages) for window, pages in offsets.items()} == {
+        "2019-12-01": [1, 26],
+        "2020-01-01": [1, 26, 51]
+    }
+
+
+class GatedClient:
+    # 2019's first page is held until both later 2020 pages are in flight
+    # together, so it only returns if they run in parallel and before it.
+    def __init__(self, client):
+        self.client = client
+        self.later_pages = threading.Barrier(2, timeout=5)
+        self.overtaken = threading.Event()
+    
+    def get(self, endpoint, params=None):
+        if params["startdate"] == "2019-12-01" and params["offset"] == 1:
+            assert self.overtaken.wait(5)
+        if params["startdate"] == "2020-01-01" and params["offset"] > 1:
+            self.later_pages.wait()
+            self.overtaken.set()
+        return self.client.get(endpoint, params=params)
+
+
+def test_later_pages_start_with_their_own_first_page(stub):
+    stub.rows = daily_rows("2019-12-01", "2020-03-01")
+    client = GatedClient(make_client(stub))
+    
+    df = fetch_data("GHCND", "2019-12-01", "2020-03-01", stationid="GHCND:TEST", datatypeid="TMAX", limit=25, client=client)
+    
+    assert df["value"].tolist() == [row["value"] for row in stub.rows]
+    assert len(stub.requests) == 5
+
+
+def test_get_retries_server_errors_with_exponential_backoff(stub, sleeps):
+    stub.responses = [(503, {}, {}), (500, {}, {}), (200, {}, {"results": [{"id": 1}]})]
+    client = make_client(stub, backoff_factor=0.5)
+    
+    assert client.get("stations") == {"results": [{"id": 1}]}
+    assert len(stub.requests) == 3
+    assert sleeps == [0.5, 1.0]
+
+
+def test_get_honours_retry_after(stub, sleeps):
+    stub.responses = [(429, {"Retry-After": "7"}, {}), (429, {"Retry-After": "120"}, {}), (200, {}, {})]
+    client = make_client(stub, max_backoff=30)
+    
+    assert client.get("stations") == {}
+    assert sleeps == [7.0, 30]
+
+
+def test_get_gives_up_after_max_retries(stub, sleeps):
+    stub.responses = [(503, {}, {})] * 3
+    client = make_client(stub, max_retries=2)
+    
+    with pytest.raises(ApiError) as error:
+        client.get("stations")
+    
+    assert error.value.status_code == 503
+    assert len(stub.requests) == 3
+    assert len(sleeps) == 2
+
+
+def test_get_does_not_retry_client_errors(stub, sleeps):
+    stub.responses = [(400, {}, {"message": "bad request"})]
+    client = make_client(stub)
+    
+    with pytest.raises(ApiError) as error:
+        client.get("stations")
+    
+    assert error.value.status_code == 400
+    assert len(stub.requests) == 1
+    assert sleeps == []
+
+
+def test_daily_quota_stops_requests(stub):
+    limiter = RateLimiter(rate=1000, daily_limit=2)
+    client = make_client(stub, rate_limiter=limiter)
+    stub.responses = [(200, {}, {})] * 2
+    
+    client.get("stations")
+    client.get("stations")
+    with pytest.raises(QuotaExceededError):
+        client.get("stations")
+    
+    assert len(stub.requests) == 2
+    assert limiter.remaining_today() == 0
+
+
+def test_fetch_data_returns_empty_frame_when_quota_runs_out(stub):
+    stub.rows = daily_rows("2019-12-01", "2020-03-01")
+    client = make_client(stub, rate_limiter=RateLimiter(rate=1000, daily_limit=1))
+    
+    df = fetch_data("GHCND", "2019-12-01", "2020-03-01", stationid="GHCND:TEST", datatypeid="TMAX", limit=25, client=client)
+    
+    assert df.empty
+    assert len(stub.requests) == 1
+
+
+def test_rate_limiter_spaces_requests():
+    limiter = RateLimiter(rate=20, per=1.0, daily_limit=None)
+    started = time.monotonic()
+    for _ in range(25):
+        limiter.acquire()
+    
+    # The first 20 are the initial burst, the other 5 wait 50 ms each.
+    assert time.monotonic() - started >= 0.2
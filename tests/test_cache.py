@@ -0,0 +1,212 @@
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import pytest
+
+from climate_data import cache
+
+
+def figure(points):
+    dates = pd.date_range("2000-01-01", periods=points, freq="D")
+    return go.Figure(go.Scatter(x=dates, y=np.arange(points, dtype=np.float64), mode="lines"))
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+@pytest.fixture
+def switch_often():
+    # Thread switches every microsecond make lost counter updates likely.
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def test_figures_are_sized_by_their_traces():
+    small, large = cache.estimate_size(figure(100)), cache.estimate_size(figure(10000))
+    
+    # Each point adds a float and a boxed date on top of the fixed layout.
+    assert small > 100 * 8
+    assert large - small > 9900 * (8 + 8)
+    # Same order of magnitude as what the browser receives.
+    assert 0.2 < large / len(figure(10000).to_json()) < 5
+
+
+def test_figures_count_against_max_bytes():
+    figures = cache.LRUCache(max_bytes=cache.estimate_size(figure(5000)) * 3)
+    for i in range(10):
+        figures.set(i, figure(5000))
+    
+    stats = figures.stats()
+    assert stats["items"] == 3
+    assert stats["evictions"] == 7
+
+
+def test_memoize_counters_are_exact_under_threads(monkeypatch, switch_often):
+    monkeypatch.setattr(cache, "analysis_cache", cache.LRUCache())
+    
+    @cache.memoize()
+    def square(x):
+        return x * x
+    
+    square(3)
+    
+    def hit():
+        for _ in range(2000):
+            square(3)
+    
+    threads = [threading.Thread(target=hit) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert square.cache_info() == {"hits": 16000, "misses": 1, "shared": 0}
+    square.cache_clear()
+    assert square.cache_info() == {"hits": 0, "misses": 0, "shared": 0}
+
+
+@pytest.fixture
+def isolated(monkeypatch):
+    monkeypatch.setattr(cache, "analysis_cache", cache.LRUCache())
+    monkeypatch.setattr(cache, "analysis_flights", cache.SingleFlight())
+
+
+def test_changed_frames_miss_the_memo(isolated):
+    calls = []
+    
+    @cache.memoize()
+    def total(df):
+        calls.append(1)
+        return float(df["value"].sum())
+    
+    df = pd.DataFrame({"value": [1.0, 2.0, 3.0]})
+    assert total(df) == 6.0
+    assert total(df.copy()) == 6.0
+    
+    # Neither an edited copy nor the same object edited in place is served
+    # the old result: unregistered frames are hashed on every call.
+    edited = df.copy()
+    edited.loc[0, "value"] = 10.0
+    assert total(edited) == 15.0
+    df.loc[2, "value"] = 0.0
+    assert total(df) == 3.0
+    df["extra"] = 1
+    assert total(df) == 3.0
+    
+    assert len(calls) == 4
+    assert total.cache_info() == {"hits": 1, "misses": 4, "shared": 0}
+
+
+def test_registered_fingerprints_follow_the_object(isolated):
+    df = pd.DataFrame({"value": np.arange(10.0)})
+    cache.register_fingerprint(df, "known")
+    
+    assert cache.frame_fingerprint(df) == "known"
+    # An equal frame is hashed, not mistaken for the registered one.
+    assert cache.frame_fingerprint(df.copy()) != "known"
+    
+    key = id(df)
+    del df
+    assert key not in cache._known_fingerprints
+
+
+def test_single_flight_collapses_concurrent_calls():
+    flights = cache.SingleFlight()
+    callers = 8
+    release = threading.Event()
+    calls = []
+    results = []
+    
+    def load():
+        calls.append(1)
+        release.wait(5)
+        return object()
+    
+    def call():
+        results.append(flights.do("key", load))
+    
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    # Let the followers queue up behind the leader before it finishes.
+    wait_until(lambda: flights.stats()["shared"] == callers - 1)
+    release.set()
+    for thread in threads:
+        thread.join()
+    
+    assert len(calls) == 1
+    assert len(results) == callers and all(result is results[0] for result in results)
+    assert flights.stats() == {"executed": 1, "shared": callers - 1, "in_flight": 0}
+    
+    # Once the flight has landed the next call runs again.
+    release.set()
+    assert flights.do("key", load) is not results[0]
+    assert len(calls) == 2
+
+
+def test_single_flight_shares_errors_and_separates_keys():
+    flights = cache.SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    errors = []
+    
+    def fail():
+        started.set()
+        release.wait(5)
+        raise ValueError("сбой")
+    
+    def call():
+        try:
+            flights.do("bad", fail)
+        except ValueError as exc:
+            errors.append(exc)
+    
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=call)
+    follower.start()
+    wait_until(lambda: flights.stats()["shared"] == 1)
+    # Another key is not held up by the pending one.
+    assert flights.do("other", lambda: 42) == 42
+    release.set()
+    leader.join()
+    follower.join()
+    
+    assert len(errors) == 2 and errors[0] is errors[1]
+    assert flights.stats()["in_flight"] == 0
+
+
+def test_concurrent_memoized_calls_compute_once(isolated):
+    callers = 6
+    calls = []
+    
+    @cache.memoize()
+    def slow_mean(df):
+        calls.append(1)
+        # Hold the computation until every caller has joined the flight.
+        wait_until(lambda: cache.analysis_flights.stats()["shared"] == callers - 1)
+        return df["value"].mean()
+    
+    df = pd.DataFrame({"value": np.arange(100.0)})
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(slow_mean(df))) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert len(calls) == 1
+    assert results == [49.5] * callers
+    assert slow_mean.cache_info() == {"hits": 0, "misses": 1, "shared": callers - 1}
+    assert slow_mean(df) == 49.5
+    assert slow_mean.cache_info()["hits"] == 1
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from dashboard.downsample import downsample, lttb_indices, minmax_indices, relayout_range, visible_range
+
+
+def noisy_series(n, seed=0):
+    rng = np.random.default_rng(seed)
+    x = np.arange(n, dtype=np.float64)
+    y = np.sin(x / 50) + rng.normal(0, 0.1, n)
+    return x, y
+
+
+@pytest.mark.parametrize('n_out', [3, 4, 10, 500, 999])
+def test_lttb_keeps_endpoints_and_one_point_per_bucket(n_out):
+    n = 1000
+    x, y = noisy_series(n)
+    selected = lttb_indices(x, y, n_out)
+    
+    assert len(selected) == n_out
+    assert selected[0] == 0 and selected[-1] == n - 1
+    assert np.all(np.diff(selected) > 0)
+    
+    # Inner points come one from each of the n_out - 2 buckets over 1..n-2.
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    for bucket, index in enumerate(selected[1:-1]):
+        assert edges[bucket] <= index < edges[bucket + 1]
+
+
+def test_lttb_keeps_a_spike():
+    x, y = noisy_series(10000)
+    y[4321] = 50
+    assert 4321 in lttb_indices(x, y, 200)
+
+
+def test_lttb_returns_everything_when_nothing_to_drop():
+    x, y = noisy_series(100)
+    np.testing.assert_array_equal(lttb_indices(x, y, 100), np.arange(100))
+    np.testing.assert_array_equal(lttb_indices(x, y, 500), np.arange(100))
+
+
+def test_minmax_keeps_the_extremes():
+    x, y = noisy_series(10000)
+    y[1234], y[8765] = -40, 40
+    selected = minmax_indices(x, y, 100)
+    
+    assert {0, 1234, 8765, 9999} <= set(selected)
+    assert len(selected) <= 100 + 2
+    assert np.all(np.diff(selected) > 0)
+
+
+def test_downsample_keeps_aligned_rows_of_every_column():
+    dates = pd.date_range('1950-01-01', periods=20000, freq='D')
+    x, y = noisy_series(len(dates))
+    df = pd.DataFrame({'date': dates, 'tmax': y, 'tmin': y - 10})
+    df.loc[df.index[:5], 'tmax'] = np.nan
+    
+    result = downsample(df, columns=('tmax', 'tmin'), n_out=300)
+    
+    assert result.index.isin(df.index).all()
+    assert result['date'].is_monotonic_increasing
+    assert len(result) <= 2 * 300
+    # First valid row of each column and the last row are kept.
+    assert {df.index[0], df.index[5], df.index[-1]} <= set(result.index)
+
+
+def test_downsample_leaves_small_frames_alone():
+    df = pd.DataFrame({'date': pd.date_range('2000-01-01', periods=50), 'value': np.arange(50.0)})
+    assert downsample(df, n_out=100) is df
+
+
+def test_downsample_rejects_unknown_method():
+    df = pd.DataFrame({'date': pd.date_range('2000-01-01', periods=50), 'value': np.arange(50.0)})
+    with pytest.raises(ValueError):
+        downsample(df, n_out=10, method='mean')
+
+
+def test_visible_range_adds_one_neighbour_on_each_side():
+    df = pd.DataFrame({'date': pd.date_range('2000-01-01', periods=10), 'value': np.arange(10.0)})
+    result = visible_range(df, ['2000-01-04', '2000-01-06'])
+    assert result['value'].tolist() == [2.0, 3.0, 4.0, 5.0, 6.0]
+
+
+def test_relayout_range():
+    assert relayout_range({'xaxis.range[0]': 'a', 'xaxis.range[1]': 'b'}) == ['a', 'b']
+    assert relayout_range({'xaxis.range': ('a', 'b')}) == ['a', 'b']
+    assert relayout_range({'xaxis.autorange': True}) is None
+    assert relayout_range(None) is None
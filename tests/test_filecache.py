@@ -0,0 +1,183 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from climate_data import cache
+from climate_data.filecache import ARROW_MAGIC, FileCache, private_directory
+from climate_data.storage import atomic_write
+
+
+def frame(rows, value=0.0):
+    return pd.DataFrame({
+        "date": pd.date_range("2000-01-01", periods=rows, freq="D"),
+        "station": pd.Categorical(["A", "B"] * (rows // 2) + ["A"] * (rows % 2)),
+        "value": np.full(rows, value)
+    })
+
+
+def files(root):
+    return sorted(os.listdir(root))
+
+
+def test_dataframes_round_trip_through_arrow(tmp_path):
+    file_cache = FileCache(tmp_path / "cache")
+    df = frame(100, 1.5)
+    file_cache.set("frame", df)
+    
+    pd.testing.assert_frame_equal(file_cache.get("frame"), df)
+    with open(file_cache._path("frame"), "rb") as source:
+        assert source.read(len(ARROW_MAGIC)) == ARROW_MAGIC
+
+
+def test_other_values_are_pickled(tmp_path):
+    file_cache = FileCache(tmp_path / "cache")
+    value = {"trend": [1.0, 2.0], "label": "год"}
+    file_cache.set(("analysis", 1), value)
+    
+    assert file_cache.get(("analysis", 1)) == value
+    assert ("analysis", 1) in file_cache
+    assert file_cache.get("missing", "default") == "default"
+    assert file_cache.stats()["hits"] == 1
+    assert file_cache.stats()["misses"] == 1
+
+
+def test_unserializable_values_leave_nothing_behind(tmp_path):
+    file_cache = FileCache(tmp_path / "cache")
+    file_cache.set("callback", lambda: None)
+    
+    assert "callback" not in file_cache
+    assert files(file_cache.root) == []
+
+
+def test_failed_write_keeps_the_previous_entry(tmp_path):
+    path = tmp_path / "entry"
+    path.write_bytes(b"old")
+    
+    def write(tmp_path):
+        with open(tmp_path, "wb") as sink:
+            sink.write(b"partial")
+        raise OSError("disk full")
+    
+    with pytest.raises(OSError):
+        atomic_write(path, write)
+    
+    assert path.read_bytes() == b"old"
+    assert files(tmp_path) == ["entry"]
+
+
+def test_readers_never_see_a_partial_entry(tmp_path):
+    file_cache = FileCache(tmp_path / "cache")
+    file_cache.set("shared", frame(1000, 0.0))
+    errors = []
+    
+    def write():
+        for i in range(1, 30):
+            file_cache.set("shared", frame(1000, float(i)))
+    
+    def read():
+        for _ in range(60):
+            df = file_cache.get("shared")
+            if df is None or len(df) != 1000 or df["value"].nunique() != 1:
+                errors.append(df)
+    
+    threads = [threading.Thread(target=write) for _ in range(2)] + [threading.Thread(target=read) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert errors == []
+    assert files(file_cache.root) == [file_cache._path("shared").name]
+
+
+def test_evicts_least_recently_used_by_count(tmp_path):
+    file_cache = FileCache(tmp_path / "cache", max_items=3)
+    for age, key in enumerate(["a", "b", "c"]):
+        file_cache.set(key, key)
+        # Recency is the file mtime: a is the oldest, c the newest.
+        os.utime(file_cache._path(key), (1000 + age, 1000 + age))
+    
+    assert file_cache.get("a") == "a"
+    file_cache.set("d", "d")
+    
+    assert "b" not in file_cache
+    assert all(key in file_cache for key in ["a", "c", "d"])
+    assert file_cache.stats()["evictions"] == 1
+
+
+def test_evicts_down_to_max_bytes(tmp_path):
+    file_cache = FileCache(tmp_path / "cache", max_bytes=150_000)
+    for i in range(10):
+        file_cache.set(i, frame(2000, float(i)))
+        os.utime(file_cache._path(i), (1000 + i, 1000 + i))
+    
+    stats = file_cache.stats()
+    assert 0 < stats["bytes"] <= 150_000
+    assert stats["items"] < 10
+    assert 9 in file_cache
+    assert 0 not in file_cache
+
+
+def test_temporary_files_are_not_entries(tmp_path):
+    file_cache = FileCache(tmp_path / "cache", max_items=1)
+    (file_cache.root / ".tmp-writing").write_bytes(b"x" * 100)
+    file_cache.set("a", "a")
+    
+    assert len(file_cache) == 1
+    assert (file_cache.root / ".tmp-writing").exists()
+    
+    file_cache.clear()
+    assert len(file_cache) == 0
+
+
+def test_private_directory_rejects_shared_directories(tmp_path):
+    assert private_directory(tmp_path / "new").stat().st_mode & 0o777 == 0o700
+    
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    shared.chmod(0o777)
+    with pytest.raises(PermissionError):
+        FileCache(shared)
+    
+    link = tmp_path / "link"
+    link.symlink_to(tmp_path / "new")
+    with pytest.raises(PermissionError):
+        private_directory(link)
+
+
+def test_cache_backend_uses_the_cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_DIR", None)
+    assert isinstance(cache.cache_backend("analysis"), cache.LRUCache)
+    
+    monkeypatch.setattr(cache, "CACHE_DIR", str(tmp_path / "cache"))
+    backend = cache.cache_backend("analysis", max_items=10)
+    assert isinstance(backend, cache.TieredCache)
+    assert isinstance(backend.shared, FileCache)
+    assert backend.shared.root == tmp_path / "cache" / "analysis"
+    assert backend.local.max_bytes == cache.LOCAL_CACHE_MAX_BYTES
+
+
+def test_tiered_cache_reads_the_file_once_per_process(tmp_path):
+    shared = FileCache(tmp_path / "cache")
+    writer = cache.TieredCache(cache.LRUCache(), shared)
+    reader = cache.TieredCache(cache.LRUCache(), FileCache(tmp_path / "cache"))
+    df = frame(100, 2.0)
+    writer.set("frame", df)
+    
+    # Another worker reads the file once, then serves the same object.
+    first = reader.get("frame")
+    pd.testing.assert_frame_equal(first, df)
+    assert reader.get("frame") is first
+    assert reader.shared.stats()["hits"] == 1
+    assert reader.stats()["local"]["hits"] == 1
+    
+    # The writer never reads its own entry back from the file.
+    assert writer.get("frame") is df
+    assert shared.stats()["hits"] == 0
+    
+    assert reader.get("missing", "default") == "default"
+    writer.delete("frame")
+    assert "frame" not in writer
@@ -0,0 +1,124 @@
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from climate_data.forecast import DAY_NS, fit_series, forecast, t_quantile, YEAR_DAYS
+
+
+def series(station, start, periods, freq="D", seed=0, amplitude=8.0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start, periods=periods, freq=freq)
+    days = dates.values.astype("datetime64[ns]").view(np.int64) / DAY_NS
+    values = 12 + 0.5 * (days - days[0]) / YEAR_DAYS + amplitude * np.sin(2 * np.pi * days / YEAR_DAYS) + rng.normal(0, 1.5, periods)
+    return pd.DataFrame({"date": dates, "value": values, "station": station})
+
+
+@pytest.fixture
+def stations():
+    # A spans three years, B less than one and C has too few points for the
+    # harmonics; rows are interleaved.
+    df = pd.concat([
+        series("A", "2015-01-01", 3 * 365),
+        series("B", "2016-03-01", 200, seed=1),
+        series("C", "2015-01-01", 4, freq="150D", seed=2)
+    ])
+    return df.sample(frac=1, random_state=0).reset_index(drop=True)
+
+
+def design(rows, harmonics, seasonal):
+    days = rows["date"].values.astype("datetime64[ns]").view(np.int64) / DAY_NS
+    columns = [np.ones(len(days)), (days - days.mean()) / YEAR_DAYS]
+    if seasonal:
+        for k in range(1, harmonics + 1):
+            columns += [np.sin(2 * np.pi * k * days / YEAR_DAYS), np.cos(2 * np.pi * k * days / YEAR_DAYS)]
+    return np.stack(columns, axis=1)
+
+
+@pytest.mark.parametrize("harmonics", [1, 2])
+def test_coefficients_match_lstsq_per_group(stations, harmonics):
+    fit = fit_series(stations, harmonics=harmonics, by="station")
+    
+    for code, station in enumerate(fit.group_index):
+        rows = stations[stations["station"] == station]
+        seasonal = station == "A"
+        assert fit.seasonal[code] == seasonal
+        
+        matrix = design(rows, harmonics, seasonal)
+        expected, residuals, _, _ = np.linalg.lstsq(matrix, rows["value"].to_numpy(), rcond=None)
+        np.testing.assert_allclose(fit.coefficients[code, :matrix.shape[1]], expected, rtol=1e-7, atol=1e-9)
+        assert fit.dof[code] == len(rows) - matrix.shape[1]
+        assert fit.sigma[code] == pytest.approx(np.sqrt(residuals[0] / fit.dof[code]))
+
+
+def test_seasonal_terms_are_pinned_for_short_series(stations):
+    fit = fit_series(stations, harmonics=2, by="station")
+    
+    pinned = ~fit.seasonal
+    assert fit.group_index[pinned].tolist() == ["B", "C"]
+    np.testing.assert_array_equal(fit.coefficients[pinned, 2:], 0.0)
+    assert np.all(np.abs(fit.coefficients[fit.seasonal, 2]) > 1)
+
+
+def test_interval_matches_the_closed_form(stations):
+    level = 0.9
+    result = forecast(stations, horizon=10, level=level, by="station")
+    
+    for station in ["A", "B", "C"]:
+        rows = stations[stations["station"] == station].sort_values("date")
+        seasonal = station == "A"
+        matrix = design(rows, 1, seasonal)
+        values = rows["value"].to_numpy()
+        coefficients = np.linalg.lstsq(matrix, values, rcond=None)[0]
+        dof = len(rows) - matrix.shape[1]
+        sigma = np.sqrt(np.sum((values - matrix @ coefficients) ** 2) / dof)
+        
+        future = rows["date"].iloc[-1] + pd.to_timedelta(np.arange(1, 11), unit="D")
+        days = future.values.astype("datetime64[ns]").view(np.int64) / DAY_NS
+        centre = rows["date"].values.astype("datetime64[ns]").view(np.int64).mean() / DAY_NS
+        points = np.stack([np.ones(10), (days - centre) / YEAR_DAYS] + (
+            [np.sin(2 * np.pi * days / YEAR_DAYS), np.cos(2 * np.pi * days / YEAR_DAYS)] if seasonal else []
+        ), axis=1)
+        leverage = np.einsum("ni,ij,nj->n", points, np.linalg.inv(matrix.T @ matrix), points)
+        margin = t_quantile(0.5 + level / 2, dof) * sigma * np.sqrt(1 + leverage)
+        
+        forecasted = result[result["station"] == station]
+        assert forecasted["date"].tolist() == list(future)
+        np.testing.assert_allclose(forecasted["value"], points @ coefficients, rtol=1e-7)
+        np.testing.assert_allclose(forecasted["upper"] - forecasted["value"], margin, rtol=1e-6)
+        np.testing.assert_allclose(forecasted["value"] - forecasted["lower"], margin, rtol=1e-6)
+
+
+def test_interval_widens_with_horizon_and_leverage(stations):
+    result = forecast(stations, horizon=60, by="station")
+    width = {station: (rows["upper"] - rows["lower"]).to_numpy() for station, rows in result.groupby("station")}
+    
+    # Without harmonics leverage grows with the distance from the centre.
+    assert np.all(np.diff(width["B"]) > 0)
+    assert np.all(np.diff(width["C"]) > 0)
+    # Four points leave two degrees of freedom: the t quantile is far wider
+    # than the normal one.
+    fit = fit_series(stations, by="station")
+    code = fit.group_index.get_loc("C")
+    normal = 2 * NormalDist().inv_cdf(0.975) * fit.sigma[code]
+    assert width["C"][0] > 1.5 * normal
+
+
+@pytest.mark.parametrize("dof, expected", [(1, 12.706), (2, 4.303), (3, 3.182), (5, 2.571), (10, 2.228), (30, 2.042)])
+def test_t_quantile_matches_the_tables(dof, expected):
+    assert t_quantile(0.975, dof) == pytest.approx(expected, abs=1e-3)
+
+
+def test_t_quantile_tends_to_the_normal():
+    assert t_quantile(0.975, 100000) == pytest.approx(NormalDist().inv_cdf(0.975), abs=1e-4)
+    assert t_quantile(0.95, 4) == pytest.approx(2.132, abs=1e-3)
+
+
+def test_series_without_residual_dof_have_no_interval():
+    df = series("A", "2020-01-01", 2)
+    result = forecast(df, horizon=3)
+    
+    assert len(result) == 3
+    assert result["lower"].isna().all()
+    assert result["value"].notna().all()
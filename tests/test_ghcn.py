@@ -0,0 +1,159 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from climate_data.compact import QFLAG_CODES
+from climate_data.ghcn import _parse_ints, iter_dly, load_dly_files, MISSING_VALUE, parse_dly_block, read_dly, read_stations
+from climate_data.storage import PartitionStore
+
+STATION = "USW00094728"
+
+
+def dly_line(year, month, element, values, station=STATION, qflags=None):
+    # One fixed-width record: id, year, month, element and 31 day slots of
+    # value (5), mflag, qflag and sflag; unused slots hold -9999.
+    qflags = qflags or {}
+    days = []
+    for day in range(31):
+        value = values[day] if day < len(values) else MISSING_VALUE
+        days.append(f"{value:5d} {qflags.get(day + 1, ' ')}7")
+    return f"{station}{year:04d}{month:02d}{element}" + "".join(days)
+
+
+def station_line(station, latitude, longitude, elevation, state, name, gsn="", hcn="", wmo=""):
+    return f"{station:11} {latitude:8.4f} {longitude:9.4f} {elevation:6.1f} {state:2} {name:30} {gsn:3} {hcn:3} {wmo:5}"
+
+
+def parsed(*lines, elements=None):
+    return parse_dly_block("\n".join(lines).encode("ascii"), elements)
+
+
+def test_line_layout_matches_the_format():
+    assert len(dly_line(2020, 1, "TMAX", [0] * 31)) == 269
+
+
+def test_tenths_are_scaled_for_tmax_and_prcp_only():
+    df = parsed(
+        dly_line(2020, 1, "TMAX", [-236, 160, 5]),
+        dly_line(2020, 1, "PRCP", [0, 13, 254]),
+        dly_line(2020, 1, "SNOW", [0, 25, 130])
+    )
+    
+    by_type = {element: rows["value"].tolist() for element, rows in df.groupby("type", observed=True)}
+    np.testing.assert_allclose(by_type["TMAX"], [-23.6, 16.0, 0.5], rtol=1e-6)
+    np.testing.assert_allclose(by_type["PRCP"], [0.0, 1.3, 25.4], rtol=1e-6)
+    assert by_type["SNOW"] == [0.0, 25.0, 130.0]
+    assert df["value"].dtype == np.float32
+    assert set(df["station"]) == {STATION}
+
+
+def test_missing_values_are_dropped():
+    df = parsed(dly_line(2020, 3, "TMAX", [10, MISSING_VALUE, 30, MISSING_VALUE]))
+    
+    assert df["date"].tolist() == [pd.Timestamp("2020-03-01"), pd.Timestamp("2020-03-03")]
+    np.testing.assert_allclose(df["value"], [1.0, 3.0])
+
+
+@pytest.mark.parametrize("year, month, days", [(2019, 2, 28), (2020, 2, 29), (2020, 4, 30), (2020, 12, 31)])
+def test_slots_past_the_end_of_the_month_are_ignored(year, month, days):
+    # Filled slots past the month end must not turn into dates of the next month.
+    df = parsed(dly_line(year, month, "TMAX", list(range(1, 32))))
+    
+    assert len(df) == days
+    assert df["date"].iloc[0] == pd.Timestamp(year=year, month=month, day=1)
+    assert df["date"].iloc[-1] == pd.Timestamp(year=year, month=month, day=days)
+    assert df["date"].dt.month.eq(month).all()
+
+
+def test_short_and_null_padded_lines():
+    full = dly_line(2020, 5, "TMAX", [100 + day for day in range(31)], qflags={3: "I"})
+    # Cut after the value of day 5, in the middle of its flags, and after the
+    # header alone.
+    cut = full[:21 + 8 * 4 + 5]
+    df = parsed(cut, full[:21], full[:15])
+    
+    assert df["date"].tolist() == list(pd.date_range("2020-05-01", "2020-05-05"))
+    np.testing.assert_allclose(df["value"], [10.0, 10.1, 10.2, 10.3, 10.4], rtol=1e-6)
+    # The flag of day 5 was cut off and is read as blank, not as unknown.
+    assert df["qflag"].tolist() == [QFLAG_CODES[""]] * 2 + [QFLAG_CODES["I"]] + [QFLAG_CODES[""]] * 2
+
+
+def test_quality_flags_are_encoded():
+    df = parsed(dly_line(2020, 1, "TMAX", [1, 2, 3, 4], qflags={2: "I", 3: "S", 4: "?"}))
+    
+    assert df["qflag"].dtype == np.int8
+    assert df["qflag"].tolist() == [QFLAG_CODES[""], QFLAG_CODES["I"], QFLAG_CODES["S"], -1]
+
+
+def test_elements_filter():
+    df = parsed(dly_line(2020, 1, "TMAX", [1]), dly_line(2020, 1, "TMIN", [2]), elements=["TMIN"])
+    
+    assert df["type"].tolist() == ["TMIN"]
+    assert isinstance(df["type"].dtype, pd.CategoricalDtype)
+
+
+def test_empty_block_has_the_columns():
+    df = parse_dly_block(b"")
+    assert df.empty
+    assert list(df.columns) == ["date", "value", "type", "station", "qflag"]
+
+
+def test_parse_ints():
+    chars = np.frombuffer(b"  -12    7-9999 1234", dtype=np.uint8).reshape(4, 5)
+    assert _parse_ints(chars).tolist() == [-12, 7, -9999, 1234]
+
+
+def test_chunked_reading_matches_one_block(tmp_path):
+    lines = [dly_line(2019 + month // 12, month % 12 + 1, element, list(range(31)))
+             for month in range(24) for element in ("TMAX", "PRCP")]
+    path = tmp_path / f"{STATION}.dly"
+    path.write_text("\n".join(lines) + "\n", encoding="ascii")
+    
+    whole = parsed(*lines)
+    chunks = list(iter_dly(path, chunk_bytes=1000))
+    
+    assert len(chunks) > 1
+    pd.testing.assert_frame_equal(
+        pd.concat(chunks, ignore_index=True).astype({"type": str, "station": str}),
+        whole.astype({"type": str, "station": str})
+    )
+    assert isinstance(read_dly(path)["type"].dtype, pd.CategoricalDtype)
+
+
+def test_read_stations(tmp_path):
+    path = tmp_path / "ghcnd-stations.txt"
+    path.write_text("\n".join([
+        station_line("USW00094728", 40.7789, -73.9692, 39.6, "NY", "NEW YORK CNTRL PK TWR", hcn="HCN", wmo="72506"),
+        station_line("AE000041196", 25.333, 55.517, 34.0, "", "SHARJAH INTER. AIRP", gsn="GSN", wmo="41196")
+    ]) + "\n", encoding="ascii")
+    
+    stations = read_stations(path)
+    
+    assert stations["id"].tolist() == ["USW00094728", "AE000041196"]
+    assert stations["name"].tolist() == ["NEW YORK CNTRL PK TWR", "SHARJAH INTER. AIRP"]
+    assert stations["state"].tolist() == ["NY", ""]
+    assert stations["hcn_flag"].tolist() == ["HCN", ""]
+    assert stations["wmo_id"].tolist() == ["72506", "41196"]
+    assert stations["latitude"].tolist() == [40.7789, 25.333]
+
+
+def test_load_dly_files_merges_into_the_store(tmp_path):
+    path = tmp_path / f"{STATION}.dly"
+    path.write_text("\n".join([
+        dly_line(2019, 12, "TMAX", [10] * 31),
+        dly_line(2020, 1, "TMAX", [20] * 31),
+        dly_line(2020, 1, "PRCP", [5, MISSING_VALUE, 7])
+    ]) + "\n", encoding="ascii")
+    store = PartitionStore(tmp_path / "data")
+    
+    stats = load_dly_files([path], store=store)
+    # Loading the same file again adds nothing.
+    load_dly_files([path], store=store)
+    
+    assert stats["files"] == 1
+    assert stats["rows"] == 64
+    assert store.stations("GHCND", "TMAX") == [f"GHCND:{STATION}"]
+    assert store.years("GHCND", "TMAX", f"GHCND:{STATION}") == [2019, 2020]
+    prcp = store.read_years("GHCND", "PRCP", f"GHCND:{STATION}", [2020])
+    assert prcp["date"].tolist() == [pd.Timestamp("2020-01-01"), pd.Timestamp("2020-01-03")]
+    np.testing.assert_allclose(prcp["value"], [0.5, 0.7], rtol=1e-6)
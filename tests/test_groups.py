@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from climate_data import processor
+
+
+def station_rows(station, start, periods, seed, datatype="TMAX"):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "date": pd.date_range(start, periods=periods, freq="D"),
+        "value": rng.normal(15, 6, periods),
+        "station": station,
+        "type": datatype
+    })
+
+
+@pytest.fixture
+def stations():
+    # B is shorter than the window, D has a single row, C has a gap; the
+    # rows are shuffled so the series interleave.
+    df = pd.concat([
+        station_rows("A", "2018-11-01", 800, 0),
+        station_rows("A", "2018-11-01", 800, 1, datatype="TMIN"),
+        station_rows("B", "2019-01-03", 5, 2),
+        station_rows("C", "2019-06-01", 90, 3),
+        station_rows("D", "2019-02-01", 1, 4)
+    ], ignore_index=True)
+    df.loc[(df["station"] == "C") & (df["date"] == "2019-07-04"), "value"] = np.nan
+    return df.sample(frac=1, random_state=7).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("by", ["station", ["station", "type"]])
+@pytest.mark.parametrize("window_size", [1, 7, 30])
+def test_moving_average_matches_groupby_rolling(stations, by, window_size):
+    result = processor.moving_average_columns(stations, window_size=window_size, by=by)
+    
+    expected = (stations.sort_values("date", kind="stable").groupby(by)["value"]
+                .rolling(window_size).mean()
+                .reset_index(level=list(range(len(by) if isinstance(by, list) else 1)), drop=True)
+                .reindex(stations.index))
+    assert result.index.equals(stations.index)
+    np.testing.assert_allclose(result["moving_avg"], expected, rtol=1e-9)
+    # Series shorter than the window have no average at all.
+    assert result.loc[stations["station"] == "B", "moving_avg"].isna().all() == (window_size > 5)
+
+
+@pytest.mark.parametrize("by", ["station", ["station", "type"]])
+def test_anomalies_match_groupby_expanding_transform(stations, by):
+    result = processor.anomaly_columns(stations, threshold=1.5, by=by)
+    
+    # Each value against the mean and std of its series up to itself.
+    ordered = stations.dropna(subset=["value"]).sort_values("date", kind="stable")
+    expected = ordered.groupby(by)["value"].transform(
+        lambda values: (values - values.expanding(min_periods=2).mean()) / values.expanding(min_periods=2).std()
+    ).reindex(stations.index)
+    np.testing.assert_allclose(result["z_score"], expected, rtol=1e-7)
+    pd.testing.assert_series_equal(result["is_anomaly"], expected.abs() > 1.5, check_names=False)
+
+
+def test_anomalies_by_group_ignore_other_series():
+    df = pd.concat([
+        pd.DataFrame({"date": pd.date_range("2020-01-01", periods=50), "value": np.tile([0.0, 1.0], 25), "station": "A"}),
+        pd.DataFrame({"date": pd.date_range("2020-01-01", periods=50), "value": np.tile([100.0, 101.0], 25), "station": "B"})
+    ], ignore_index=True)
+    df.loc[40, "value"] = 4.0
+    
+    # The spike stands out in its own series but not next to B's values.
+    assert processor.anomaly_columns(df, threshold=2, by="station")["is_anomaly"].tolist() == [i == 40 for i in range(100)]
+    assert not processor.anomaly_columns(df, threshold=2)["is_anomaly"].iloc[40]
+
+
+def reference_trends(df, by, granularity):
+    rows = []
+    for key, group in df.dropna(subset=["value"]).groupby(by):
+        dates = group["date"]
+        if granularity == "yearly":
+            periods = dates.dt.year
+        elif granularity == "monthly":
+            periods = dates.dt.year * 12 + dates.dt.month
+        else:
+            periods = (dates - pd.Timestamp("1969-12-29")).dt.days // 7
+        means = group["value"].groupby(periods.to_numpy()).mean()
+        first, last = means.iloc[0], means.iloc[-1]
+        rows.append({
+            by: key,
+            "periods": len(means),
+            "mean": means.mean(),
+            "first": first,
+            "last": last,
+            "change_percent": (last - first) / first * 100 if len(means) > 1 else np.nan,
+            "slope": np.polyfit(means.index.to_numpy(dtype=float), means.to_numpy(), 1)[0] if len(means) > 1 else np.nan
+        })
+    return pd.DataFrame(rows).set_index(by)
+
+
+@pytest.mark.parametrize("granularity", ["yearly", "monthly", "weekly"])
+def test_group_trends_match_per_group_polyfit(stations, granularity):
+    tmax = stations[stations["type"] == "TMAX"]
+    
+    result = processor.group_trends(tmax, by="station", granularity=granularity)
+    expected = reference_trends(tmax, "station", granularity)
+    
+    result = result.reindex(expected.index)
+    assert result["periods"].tolist() == expected["periods"].tolist()
+    for column in ["mean", "first", "last", "change_percent", "slope"]:
+        np.testing.assert_allclose(result[column], expected[column], rtol=1e-7, atol=1e-12, err_msg=column)
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from climate_data import processor
+
+
+def daily_frame(days=400, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2015-01-01', periods=days, freq='D')
+    return pd.DataFrame({
+        'date': dates,
+        'value': (10 + 10 * np.sin(np.arange(days) * 2 * np.pi / 365.25) + rng.normal(0, 2, days)).astype(np.float32),
+        'type': 'TAVG'
+    })
+
+
+ANALYSES = {
+    'moving_average': lambda df, copy: processor.calculate_moving_average(df, window_size=7, copy=copy),
+    'rolling': lambda df, copy: processor.calculate_rolling(df, windows=('30D',), statistics=('mean', 'std'), copy=copy),
+    'anomalies': lambda df, copy: processor.detect_anomalies(df, copy=copy)
+}
+
+
+@pytest.mark.parametrize('analysis', sorted(ANALYSES))
+def test_copy_results_are_private(analysis):
+    run = ANALYSES[analysis]
+    df = daily_frame()
+    expected = run(df, True).copy(deep=True)
+    
+    first = run(df, True)
+    for column in first.columns:
+        if pd.api.types.is_numeric_dtype(first[column]) and not pd.api.types.is_bool_dtype(first[column]):
+            first[column] = first[column] * 0 - 1
+        else:
+            first[column] = first[column].iloc[::-1].to_numpy()
+    
+    pd.testing.assert_frame_equal(run(df, True), expected)
+    pd.testing.assert_frame_equal(run(df, False), expected)
+
+
+def test_copy_results_do_not_share_memory_with_the_input():
+    df = daily_frame()
+    result = processor.calculate_moving_average(df, window_size=7, copy=True)
+    
+    result.loc[result.index[0], 'value'] = -100
+    assert df['value'].iloc[0] != -100
+
+
+def test_wrappers_share_the_memoized_columns():
+    df = daily_frame(seed=1)
+    processor.moving_average_columns.cache_clear()
+    
+    processor.calculate_moving_average(df, window_size=7, copy=True)
+    processor.calculate_moving_average(df, window_size=7)
+    
+    info = processor.moving_average_columns.cache_info()
+    assert info['misses'] == 1
+    assert info['hits'] == 1
+
+
+def test_results_are_sorted_by_date():
+    df = daily_frame().sample(frac=1, random_state=3)
+    
+    result = processor.calculate_rolling(df, windows=('30D',))
+    
+    assert result['date'].is_monotonic_increasing
+    expected = processor.calculate_rolling(df.sort_values('date'), windows=('30D',))
+    np.testing.assert_allclose(result['mean_30D'], expected['mean_30D'])
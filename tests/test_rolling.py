@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from climate_data.rolling import column_name, rolling_windows, RollingEngine
+
+STATISTICS = ('mean', 'std', 'count', 'min', 'max')
+
+
+def irregular_series(n=1500, seed=0, min_gap=0):
+    # Gaps of up to 4 days (repeated dates too unless min_gap > 0) and some
+    # missing values.
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp('2010-01-01') + pd.to_timedelta(np.cumsum(rng.integers(min_gap, 5, n)), unit='D')
+    values = rng.normal(10, 5, n)
+    values[rng.random(n) < 0.1] = np.nan
+    return pd.DataFrame({'date': dates, 'value': values})
+
+
+def pandas_rolling(df, window, min_periods=1):
+    return df.set_index('date')['value'].rolling(window, min_periods=min_periods)
+
+
+@pytest.mark.parametrize('window', ['7D', '30D', '365D'])
+def test_compute_matches_pandas_time_rolling(window):
+    df = irregular_series()
+    result = RollingEngine(windows=(window,), statistics=STATISTICS, quantiles=(0.9,)).compute(df)
+    
+    rolling = pandas_rolling(df, window)
+    for statistic in STATISTICS:
+        expected = getattr(rolling, statistic)().to_numpy()
+        np.testing.assert_allclose(result[column_name(statistic, window)], expected, rtol=1e-9, atol=1e-9, err_msg=statistic)
+    np.testing.assert_allclose(result[column_name(0.9, window)], rolling.quantile(0.9).to_numpy())
+
+
+def test_min_periods_matches_pandas():
+    df = irregular_series()
+    result = RollingEngine(windows=('30D',), statistics=('mean', 'std'), min_periods=5).compute(df)
+    
+    rolling = pandas_rolling(df, '30D', min_periods=5)
+    np.testing.assert_allclose(result['mean_30D'], rolling.mean().to_numpy(), rtol=1e-9, atol=1e-9)
+    np.testing.assert_allclose(result['std_30D'], rolling.std().to_numpy(), rtol=1e-9, atol=1e-9)
+
+
+def test_compute_keeps_the_input_order():
+    # Rows sharing a date are windowed in input order, as in pandas, so
+    # dates are kept distinct here.
+    df = irregular_series(min_gap=1)
+    shuffled = df.sample(frac=1, random_state=2)
+    engine = RollingEngine(windows=('30D',), statistics=('mean', 'count'))
+    
+    expected = engine.compute(df)
+    result = engine.compute(shuffled)
+    
+    assert result.index.equals(shuffled.index)
+    pd.testing.assert_frame_equal(result.sort_index(), expected)
+
+
+def test_append_matches_compute():
+    df = irregular_series()
+    windows = ('7D', '30D', '365D')
+    expected = RollingEngine(windows=windows, statistics=STATISTICS, quantiles=(0.5,)).compute(df)
+    
+    engine = RollingEngine(windows=windows, statistics=STATISTICS, quantiles=(0.5,))
+    bounds = [0, 1, 2, 50, 51, 400, 900, len(df)]
+    parts = [engine.append(df.iloc[start:end]) for start, end in zip(bounds, bounds[1:])]
+    result = pd.concat(parts)
+    
+    assert list(result.columns) == engine.columns
+    for column in engine.columns:
+        np.testing.assert_allclose(result[column].astype(float), expected[column].astype(float), rtol=1e-9, atol=1e-9, err_msg=column)
+
+
+def test_append_keeps_only_the_longest_window():
+    df = irregular_series()
+    engine = RollingEngine(windows=('7D', '30D'))
+    engine.append(df)
+    
+    assert engine._tail_dates[0] > df['date'].iloc[-1] - pd.Timedelta('30D')
+    assert len(engine._tail_dates) < 40
+
+
+def test_append_rejects_older_rows():
+    df = irregular_series()
+    engine = RollingEngine(windows=('30D',))
+    engine.append(df.iloc[100:])
+    
+    with pytest.raises(ValueError):
+        engine.append(df.iloc[:100])
+
+
+def test_rolling_windows_follow_the_sample_spacing():
+    daily = pd.date_range('2000-01-01', periods=400, freq='D')
+    weekly = pd.date_range('2000-01-03', periods=400, freq='W-MON')
+    monthly = pd.date_range('2000-01-01', periods=120, freq='MS')
+    yearly = pd.date_range('1900-01-01', periods=100, freq='YS')
+    
+    assert rolling_windows(daily) == ('7D', '30D', '365D')
+    assert rolling_windows(weekly) == ('30D', '365D')
+    assert rolling_windows(monthly) == ('365D',)
+    assert rolling_windows(yearly) == ('1095D',)
+
+
+@pytest.mark.parametrize('dtype', [np.float32, np.float64])
+def test_outputs_keep_the_input_float_dtype(dtype):
+    df = irregular_series().astype({'value': dtype})
+    engine = RollingEngine(windows=('7D', '30D'), statistics=STATISTICS, quantiles=(0.5,))
+    
+    result = engine.compute(df)
+    appended = RollingEngine(windows=('7D', '30D'), statistics=STATISTICS, quantiles=(0.5,)).append(df)
+    
+    for frame in (result, appended):
+        for name in frame.columns:
+            expected = np.int64 if name.startswith('count_') else dtype
+            assert frame[name].dtype == expected, name
+    expected = RollingEngine(windows=('30D',)).compute(df.astype({'value': np.float64}))
+    np.testing.assert_allclose(result['mean_30D'], expected['mean_30D'], rtol=1e-6)
@@ -0,0 +1,199 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from climate_data.rollups import choose_level, combine_stations, ROLLUP_LEVELS, year_shares
+from climate_data.storage import PartitionStore
+
+STATION = "GHCND:TEST"
+
+
+RESAMPLE_RULES = {"week": "W-MON", "month": "MS", "year": "YS"}
+
+
+def observations(start, end, datatype="TMAX", station=STATION, offset=0.0):
+    dates = pd.date_range(start, end, freq="D")
+    return pd.DataFrame({
+        "date": dates,
+        "datatype": datatype,
+        "station": station,
+        "attributes": ",,7,",
+        "value": np.arange(len(dates), dtype=np.float64) + offset
+    })
+
+
+def noisy_observations(start, end, seed=0):
+    df = observations(start, end)
+    rng = np.random.default_rng(seed)
+    df["value"] = rng.normal(10, 5, len(df))
+    df.loc[rng.random(len(df)) < 0.1, "value"] = np.nan
+    return df
+
+
+def expected_rollup(df, level):
+    # Periods labelled by their first day; weeks start on Monday.
+    resampled = df.set_index("date")["value"].resample(RESAMPLE_RULES[level], label="left", closed="left")
+    expected = resampled.agg(["mean", "min", "max", "count"])
+    return expected[expected["count"] > 0]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return PartitionStore(tmp_path)
+
+
+def test_merge_splits_rows_by_year(store):
+    df = observations("2019-12-20", "2020-01-10")
+    
+    assert store.merge("GHCND", "TMAX", STATION, df) == len(df)
+    assert store.years("GHCND", "TMAX", STATION) == [2019, 2020]
+    assert len(store.read_years("GHCND", "TMAX", STATION, [2019])) == 12
+    assert len(store.read_years("GHCND", "TMAX", STATION, [2020])) == 10
+
+
+def test_merge_deduplicates_and_keeps_the_newest_rows(store):
+    store.merge("GHCND", "TMAX", STATION, observations("2019-12-20", "2020-01-10"))
+    update = observations("2020-01-05", "2020-01-15", offset=100.0)
+    
+    assert store.merge("GHCND", "TMAX", STATION, update) == 5
+    # Merging the same rows again adds nothing.
+    assert store.merge("GHCND", "TMAX", STATION, update) == 0
+    
+    stored = store.read_years("GHCND", "TMAX", STATION, [2019, 2020])
+    assert len(stored) == 27
+    assert not stored.duplicated(["date", "datatype", "station"]).any()
+    assert stored["date"].is_monotonic_increasing
+    replaced = stored.set_index("date").loc["2020-01-05":, "value"]
+    np.testing.assert_array_equal(replaced, update["value"])
+
+
+def test_query_filters_the_range_across_years(store):
+    store.merge("GHCND", "TMAX", STATION, observations("2019-06-01", "2020-06-30"))
+    store.merge("GHCND", "TMIN", STATION, observations("2019-06-01", "2020-06-30", datatype="TMIN"))
+    
+    result = store.query(types=["TMAX"], start="2019-12-25", end="2020-01-05")
+    
+    assert list(result.columns) == ["date", "value", "type", "station"]
+    assert (result["type"] == "TMAX").all()
+    assert result["date"].min() == pd.Timestamp("2019-12-25")
+    assert result["date"].max() == pd.Timestamp("2020-01-05")
+    assert len(result) == 12
+
+
+def test_query_of_an_empty_store_has_the_columns(store):
+    result = store.query(types=["TMAX"], stations=[STATION], start="2020-01-01", end="2020-12-31")
+    assert result.empty
+    assert list(result.columns) == ["date", "value", "type", "station"]
+
+
+@pytest.mark.parametrize("level", ROLLUP_LEVELS)
+def test_rollups_match_resampled_raw_rows(store, level):
+    df = noisy_observations("2018-11-15", "2021-02-10")
+    store.merge("GHCND", "TMAX", STATION, df)
+    
+    result = store.query(types=["TMAX"], stations=[STATION], level=level)
+    expected = expected_rollup(df, level)
+    
+    assert result["date"].tolist() == expected.index.tolist()
+    for column, statistic in (("value", "mean"), ("min", "min"), ("max", "max"), ("count", "count")):
+        np.testing.assert_allclose(result[column].astype(float), expected[statistic], rtol=1e-6, err_msg=column)
+
+
+def test_week_straddling_new_year_has_both_years_days(store):
+    # 2019-12-30 is a Monday: its week runs to 2020-01-05.
+    df = observations("2019-12-01", "2020-01-31")
+    store.merge("GHCND", "TMAX", STATION, df)
+    
+    weeks = store.query(types=["TMAX"], stations=[STATION], start="2020-01-02", end="2020-01-20", level="week")
+    first = weeks.iloc[0]
+    
+    assert first["date"] == pd.Timestamp("2019-12-30")
+    assert first["count"] == 7
+    assert first["value"] == pytest.approx(df.set_index("date").loc["2019-12-30":"2020-01-05", "value"].mean())
+
+
+def test_incremental_rollups_match_a_full_rebuild(tmp_path):
+    df = noisy_observations("2018-12-01", "2021-01-31")
+    update = noisy_observations("2019-12-28", "2020-01-03", seed=1)
+    
+    incremental = PartitionStore(tmp_path / "incremental")
+    for _, part in df.groupby(df["date"].dt.year):
+        incremental.merge("GHCND", "TMAX", STATION, part)
+    incremental.merge("GHCND", "TMAX", STATION, update)
+    
+    rebuilt = PartitionStore(tmp_path / "rebuilt")
+    final = pd.concat([df, update]).drop_duplicates(["date", "datatype", "station"], keep="last")
+    rebuilt.merge("GHCND", "TMAX", STATION, final)
+    
+    for level in ROLLUP_LEVELS:
+        pd.testing.assert_frame_equal(
+            pd.read_parquet(incremental.rollup_path("GHCND", "TMAX", STATION, level)),
+            pd.read_parquet(rebuilt.rollup_path("GHCND", "TMAX", STATION, level)),
+            check_exact=False
+        )
+
+
+def test_missing_rollups_are_built_on_first_query(store):
+    df = observations("2019-12-01", "2020-01-31")
+    store.write_partition("GHCND", "TMAX", STATION, 2019, df[df["date"].dt.year == 2019], rollups=False)
+    store.write_partition("GHCND", "TMAX", STATION, 2020, df[df["date"].dt.year == 2020], rollups=False)
+    
+    months = store.query(types=["TMAX"], stations=[STATION], level="month")
+    
+    assert months["date"].tolist() == [pd.Timestamp("2019-12-01"), pd.Timestamp("2020-01-01")]
+    assert months["count"].tolist() == [31, 31]
+
+
+def test_year_shares_split_a_straddling_week_by_days():
+    weeks = pd.DataFrame({"date": pd.to_datetime(["2019-12-23", "2019-12-30"]), "count": [7, 7]})
+    
+    positions, years, weights = year_shares(weeks, "week")
+    assert positions.tolist() == [0, 1, 1]
+    assert years.tolist() == [2019, 2019, 2020]
+    np.testing.assert_allclose(weights, [7, 2, 5])
+    
+    # Clipping to the range drops the days outside it.
+    positions, years, weights = year_shares(weeks, "week", start="2019-12-25", end="2020-01-01")
+    assert years.tolist() == [2019, 2019, 2020]
+    np.testing.assert_allclose(weights, [5, 2, 1])
+
+
+def test_choose_level_keeps_enough_points():
+    assert choose_level("2020-01-01", "2020-12-31") == "day"
+    assert choose_level("1990-01-01", "2020-12-31") == "week"
+    assert choose_level("1900-01-01", "2020-12-31", min_points=1000) == "month"
+    assert choose_level("1900-01-01", "2020-12-31", min_points=100) == "year"
+
+
+def test_combined_stations_weight_rollups_by_count(store):
+    # Station B misses every other day, so its weekly means weigh less.
+    a = noisy_observations("2020-01-06", "2020-03-01")
+    b = noisy_observations("2020-01-06", "2020-03-01", seed=1).assign(station="GHCND:OTHER").iloc[::2]
+    store.merge("GHCND", "TMAX", STATION, a)
+    store.merge("GHCND", "TMAX", "GHCND:OTHER", b)
+    
+    weeks = store.query(types=["TMAX"], level="week")
+    combined = combine_stations(weeks)
+    expected = expected_rollup(pd.concat([a, b]), "week")
+    
+    assert "station" not in combined.columns
+    assert combined["date"].tolist() == expected.index.tolist()
+    for column, statistic in (("value", "mean"), ("min", "min"), ("max", "max"), ("count", "count")):
+        np.testing.assert_allclose(combined[column].astype(float), expected[statistic], rtol=1e-6, err_msg=column)
+
+
+def test_combined_stations_average_raw_rows_per_date(store):
+    store.merge("GHCND", "TMAX", STATION, observations("2020-01-01", "2020-01-10"))
+    store.merge("GHCND", "TMAX", "GHCND:OTHER", observations("2020-01-05", "2020-01-10", station="GHCND:OTHER", offset=100.0))
+    
+    raw = store.query(types=["TMAX"])
+    combined = combine_stations(raw)
+    
+    assert list(combined.columns) == ["date", "value", "type"]
+    assert combined["date"].tolist() == list(pd.date_range("2020-01-01", "2020-01-10"))
+    # Both stations from the 5th: (4 + 100) / 2, (5 + 101) / 2, ...
+    np.testing.assert_allclose(combined["value"], [0, 1, 2, 3, 52, 53, 54, 55, 56, 57])
+    assert combined["value"].dtype == raw["value"].dtype
+    
+    single = store.query(types=["TMAX"], stations=[STATION])
+    assert combine_stations(single) is single
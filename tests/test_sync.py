@@ -0,0 +1,148 @@
+import json
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from climate_data.api import ApiError
+from climate_data.storage import PartitionStore
+from climate_data.sync import SyncState, SyncTarget, sync
+
+TARGETS = [SyncTarget("GHCND:A", "TAVG"), SyncTarget("GHCND:B", "TAVG")]
+
+
+class Crash(Exception):
+    pass
+
+
+def cdo_rows(station, start, end, seed):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start, end, freq="D")
+    return [
+        {"date": f"{date:%Y-%m-%d}T00:00:00", "datatype": "TAVG", "station": station, "attributes": ",,7,", "value": round(float(value), 1)}
+        for date, value in zip(dates, rng.normal(10, 5, len(dates)))
+    ]
+
+
+class FakeClient:
+    # Serves CDO /data pages from rows; fail(params) returning True makes that
+    # request raise, the way an exhausted retry does.
+    def __init__(self, rows, fail=None):
+        self.rows = rows
+        self.fail = fail
+        self.requests = []
+        self._lock = threading.Lock()
+    
+    def get(self, endpoint, params=None):
+        with self._lock:
+            self.requests.append(dict(params))
+        if self.fail is not None and self.fail(params):
+            raise ApiError("Ошибка сети: соединение разорвано")
+        rows = [
+            row for row in self.rows
+            if row["station"] == params["stationid"] and params["startdate"] <= row["date"][:10] <= params["enddate"]
+        ]
+        offset, limit = int(params["offset"]), int(params["limit"])
+        return {
+            "metadata": {"resultset": {"offset": offset, "count": len(rows), "limit": limit}},
+            "results": rows[offset - 1:offset - 1 + limit]
+        }
+
+
+@pytest.fixture
+def rows():
+    return cdo_rows("GHCND:A", "2019-01-01", "2020-12-31", 0) + cdo_rows("GHCND:B", "2019-01-01", "2020-12-31", 1)
+
+
+def stored(store, station):
+    return store.read_years("GHCND", "TAVG", station, store.years("GHCND", "TAVG", station))
+
+
+def assert_complete(store, rows):
+    for station in ("GHCND:A", "GHCND:B"):
+        expected = [row for row in rows if row["station"] == station]
+        data = stored(store, station)
+        assert not data.duplicated(["date", "datatype", "station"]).any()
+        assert data["date"].dt.strftime("%Y-%m-%dT00:00:00").tolist() == [row["date"] for row in expected]
+        np.testing.assert_allclose(data["value"], [row["value"] for row in expected], rtol=1e-6)
+
+
+def journal(store):
+    with open(SyncState(store.root).journal_path, encoding="utf-8") as source:
+        return [json.loads(line) for line in source]
+
+
+def test_failed_target_is_fetched_again_in_full(tmp_path, rows):
+    store = PartitionStore(tmp_path)
+    # B's second yearly window fails after its first one came back.
+    flaky = FakeClient(rows, fail=lambda params: params["stationid"] == "GHCND:B" and params["startdate"] == "2020-01-01")
+    
+    records = sync(TARGETS, since="2019-01-01", until="2020-12-31", store=store, client=flaky)
+    
+    assert {record["station"]: record["status"] for record in records} == {"GHCND:A": "ok", "GHCND:B": "error"}
+    state = SyncState(store.root)
+    assert state.high_water(TARGETS[0]) == pd.Timestamp("2020-12-31")
+    # Nothing of the failed job reaches the store or moves its mark.
+    assert state.high_water(TARGETS[1]) is None
+    assert store.years("GHCND", "TAVG", "GHCND:B") == []
+    
+    healthy = FakeClient(rows)
+    records = sync(TARGETS, since="2019-01-01", until="2020-12-31", store=store, client=healthy)
+    
+    # A is up to date and not asked again; B starts over from since.
+    assert [record["station"] for record in records] == ["GHCND:B"]
+    assert {request["stationid"] for request in healthy.requests} == {"GHCND:B"}
+    assert records[0]["rows_added"] == 731
+    assert_complete(store, rows)
+    statuses = [(entry["station"], entry["status"]) for entry in journal(store)]
+    assert sorted(statuses[:2]) == [("GHCND:A", "ok"), ("GHCND:B", "error")]
+    assert statuses[2:] == [("GHCND:B", "ok")]
+
+
+def test_crash_between_merge_and_advance_is_absorbed(tmp_path, rows, monkeypatch):
+    store = PartitionStore(tmp_path)
+    client = FakeClient(rows)
+    sync(TARGETS, since="2019-01-01", until="2019-12-31", store=store, client=client)
+    
+    # The process dies after B's 2020 rows are merged but before its
+    # high-water mark and detector state are written.
+    advance = SyncState.advance
+    
+    def crash(self, target, high_water, detector=None):
+        if target == TARGETS[1]:
+            raise Crash
+        return advance(self, target, high_water, detector)
+    
+    monkeypatch.setattr(SyncState, "advance", crash)
+    with pytest.raises(Crash):
+        sync(TARGETS, since="2019-01-01", until="2020-12-31", store=store, client=client)
+    monkeypatch.setattr(SyncState, "advance", advance)
+    
+    assert SyncState(store.root).high_water(TARGETS[1]) == pd.Timestamp("2019-12-31")
+    assert len(stored(store, "GHCND:B")) == 731
+    
+    records = sync(TARGETS, since="2019-01-01", until="2020-12-31", store=store, client=client, score_anomalies=True)
+    
+    # The rerun fetches B's 2020 again; the merge adds nothing twice. A was
+    # either advanced before the crash or is fetched now.
+    by_station = {record["station"]: record for record in records}
+    assert (by_station["GHCND:B"]["rows_fetched"], by_station["GHCND:B"]["rows_added"]) == (366, 0)
+    assert_complete(store, rows)
+    # Each value reached the running statistics exactly once.
+    detector = SyncState(store.root).detector(TARGETS[1])
+    assert int(detector.count.sum()) == 731
+    assert SyncState(store.root).high_water(TARGETS[1]) == pd.Timestamp("2020-12-31")
+
+
+def test_runs_resume_from_the_high_water_mark(tmp_path, rows):
+    store = PartitionStore(tmp_path)
+    client = FakeClient(rows)
+    
+    sync(TARGETS, since="2019-01-01", until="2020-03-31", store=store, client=client)
+    client.requests.clear()
+    records = sync(TARGETS, since="2019-01-01", until="2020-12-31", store=store, client=client)
+    
+    assert {request["startdate"] for request in client.requests} == {"2020-04-01"}
+    assert sorted(record["rows_added"] for record in records) == [275, 275]
+    assert_complete(store, rows)
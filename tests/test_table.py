@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from dashboard.table import page_count, page_records, parse_filter, table_columns, table_view
+
+
+@pytest.fixture
+def frame():
+    dates = pd.date_range("2019-12-25", periods=20, freq="D")
+    return pd.DataFrame({
+        "date": dates,
+        "value": np.linspace(-5, 14, 20).astype(np.float32) + np.float32(0.123),
+        "type": pd.Categorical(["TMAX", "TMIN"] * 10),
+        "z_score": np.zeros(20),
+        "is_anomaly": [False] * 19 + [True]
+    })
+
+
+def dates_of(view):
+    return view["date"].dt.strftime("%d.%m.%Y").tolist()
+
+
+def test_parse_filter():
+    assert parse_filter("{value} >= 5 && {type} contains T") == [("value", "ge", "5"), ("type", "contains", "T")]
+    assert parse_filter("{value} > 5 && {value} ne 3") == [("value", "gt", "5"), ("value", "ne", "3")]
+    assert parse_filter('{date} datestartswith "01.2020"') == [("date", "datestartswith", "01.2020")]
+    assert parse_filter("{type} = `TMAX`") == [("type", "eq", "TMAX")]
+    assert parse_filter("value > 5 && {value}") == []
+    assert parse_filter(None) == []
+
+
+def test_page_records_format_one_page(frame):
+    records = page_records(frame, 1, 8)
+    
+    assert len(records) == 8
+    assert records[0] == {"date": "02.01.2020", "value": round(float(frame["value"].iloc[8]), 2), "type": "TMAX"}
+    assert all("z_score" not in record and "is_anomaly" not in record for record in records)
+    assert isinstance(records[0]["type"], str)
+    assert len(page_records(frame, 2, 8)) == 4
+    assert page_records(frame, 5, 8) == []
+
+
+def test_page_count_and_columns(frame):
+    assert page_count(frame, 8) == 3
+    assert page_count(frame.iloc[:0], 8) == 1
+    assert [column["id"] for column in table_columns(frame)] == ["date", "value", "type"]
+
+
+@pytest.mark.parametrize("query, expected", [
+    # The displayed format, down to the month or year.
+    ("{date} datestartswith 01.01.2020", ["01.01.2020"]),
+    ("{date} datestartswith 12.2019", ["25.12.2019", "26.12.2019", "27.12.2019", "28.12.2019", "29.12.2019", "30.12.2019", "31.12.2019"]),
+    ("{date} contains 2019", ["25.12.2019", "26.12.2019", "27.12.2019", "28.12.2019", "29.12.2019", "30.12.2019", "31.12.2019"]),
+    ("{date} datestartswith 2020-01-13", ["13.01.2020"]),
+    # Partial text is matched against the dates as shown.
+    ("{date} datestartswith 1", ["10.01.2020", "11.01.2020", "12.01.2020", "13.01.2020"]),
+    ("{date} contains 31.12", ["31.12.2019"]),
+    ("{date} > 10.01.2020", ["11.01.2020", "12.01.2020", "13.01.2020"]),
+    ("{date} <= 26.12.2019", ["25.12.2019", "26.12.2019"]),
+    ("{date} >= 2020-01-12", ["12.01.2020", "13.01.2020"]),
+    ("{date} < 2020", ["25.12.2019", "26.12.2019", "27.12.2019", "28.12.2019", "29.12.2019", "30.12.2019", "31.12.2019"]),
+    ("{date} = 13.01.2020", ["13.01.2020"]),
+])
+def test_date_filters(frame, query, expected):
+    assert dates_of(table_view(frame, query)) == expected
+
+
+@pytest.mark.parametrize("query", ["{date} > tomorrow", "{date} = 31.02.2020", "{date} datestartswith 32.", "{date} < 13.2020"])
+def test_unreadable_dates_match_nothing(frame, query):
+    assert table_view(frame, query).empty
+
+
+def test_filters_combine_with_sorting(frame):
+    view = table_view(frame, "{type} contains max && {value} > 3 && {date} datestartswith 01.2020", ({"column_id": "value", "direction": "desc"},))
+    
+    assert view["type"].eq("TMAX").all()
+    assert view["value"].gt(3).all()
+    assert view["value"].is_monotonic_decreasing
+    assert dates_of(view) == ["12.01.2020", "10.01.2020", "08.01.2020", "06.01.2020", "04.01.2020", "02.01.2020"]
+
+
+def test_a_bad_number_matches_nothing(frame):
+    assert table_view(frame, "{value} > abc").empty
+    assert table_view(frame, "{unknown} > 1") is frame
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from climate_data import processor
+from climate_data.trends import GRANULARITIES, TrendEngine
+
+FREQ = {'yearly': 'Y', 'monthly': 'M', 'weekly': 'W'}
+
+
+def old_compute_trends(df, column='value'):
+    # The per-period to_period groupby that TrendEngine replaced.
+    result = {}
+    for period_name in GRANULARITIES:
+        period_keys = df['date'].dt.to_period(FREQ[period_name])
+        period_stats = df[column].groupby(period_keys).agg(['mean', 'std', 'min', 'max'])
+        
+        period_change = None
+        if len(period_stats) > 1:
+            first_period = period_stats.iloc[0]['mean']
+            last_period = period_stats.iloc[-1]['mean']
+            period_change = ((last_period - first_period) / first_period) * 100 if first_period != 0 else np.nan
+        
+        result[period_name] = {'stats': period_stats, 'change_percent': period_change}
+    return result
+
+
+def daily_frame(start='2016-03-17', days=1500, seed=0, dtype=np.float64):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start, periods=days, freq='D')
+    values = 12 + 0.002 * np.arange(days) + 8 * np.sin(2 * np.pi * dates.dayofyear.to_numpy() / 365.25) + rng.normal(0, 2, days)
+    values[rng.random(days) < 0.05] = np.nan
+    return pd.DataFrame({'date': dates, 'value': values.astype(dtype)})
+
+
+@pytest.mark.parametrize('granularity', GRANULARITIES)
+def test_stats_match_the_old_groupby(granularity):
+    df = daily_frame()
+    
+    expected = old_compute_trends(df)[granularity]
+    result = processor.compute_trends(df)[granularity]
+    
+    stats = result['stats']
+    assert stats.index.equals(expected['stats'].index)
+    for column in ['mean', 'std', 'min', 'max']:
+        np.testing.assert_allclose(stats[column], expected['stats'][column], rtol=1e-9, err_msg=column)
+    assert stats['count'].tolist() == df['value'].groupby(df['date'].dt.to_period(FREQ[granularity])).count().tolist()
+    assert result['change_percent'] == pytest.approx(expected['change_percent'], rel=1e-9)
+
+
+@pytest.mark.parametrize('granularity', GRANULARITIES)
+def test_slope_matches_polyfit_of_period_means(granularity):
+    df = daily_frame(seed=1)
+    
+    result = TrendEngine(df).trend(granularity)
+    
+    means = result['stats']['mean']
+    ordinals = means.index.asi8.astype(np.float64)
+    assert result['slope'] == pytest.approx(np.polyfit(ordinals, means.to_numpy(), 1)[0], rel=1e-9)
+
+
+def test_unsorted_and_float32_input():
+    df = daily_frame(seed=2, dtype=np.float32)
+    shuffled = df.sample(frac=1, random_state=3)
+    
+    expected = old_compute_trends(df.astype({'value': np.float64}))
+    result = processor.compute_trends(shuffled)
+    
+    for granularity in GRANULARITIES:
+        np.testing.assert_allclose(result[granularity]['stats']['mean'], expected[granularity]['stats']['mean'], rtol=1e-9)
+        np.testing.assert_allclose(result[granularity]['stats']['std'], expected[granularity]['stats']['std'], rtol=1e-7)
+
+
+def test_single_period_has_no_trend():
+    df = daily_frame(start='2020-03-02', days=5)
+    
+    result = processor.compute_trends(df, periods=['weekly', 'yearly'])
+    
+    assert set(result) == {'weekly', 'yearly'}
+    assert result['yearly']['change_percent'] is None
+    assert result['yearly']['slope'] is None